@@ -1,11 +1,5 @@
 import streamlit as st
-import os
-from database import init_database
-from auth import authenticate_user, get_user_role, logout_user
-from pages import dashboard, projects, work_orders, cutting_lists, balance_orders, production_log, daily_targets, dispatch, audit_trail, users
-
-# Clear default Streamlit sidebar navigation
-st.query_params.clear()
+import importlib
 
 # Page configuration
 st.set_page_config(
@@ -15,14 +9,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Health check endpoint
+# Health check endpoint, answered before the database layer is imported
 if st.query_params.get("healthz") is not None:
     st.write("ok")
     st.stop()
 
+# Clear default Streamlit sidebar navigation
+st.query_params.clear()
+
+# The login path only needs the database layer and auth; page modules (and with
+# them pandas and plotly) are imported on demand once a page is opened
+from database import init_database, start_analytics_refresher
+from auth import authenticate_user, get_user_role, logout_user
+
 # Initialize database
 init_database()
 
+# Keep the analytics materialized views fresh in the background
+start_analytics_refresher()
+
+# Run queued reports off the users' reruns
+from utils.report_jobs import start_report_workers
+start_report_workers()
+
 # Authentication check
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -66,6 +75,10 @@ def show_app():
         
         st.divider()
         
+        # Global search across all order records
+        st.text_input("🔍 Search", placeholder="WO number, order, challan...", key="global_search",
+                      on_change=open_search_page)
+        
         # Navigation menu
         pages = {
             "📊 Dashboard": "dashboard",
@@ -76,9 +89,14 @@ def show_app():
             "🏭 Production Log": "production_log",
             "🎯 Daily Targets": "daily_targets",
             "🚚 Dispatch": "dispatch",
+            "📑 Reports": "reports",
             "📜 Audit Trail": "audit_trail"
         }
         
+        # Bulk imports for admins and project managers
+        if st.session_state.user_role in ["Admin", "Project Manager"]:
+            pages["📥 Import"] = "imports"
+        
         # Add user management for admins
         if st.session_state.user_role == "Admin":
             pages["👥 Users"] = "users"
@@ -99,26 +117,18 @@ def show_app():
             st.rerun()
     
     # Main content
-    if st.session_state.current_page == "dashboard":
-        dashboard.show()
-    elif st.session_state.current_page == "projects":
-        projects.show()
-    elif st.session_state.current_page == "work_orders":
-        work_orders.show()
-    elif st.session_state.current_page == "cutting_lists":
-        cutting_lists.show()
-    elif st.session_state.current_page == "balance_orders":
-        balance_orders.show()
-    elif st.session_state.current_page == "production_log":
-        production_log.show()
-    elif st.session_state.current_page == "daily_targets":
-        daily_targets.show()
-    elif st.session_state.current_page == "dispatch":
-        dispatch.show()
-    elif st.session_state.current_page == "audit_trail":
-        audit_trail.show()
-    elif st.session_state.current_page == "users" and st.session_state.user_role == "Admin":
-        users.show()
+    page_key = st.session_state.current_page
+    if page_key in pages.values() or page_key == "search":
+        load_page(page_key).show()
+
+def open_search_page():
+    """Show the search results page when a global search is entered"""
+    if st.session_state.global_search.strip():
+        st.session_state.current_page = "search"
+
+def load_page(page_key):
+    """Import a page module the first time it is opened"""
+    return importlib.import_module(f"pages.{page_key}")
 
 if __name__ == "__main__":
     main()
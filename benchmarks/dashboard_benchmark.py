@@ -0,0 +1,170 @@
+"""Dashboard latency benchmark at increasing production_log sizes.
+
+For each size the benchmark reseeds a scratch database, then measures the
+dashboard's single query and a full headless render of the dashboard page
+(streamlit.testing AppTest) several times. The median render time is compared
+with the budget for that size. Exits non-zero when a budget is exceeded.
+
+The seed step TRUNCATEs the application tables, so the target database must be
+given explicitly and must not hold real data.
+
+Usage:
+    python benchmarks/dashboard_benchmark.py --database-url postgresql://.../ppms_bench
+        [--sizes 10000 1000000 10000000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median full-render budget in seconds per production_log row count
+BUDGETS = {
+    10_000: 0.5,
+    1_000_000: 1.0,
+    10_000_000: 3.0,
+}
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+# Fixed-size reference data seeded alongside production_log
+PROJECTS = 50
+WORK_ORDERS = 2_000
+BALANCE_ORDERS = 500
+DAILY_TARGETS = 500
+
+# Days of history the production rows are spread over
+HISTORY_DAYS = 730
+
+SEEDED_TABLES = ["projects", "work_orders", "balance_orders", "daily_targets", "production_log"]
+
+def render_dashboard():
+    from pages import dashboard
+    dashboard.show()
+
+def seed(engine, production_rows):
+    """Reset the scratch database to the reference data plus production_rows log rows"""
+    from sqlalchemy import text
+    from database import backfill_production_rollup
+
+    with engine.begin() as conn:
+        # Seeding bypasses the per-row triggers; the rollup is rebuilt in bulk below and
+        # the search index is not benchmarked here
+        for table_name in SEEDED_TABLES:
+            conn.execute(text(f"ALTER TABLE {table_name} DISABLE TRIGGER USER"))
+
+        conn.execute(text(f"TRUNCATE {', '.join(SEEDED_TABLES)}, search_index, production_daily_rollup, production_order_rollup RESTART IDENTITY CASCADE"))
+        conn.execute(text("""
+            INSERT INTO projects (name, client, status)
+            SELECT 'Project ' || g, 'Client ' || (g % 10), CASE WHEN g % 5 = 0 THEN 'Completed' ELSE 'Active' END
+            FROM generate_series(1, :count) g
+        """), {"count": PROJECTS})
+        conn.execute(text("""
+            INSERT INTO work_orders (wo_number, project_id, wo_type, status, priority, due_date, created_at)
+            SELECT 'WO-' || g, 1 + g % :projects,
+                   (ARRAY['Cutting', 'Production', 'Procurement'])[1 + g % 3],
+                   (ARRAY['Pending', 'In Progress', 'Completed', 'Dispatched'])[1 + g % 4],
+                   (ARRAY['High', 'Medium', 'Low'])[1 + g % 3],
+                   CURRENT_DATE + (g % 60), CURRENT_TIMESTAMP - g * INTERVAL '1 hour'
+            FROM generate_series(1, :count) g
+        """), {"count": WORK_ORDERS, "projects": PROJECTS})
+        conn.execute(text("""
+            INSERT INTO balance_orders (wo_number, project_id, required_qty, total_qty, status, due_date)
+            SELECT 'WO-' || g, 1 + g % :projects, 100, 100,
+                   (ARRAY['Pending', 'In Progress', 'Completed'])[1 + g % 3], CURRENT_DATE + (g % 30)
+            FROM generate_series(1, :count) g
+        """), {"count": BALANCE_ORDERS, "projects": PROJECTS})
+        conn.execute(text("""
+            INSERT INTO daily_targets (order_number, project_id, target_quantity, target_date, status)
+            SELECT 'WO-' || g, 1 + g % :projects, 50, CURRENT_DATE - (g % 10),
+                   (ARRAY['Not Started', 'In Progress', 'Completed'])[1 + g % 3]
+            FROM generate_series(1, :count) g
+        """), {"count": DAILY_TARGETS, "projects": PROJECTS})
+        conn.execute(text("""
+            INSERT INTO production_log (wo_number, project_id, machine_used, produced_quantity, production_date, shift)
+            SELECT 'WO-' || (1 + g % :work_orders), 1 + g % :projects, 'Machine ' || (1 + g % 8),
+                   1 + g % 120, CURRENT_DATE - (g % :days),
+                   (ARRAY['Morning', 'Afternoon', 'Night'])[1 + g % 3]
+            FROM generate_series(1, :count) g
+        """), {"count": production_rows, "work_orders": WORK_ORDERS, "projects": PROJECTS, "days": HISTORY_DAYS})
+
+        backfill_production_rollup(conn)
+
+        for table_name in SEEDED_TABLES:
+            conn.execute(text(f"ALTER TABLE {table_name} ENABLE TRIGGER USER"))
+
+        conn.execute(text("ANALYZE"))
+
+def measure(production_rows, runs):
+    """Return the median (query seconds, render seconds) for the current seed"""
+    from streamlit.testing.v1 import AppTest
+    from pages.dashboard import get_dashboard_data
+
+    query_timings = []
+    render_timings = []
+
+    # Warm the connection pool and the page import before timing
+    get_dashboard_data()
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        get_dashboard_data()
+        query_timings.append(time.perf_counter() - start)
+
+        app = AppTest.from_function(render_dashboard, default_timeout=120)
+        start = time.perf_counter()
+        app.run()
+        render_timings.append(time.perf_counter() - start)
+
+        if app.exception or app.error:
+            errors = [str(element.value) for element in list(app.exception) + list(app.error)]
+            raise RuntimeError(f"dashboard render failed at {production_rows} rows: {errors}")
+
+    return statistics.median(query_timings), statistics.median(render_timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="scratch database to seed (or set BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="production_log row counts to benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="timed renders per size")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("a scratch database is required: pass --database-url or set BENCHMARK_DATABASE_URL")
+
+    # The application reads DATABASE_URL when database.py is first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, ROOT)
+
+    from database import engine, init_database
+    init_database()
+
+    failures = []
+
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        seed(engine, size)
+        seed_seconds = time.perf_counter() - start
+
+        query_median, render_median = measure(size, args.runs)
+        budget = BUDGETS.get(size)
+        status = "ok" if budget is None or render_median <= budget else "OVER BUDGET"
+        budget_label = f"{budget * 1000:.0f} ms" if budget else "none"
+        print(f"{size:>12,} rows  query {query_median * 1000:8.1f} ms  render {render_median * 1000:8.1f} ms"
+              f"  (budget {budget_label}, seeded in {seed_seconds:.1f}s)  {status}")
+
+        if budget is not None and render_median > budget:
+            failures.append(f"{size:,} rows rendered in {render_median:.2f}s")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Cold-start benchmark for the health, login and page import paths.
+
+Each path is imported in a fresh interpreter several times and the median
+wall time is compared with its budget. The paths are read from app.py's
+module-level imports, so they follow the app as it changes. The login path
+must also stay free of page modules and plotly. Exits non-zero when a budget
+is exceeded.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median cold-start budget in seconds for each path
+BUDGETS = {
+    "health": 1.5,
+    "login": 2.5,
+}
+
+# Modules that must not be loaded before a page is opened
+LOGIN_FORBIDDEN = ("plotly", "pages.")
+
+def app_import_paths():
+    """Modules app.py imports at module level, as {"health": before the health check, "login": all of them}
+    
+    Imports inside functions, such as the page modules, are left out: they are
+    paid for when a page is opened.
+    """
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    
+    paths = {"health": [], "login": []}
+    past_health_check = False
+    for node in tree.body:
+        if isinstance(node, ast.If) and "healthz" in ast.unparse(node.test):
+            past_health_check = True
+        
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module]
+        else:
+            continue
+        
+        paths["login"] += modules
+        if not past_health_check:
+            paths["health"] += modules
+    
+    return paths
+
+PATHS = app_import_paths()
+
+PAGE_MODULES = [
+    "dashboard", "projects", "work_orders", "cutting_lists", "balance_orders",
+    "production_log", "daily_targets", "dispatch", "audit_trail", "users"
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+def time_imports(modules):
+    """Import modules in a fresh interpreter and return (seconds, loaded module names)"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(modules=modules)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["elapsed"], data["modules"]
+
+def measure(modules, runs):
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        elapsed, loaded = time_imports(modules)
+        timings.append(elapsed)
+    return statistics.median(timings), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per path")
+    args = parser.parse_args()
+
+    failures = []
+
+    for path, modules in PATHS.items():
+        median, loaded = measure(modules, args.runs)
+        status = "ok" if median <= BUDGETS[path] else "OVER BUDGET"
+        print(f"{path:<16} {median * 1000:8.1f} ms  (budget {BUDGETS[path] * 1000:.0f} ms)  {status}")
+        if median > BUDGETS[path]:
+            failures.append(f"{path} path took {median:.2f}s")
+
+        if path == "login":
+            leaked = [name for name in loaded if name.startswith(LOGIN_FORBIDDEN)]
+            if leaked:
+                failures.append(f"login path imports {', '.join(sorted(leaked)[:5])}")
+
+    # Page modules are informational: they are paid for when a page is opened
+    login_modules = PATHS["login"]
+    login_median, _ = measure(login_modules, args.runs)
+    for page in PAGE_MODULES:
+        median, _ = measure(login_modules + [f"pages.{page}"], args.runs)
+        print(f"pages.{page:<10} {(median - login_median) * 1000:8.1f} ms  on top of login")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
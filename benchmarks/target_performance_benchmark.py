@@ -0,0 +1,169 @@
+"""Target performance analytics: separate queries versus the single grouping-sets query.
+
+Seeds a scratch database with daily targets, then runs EXPLAIN ANALYZE on the
+seven queries the performance tab used to issue and on the single query it
+issues now. For each it reports how many times daily_targets was scanned and
+the total execution time. Exits non-zero if the single query scans the table
+more than once.
+
+The seed step TRUNCATEs daily_targets, so the target database must be given
+explicitly and must not hold real data.
+
+Usage:
+    python benchmarks/target_performance_benchmark.py --database-url postgresql://.../ppms_bench
+        [--targets 1000000] [--days 30] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USERS = 25
+
+# Days of history the targets are spread over
+HISTORY_DAYS = 365
+
+# The queries the performance tab issued before it switched to one statement
+LEGACY_QUERIES = [
+    """
+        SELECT COUNT(*) FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date
+    """,
+    """
+        SELECT COUNT(*) FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date AND status = 'Completed'
+    """,
+    """
+        SELECT COUNT(*) FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date
+            AND status = 'Completed'
+            AND (completion_date IS NULL OR completion_date <= target_date)
+    """,
+    """
+        SELECT AVG(CASE WHEN target_quantity > 0 THEN (actual_quantity * 100.0 / target_quantity) ELSE 0 END)
+        FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date AND target_quantity > 0
+    """,
+    """
+        SELECT target_date, COUNT(*), COUNT(CASE WHEN status = 'Completed' THEN 1 END)
+        FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date
+        GROUP BY target_date
+        ORDER BY target_date
+    """,
+    """
+        SELECT u.username, COUNT(dt.id), COUNT(CASE WHEN dt.status = 'Completed' THEN 1 END),
+               AVG(CASE WHEN dt.target_quantity > 0 THEN (dt.actual_quantity * 100.0 / dt.target_quantity) ELSE 0 END)
+        FROM daily_targets dt
+        JOIN users u ON dt.assigned_to = u.id
+        WHERE dt.target_date >= :start_date AND dt.target_date <= :end_date
+        GROUP BY u.username
+        ORDER BY 3 DESC
+    """,
+    """
+        SELECT status, COUNT(*)
+        FROM daily_targets
+        WHERE target_date >= :start_date AND target_date <= :end_date
+        GROUP BY status
+    """
+]
+
+SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+def seed(engine, targets):
+    """Reset daily_targets to targets rows assigned across the benchmark users"""
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (username, password_hash, role)
+            SELECT 'bench_user_' || g, 'x', 'Operator' FROM generate_series(1, :count) g
+            ON CONFLICT (username) DO NOTHING
+        """), {"count": USERS})
+
+        # Seeding bypasses the per-row triggers; the search index is not benchmarked here
+        conn.execute(text("ALTER TABLE daily_targets DISABLE TRIGGER USER"))
+        conn.execute(text("TRUNCATE daily_targets RESTART IDENTITY CASCADE"))
+        conn.execute(text("DELETE FROM search_index WHERE entity_type = 'daily_targets'"))
+        conn.execute(text("""
+            INSERT INTO daily_targets (order_number, target_quantity, actual_quantity, target_date,
+                                       completion_date, assigned_to, status)
+            SELECT 'WO-' || g, g % 200, g % 180, CURRENT_DATE - (g % :days),
+                   CASE WHEN g % 3 = 0 THEN CURRENT_DATE - (g % :days) + (g % 4) END,
+                   (SELECT id FROM users WHERE username = 'bench_user_' || (1 + g % :users)),
+                   (ARRAY['Not Started', 'In Progress', 'Completed', 'On Hold'])[1 + g % 4]
+            FROM generate_series(1, :count) g
+        """), {"count": targets, "days": HISTORY_DAYS, "users": USERS})
+        conn.execute(text("ALTER TABLE daily_targets ENABLE TRIGGER USER"))
+
+        conn.execute(text("ANALYZE daily_targets"))
+
+def count_scans(plan, relation):
+    """Count the scan nodes over relation anywhere in an EXPLAIN JSON plan"""
+    scans = 1 if plan.get("Node Type") in SCAN_NODES and plan.get("Relation Name") == relation else 0
+    return scans + sum(count_scans(child, relation) for child in plan.get("Plans", []))
+
+def explain(conn, query, params):
+    """Return (daily_targets scans, execution ms) for one run of query"""
+    from sqlalchemy import text
+
+    result = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + query), params).scalar()
+    plan = result[0]
+    return count_scans(plan["Plan"], "daily_targets"), plan["Execution Time"]
+
+def measure(engine, queries, params, runs):
+    """Return (total scans, median total execution ms) for running all queries once"""
+    timings = []
+    scans = 0
+
+    with engine.connect() as conn:
+        # Warm the cache before timing
+        for query in queries:
+            explain(conn, query, params)
+
+        for _ in range(runs):
+            results = [explain(conn, query, params) for query in queries]
+            scans = sum(result[0] for result in results)
+            timings.append(sum(result[1] for result in results))
+
+    return scans, statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="scratch database to seed (or set BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--targets", type=int, default=1_000_000, help="daily_targets rows to seed")
+    parser.add_argument("--days", type=int, default=30, help="length of the analysed period")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per variant")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("a scratch database is required: pass --database-url or set BENCHMARK_DATABASE_URL")
+
+    # The application reads DATABASE_URL when database.py is first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, ROOT)
+
+    from database import engine, init_database
+    from pages.daily_targets import TARGET_PERFORMANCE_QUERY
+    init_database()
+
+    seed(engine, args.targets)
+
+    params = {"start_date": date.today() - timedelta(days=args.days), "end_date": date.today()}
+    legacy_scans, legacy_ms = measure(engine, LEGACY_QUERIES, params, args.runs)
+    single_scans, single_ms = measure(engine, [TARGET_PERFORMANCE_QUERY], params, args.runs)
+
+    print(f"{args.targets:,} targets, {args.days}-day period")
+    print(f"  {len(LEGACY_QUERIES)} queries   {legacy_scans} scans of daily_targets  {legacy_ms:8.1f} ms")
+    print(f"  1 query     {single_scans} scan of daily_targets   {single_ms:8.1f} ms")
+
+    if single_scans > 1:
+        print(f"\nFAILED: the performance query scanned daily_targets {single_scans} times")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
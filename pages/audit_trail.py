@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-from database import get_db
+from database import get_db, fetch_summary
 from sqlalchemy import text
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.chart_series import prepare_series, GRAIN_LABELS
+from utils.analytics import show_snapshot_freshness, snapshots_enabled
 
 def show():
     st.title("📜 Audit Trail")
@@ -17,13 +22,10 @@ def show():
         st.warning("You don't have permission to view the audit trail.")
         return
     
-    tab1, tab2 = st.tabs(["🔍 View Audit Trail", "📊 Audit Analytics"])
-    
-    with tab1:
-        show_audit_trail()
-    
-    with tab2:
-        show_audit_analytics()
+    show_lazy_tabs({
+        "🔍 View Audit Trail": show_audit_trail,
+        "📊 Audit Analytics": show_audit_analytics
+    }, key="audit_trail_tab")
 
 def show_audit_trail():
     st.subheader("Audit Trail Records")
@@ -64,83 +66,71 @@ def show_audit_trail():
     with col2:
         search_term = st.text_input("Search", placeholder="Record ID, old value, or new value...", key="audit_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            at.id,
-            at.table_name,
-            at.record_id,
-            at.action,
-            at.field_name,
-            at.old_value,
-            at.new_value,
-            u.username as user_name,
-            at.timestamp
-        FROM audit_trail at
-        LEFT JOIN users u ON at.user_id = u.id
-        WHERE DATE(at.timestamp) >= :start_date AND DATE(at.timestamp) <= :end_date
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE DATE(at.timestamp) >= :start_date AND DATE(at.timestamp) <= :end_date"
     params = {
         "start_date": start_date,
         "end_date": end_date
     }
     
     if table_filter != "All":
-        query += " AND at.table_name = :table_name"
+        where += " AND at.table_name = :table_name"
         params["table_name"] = table_filter
     
     if action_filter != "All":
-        query += " AND at.action = :action"
+        where += " AND at.action = :action"
         params["action"] = action_filter
     
     if user_filter != "All":
-        query += " AND u.username = :username"
+        where += " AND at.user_id IN (SELECT id FROM users WHERE username = :username)"
         params["username"] = user_filter
     
     if search_term:
-        query += " AND (CAST(at.record_id AS TEXT) LIKE :search OR LOWER(at.old_value) LIKE LOWER(:search) OR LOWER(at.new_value) LIKE LOWER(:search))"
+        where += " AND (CAST(at.record_id AS TEXT) LIKE :search OR LOWER(at.old_value) LIKE LOWER(:search) OR LOWER(at.new_value) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY at.timestamp DESC LIMIT 1000"  # Limit for performance
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        audit_records = result.fetchall()
-        db.close()
+        summary = fetch_summary("audit_trail at", where, params, {
+            "total_records": "COUNT(*)",
+            "create_actions": "COUNT(*) FILTER (WHERE at.action = 'CREATE')",
+            "update_actions": "COUNT(*) FILTER (WHERE at.action = 'UPDATE')",
+            "delete_actions": "COUNT(*) FILTER (WHERE at.action = 'DELETE')",
+        })
         
-        if audit_records:
+        if summary["total_records"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_records = len(audit_records)
-            create_actions = len([r for r in audit_records if r[3] == "CREATE"])
-            update_actions = len([r for r in audit_records if r[3] == "UPDATE"])
-            delete_actions = len([r for r in audit_records if r[3] == "DELETE"])
-            
-            col1.metric("Total Records", total_records)
-            col2.metric("Creates", create_actions)
-            col3.metric("Updates", update_actions)
-            col4.metric("Deletes", delete_actions)
+            col1.metric("Total Records", summary["total_records"])
+            col2.metric("Creates", summary["create_actions"])
+            col3.metric("Updates", summary["update_actions"])
+            col4.metric("Deletes", summary["delete_actions"])
             
             st.divider()
             
             # Display options
-            col1, col2 = st.columns(2)
-            with col1:
-                show_details = st.checkbox("Show Field Details", value=True)
-            with col2:
-                records_per_page = st.selectbox("Records per page", options=[50, 100, 200], index=0)
+            show_details = st.checkbox("Show Field Details", value=True)
+            limit, offset = show_pagination(summary["total_records"], key="audit_page", page_sizes=(50, 100, 200))
             
-            # Pagination
-            total_pages = (total_records + records_per_page - 1) // records_per_page
-            if total_pages > 1:
-                page = st.selectbox("Page", options=list(range(1, total_pages + 1))) - 1
-                start_idx = page * records_per_page
-                end_idx = min(start_idx + records_per_page, total_records)
-                display_records = audit_records[start_idx:end_idx]
-            else:
-                display_records = audit_records[:records_per_page]
+            query = """
+                SELECT 
+                    at.id,
+                    at.table_name,
+                    at.record_id,
+                    at.action,
+                    at.field_name,
+                    at.old_value,
+                    at.new_value,
+                    u.username as user_name,
+                    at.timestamp
+                FROM audit_trail at
+                LEFT JOIN users u ON at.user_id = u.id
+            """ + where + " ORDER BY at.timestamp DESC, at.id DESC"
+            
+            db = get_db()
+            result = db.execute(text(query + " LIMIT :limit OFFSET :offset"), {**params, "limit": limit, "offset": offset})
+            display_records = result.fetchall()
+            db.close()
             
             # Display audit records
             for record in display_records:
@@ -210,19 +200,8 @@ def show_audit_trail():
                     
                     st.divider()
             
-            # Export functionality
-            if st.button("📥 Export Audit Trail"):
-                df_audit = pd.DataFrame(audit_records, columns=[
-                    'Audit ID', 'Table', 'Record ID', 'Action', 'Field', 'Old Value', 'New Value', 'User', 'Timestamp'
-                ])
-                
-                csv = df_audit.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download as CSV",
-                    data=csv,
-                    file_name=f"audit_trail_{start_date}_{end_date}.csv",
-                    mime="text/csv"
-                )
+            # Export the whole filtered trail, streamed rather than capped
+            show_csv_export("audit_trail", query, params, key="audit_export")
                 
         else:
             st.info("No audit records found for the selected criteria.")
@@ -241,24 +220,100 @@ def show_audit_analytics():
         end_date = st.date_input("Analysis To", value=date.today(), key="analytics_audit_end")
     
     try:
-        db = get_db()
+        if snapshots_enabled():
+            from utils.snapshots import audit_analytics
+            
+            show_snapshot_freshness(key="sync_audit_snapshot")
+            analytics = audit_analytics(start_date, end_date)
+        else:
+            analytics = get_audit_analytics(start_date, end_date)
         
         # Activity overview
         col1, col2, col3, col4 = st.columns(4)
         
-        # Total activities
+        peak_day = analytics["peak_day"]
+        
+        col1.metric("Total Activities", analytics["total"])
+        col2.metric("Active Users", analytics["users"])
+        col3.metric("Most Active Table", analytics["most_active_table"] or "N/A")
+        col4.metric("Peak Activity", f"{peak_day[1]} activities on {peak_day[0]}" if peak_day else "N/A")
+        
+        st.divider()
+        
+        # Charts
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Activity by action type
+            st.subheader("Activity by Action Type")
+            df_actions = analytics["actions"]
+            
+            if not df_actions.empty:
+                st.bar_chart(df_actions.set_index('Action'))
+            else:
+                st.info("No activity data available.")
+        
+        with col2:
+            # Activity by table
+            st.subheader("Activity by Table")
+            df_tables = analytics["tables"]
+            
+            if not df_tables.empty:
+                st.bar_chart(df_tables.set_index('Table'))
+            else:
+                st.info("No table activity data available.")
+        
+        # Daily activity trend
+        st.subheader("📈 Activity Trend")
+        
+        if not analytics["daily"].empty:
+            df_daily, grain = prepare_series(analytics["daily"], 'Date', start_date, end_date)
+            st.caption(f"{GRAIN_LABELS[grain]} totals")
+            st.line_chart(df_daily.set_index('Date'))
+        else:
+            st.info("No daily activity data available.")
+        
+        # User activity ranking
+        st.subheader("👥 Most Active Users")
+        df_users = analytics["user_ranking"]
+        
+        if not df_users.empty:
+            st.dataframe(df_users, use_container_width=True)
+        else:
+            st.info("No user activity data available.")
+        
+        # Recent high-impact changes
+        st.subheader("🚨 Recent High-Impact Changes")
+        df_high_impact = analytics["high_impact"]
+        
+        if not df_high_impact.empty:
+            st.dataframe(df_high_impact, use_container_width=True)
+        else:
+            st.info("No high-impact changes in the selected period.")
+        
+    except Exception as e:
+        st.error(f"Error loading audit analytics: {str(e)}")
+
+def get_audit_analytics(start_date, end_date):
+    """Every audit analytics figure for the period
+    
+    Returns a dict with total, users, most_active_table, peak_day (date, count)
+    and the actions, tables, daily, user_ranking and high_impact DataFrames.
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    
+    db = get_db()
+    try:
         total_activities = db.execute(text("""
             SELECT COUNT(*) FROM audit_trail 
             WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
+        """), params).fetchone()[0]
         
-        # Unique users
         unique_users = db.execute(text("""
             SELECT COUNT(DISTINCT user_id) FROM audit_trail 
             WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
+        """), params).fetchone()[0]
         
-        # Most active table
         most_active_table = db.execute(text("""
             SELECT table_name, COUNT(*) as activity_count 
             FROM audit_trail 
@@ -266,9 +321,8 @@ def show_audit_analytics():
             GROUP BY table_name 
             ORDER BY activity_count DESC 
             LIMIT 1
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()
+        """), params).fetchone()
         
-        # Peak activity day
         peak_day = db.execute(text("""
             SELECT DATE(timestamp) as activity_date, COUNT(*) as daily_count 
             FROM audit_trail 
@@ -276,55 +330,25 @@ def show_audit_analytics():
             GROUP BY DATE(timestamp) 
             ORDER BY daily_count DESC 
             LIMIT 1
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()
-        
-        col1.metric("Total Activities", total_activities)
-        col2.metric("Active Users", unique_users)
-        col3.metric("Most Active Table", most_active_table[0] if most_active_table else "N/A")
-        col4.metric("Peak Activity", f"{peak_day[1]} activities on {peak_day[0]}" if peak_day else "N/A")
-        
-        st.divider()
-        
-        # Charts
-        col1, col2 = st.columns(2)
+        """), params).fetchone()
         
-        with col1:
-            # Activity by action type
-            st.subheader("Activity by Action Type")
-            action_data = db.execute(text("""
-                SELECT action, COUNT(*) as count 
-                FROM audit_trail 
-                WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
-                GROUP BY action
-                ORDER BY count DESC
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
-            
-            if action_data:
-                df_actions = pd.DataFrame(action_data, columns=['Action', 'Count'])
-                st.bar_chart(df_actions.set_index('Action'))
-            else:
-                st.info("No activity data available.")
+        action_data = db.execute(text("""
+            SELECT action, COUNT(*) as count 
+            FROM audit_trail 
+            WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
+            GROUP BY action
+            ORDER BY count DESC
+        """), params).fetchall()
         
-        with col2:
-            # Activity by table
-            st.subheader("Activity by Table")
-            table_data = db.execute(text("""
-                SELECT table_name, COUNT(*) as count 
-                FROM audit_trail 
-                WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
-                GROUP BY table_name
-                ORDER BY count DESC
-                LIMIT 10
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
-            
-            if table_data:
-                df_tables = pd.DataFrame(table_data, columns=['Table', 'Count'])
-                st.bar_chart(df_tables.set_index('Table'))
-            else:
-                st.info("No table activity data available.")
+        table_data = db.execute(text("""
+            SELECT table_name, COUNT(*) as count 
+            FROM audit_trail 
+            WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
+            GROUP BY table_name
+            ORDER BY count DESC
+            LIMIT 10
+        """), params).fetchall()
         
-        # Daily activity trend
-        st.subheader("📈 Daily Activity Trend")
         daily_data = db.execute(text("""
             SELECT 
                 DATE(timestamp) as activity_date,
@@ -336,16 +360,8 @@ def show_audit_analytics():
             WHERE DATE(timestamp) >= :start_date AND DATE(timestamp) <= :end_date
             GROUP BY DATE(timestamp)
             ORDER BY activity_date
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
-        
-        if daily_data:
-            df_daily = pd.DataFrame(daily_data, columns=['Date', 'Total', 'Creates', 'Updates', 'Deletes'])
-            st.line_chart(df_daily.set_index('Date'))
-        else:
-            st.info("No daily activity data available.")
+        """), params).fetchall()
         
-        # User activity ranking
-        st.subheader("👥 Most Active Users")
         user_data = db.execute(text("""
             SELECT 
                 u.username,
@@ -359,16 +375,8 @@ def show_audit_analytics():
             GROUP BY u.username
             ORDER BY total_actions DESC
             LIMIT 10
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
-        
-        if user_data:
-            df_users = pd.DataFrame(user_data, columns=['User', 'Total Actions', 'Creates', 'Updates', 'Deletes'])
-            st.dataframe(df_users, use_container_width=True)
-        else:
-            st.info("No user activity data available.")
+        """), params).fetchall()
         
-        # Recent high-impact changes
-        st.subheader("🚨 Recent High-Impact Changes")
         high_impact_data = db.execute(text("""
             SELECT 
                 at.table_name,
@@ -380,17 +388,20 @@ def show_audit_analytics():
             LEFT JOIN users u ON at.user_id = u.id
             WHERE DATE(at.timestamp) >= :start_date AND DATE(at.timestamp) <= :end_date
                 AND (at.action = 'DELETE' OR at.table_name IN ('projects', 'work_orders'))
-            ORDER BY at.timestamp DESC
+            ORDER BY at.timestamp DESC, at.id DESC
             LIMIT 20
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
-        
-        if high_impact_data:
-            df_high_impact = pd.DataFrame(high_impact_data, columns=['Table', 'Record ID', 'Action', 'User', 'Timestamp'])
-            st.dataframe(df_high_impact, use_container_width=True)
-        else:
-            st.info("No high-impact changes in the selected period.")
-        
+        """), params).fetchall()
+    finally:
         db.close()
-        
-    except Exception as e:
-        st.error(f"Error loading audit analytics: {str(e)}")
+    
+    return {
+        "total": total_activities,
+        "users": unique_users,
+        "most_active_table": most_active_table[0] if most_active_table else None,
+        "peak_day": peak_day,
+        "actions": pd.DataFrame(action_data, columns=['Action', 'Count']),
+        "tables": pd.DataFrame(table_data, columns=['Table', 'Count']),
+        "daily": pd.DataFrame(daily_data, columns=['Date', 'Total', 'Creates', 'Updates', 'Deletes']),
+        "user_ranking": pd.DataFrame(user_data, columns=['User', 'Total Actions', 'Creates', 'Updates', 'Deletes']),
+        "high_impact": pd.DataFrame(high_impact_data, columns=['Table', 'Record ID', 'Action', 'User', 'Timestamp'])
+    }
@@ -1,19 +1,43 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, log_audit_trail_batch, batch_update_field, fetch_summary, request_analytics_refresh
 from sqlalchemy import text
+from utils.batch_actions import get_selected_ids, clear_selection, store_batch_result, show_batch_result
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.forecasting import get_completion_forecast, FORECAST_WINDOW_DAYS
+
+BALANCE_ORDER_SELECT = """
+    SELECT 
+        bo.id,
+        bo.wo_number,
+        p.name as project_name,
+        bo.floor,
+        bo.priority,
+        bo.specifications,
+        bo.required_qty,
+        bo.fulfilled_qty,
+        bo.total_qty,
+        bo.due_date,
+        bo.status,
+        u.username as created_by,
+        bo.created_at
+    FROM balance_orders bo
+    LEFT JOIN projects p ON bo.project_id = p.id
+    LEFT JOIN users u ON bo.created_by = u.id
+"""
 
 def show():
     st.title("⚖️ Balance Orders")
     
-    tab1, tab2 = st.tabs(["📋 All Balance Orders", "➕ Add Balance Order"])
-    
-    with tab1:
-        show_balance_orders()
-    
-    with tab2:
-        add_balance_order_form()
+    show_lazy_tabs({
+        "📋 All Balance Orders": show_balance_orders,
+        "📈 Forecast": show_completion_forecast,
+        "➕ Add Balance Order": add_balance_order_form
+    }, key="balance_orders_tab")
 
 def show_balance_orders():
     st.subheader("All Balance Orders")
@@ -42,173 +66,271 @@ def show_balance_orders():
     with col4:
         search_term = st.text_input("Search", placeholder="WO number or specifications...", key="balance_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            bo.id,
-            bo.wo_number,
-            p.name as project_name,
-            bo.floor,
-            bo.priority,
-            bo.specifications,
-            bo.required_qty,
-            bo.fulfilled_qty,
-            bo.total_qty,
-            bo.due_date,
-            bo.status,
-            u.username as created_by,
-            bo.created_at
-        FROM balance_orders bo
-        LEFT JOIN projects p ON bo.project_id = p.id
-        LEFT JOIN users u ON bo.created_by = u.id
-        WHERE 1=1
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE 1=1"
     params = {}
     
     if status_filter != "All":
-        query += " AND bo.status = :status"
+        where += " AND bo.status = :status"
         params["status"] = status_filter
     
     if priority_filter != "All":
-        query += " AND bo.priority = :priority"
+        where += " AND bo.priority = :priority"
         params["priority"] = priority_filter
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND bo.project_id = :project_id"
+        where += " AND bo.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if search_term:
-        query += " AND (LOWER(bo.wo_number) LIKE LOWER(:search) OR LOWER(bo.specifications) LIKE LOWER(:search))"
+        where += " AND (LOWER(bo.wo_number) LIKE LOWER(:search) OR LOWER(bo.specifications) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY bo.due_date ASC, bo.priority DESC, bo.created_at DESC"
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        balance_orders = result.fetchall()
-        db.close()
+        summary = fetch_summary("balance_orders bo", where, params, {
+            "total_orders": "COUNT(*)",
+            "pending_orders": "COUNT(*) FILTER (WHERE bo.status = 'Pending')",
+            "high_priority": "COUNT(*) FILTER (WHERE bo.priority = 'High')",
+            "overdue_orders": "COUNT(*) FILTER (WHERE bo.due_date < CURRENT_DATE AND bo.status != 'Completed')",
+        })
         
-        if balance_orders:
+        if summary["total_orders"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_orders = len(balance_orders)
-            pending_orders = len([order for order in balance_orders if order[10] == "Pending"])
-            high_priority = len([order for order in balance_orders if order[4] == "High"])
-            overdue_orders = len([order for order in balance_orders if order[9] and order[9] < date.today() and order[10] != "Completed"])
+            col1.metric("Total Orders", summary["total_orders"])
+            col2.metric("Pending", summary["pending_orders"])
+            col3.metric("High Priority", summary["high_priority"])
+            col4.metric("Overdue", summary["overdue_orders"])
+            
+            order_by = " ORDER BY bo.due_date ASC, bo.priority DESC, bo.created_at DESC, bo.id DESC"
+            show_csv_export("balance_orders", BALANCE_ORDER_SELECT + where + order_by, params, key="balance_export")
+            
+            limit, offset = show_pagination(summary["total_orders"], key="balance_page")
+            
+            query = BALANCE_ORDER_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
             
-            col1.metric("Total Orders", total_orders)
-            col2.metric("Pending", pending_orders)
-            col3.metric("High Priority", high_priority)
-            col4.metric("Overdue", overdue_orders)
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            balance_orders = result.fetchall()
+            db.close()
             
             st.divider()
             
+            # Batch actions on selected rows
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                show_balance_batch_actions(balance_orders)
+            
             # Display balance orders
             for order in balance_orders:
-                with st.container():
-                    # Check if overdue
-                    is_overdue = order[9] and order[9] < date.today() and order[10] != "Completed"
-                    
-                    if is_overdue:
-                        st.error("🚨 OVERDUE ORDER")
-                    
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**WO: {order[1]}**")
-                        st.write(f"Project: {order[2] or 'N/A'}")
-                        st.write(f"Floor: {order[3] or 'N/A'}")
-                        if order[5]:  # Specifications
-                            st.write(f"Specs: {order[5][:60]}{'...' if len(order[5]) > 60 else ''}")
-                    
-                    with col2:
-                        # Priority with color coding
-                        priority_color = {
-                            "High": "🔴",
-                            "Medium": "🟡",
-                            "Low": "🟢"
-                        }
-                        st.write(f"Priority: {priority_color.get(order[4], '⚪')} **{order[4]}**")
-                        
-                        # Status with color coding
-                        status_color = {
-                            "Pending": "🔴",
-                            "In Progress": "🟡",
-                            "Completed": "🟢"
-                        }
-                        st.write(f"Status: {status_color.get(order[10], '⚪')} **{order[10]}**")
-                        st.write(f"Due: {order[9] or 'Not set'}")
-                    
-                    with col3:
-                        # Quantity tracking
-                        required = order[6] or 0
-                        fulfilled = order[7] or 0
-                        total = order[8] or 0
-                        
-                        st.write(f"Required: {required}")
-                        st.write(f"Fulfilled: {fulfilled}")
-                        st.write(f"Total: {total}")
-                        
-                        # Progress bar
-                        if required > 0:
-                            progress = min(fulfilled / required, 1.0)
-                            st.progress(progress)
-                            st.write(f"{progress:.1%} Complete")
-                        
-                        # Quick fulfillment update
-                        if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
-                            new_fulfilled = st.number_input(
-                                "Update Fulfilled",
-                                min_value=0,
-                                value=fulfilled,
-                                key=f"fulfilled_update_{order[0]}"
-                            )
-                            
-                            if new_fulfilled != fulfilled:
-                                if st.button("Update Qty", key=f"update_fulfilled_{order[0]}"):
-                                    if update_fulfilled_quantity(order[0], new_fulfilled, fulfilled):
-                                        st.success("Quantity updated!")
-                                        st.rerun()
-                    
-                    with col4:
-                        # Status update
-                        if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
-                            new_status = st.selectbox(
-                                "Status",
-                                options=["Pending", "In Progress", "Completed"],
-                                index=["Pending", "In Progress", "Completed"].index(order[10]),
-                                key=f"balance_status_update_{order[0]}"
-                            )
-                            
-                            if new_status != order[10]:
-                                if st.button("Update", key=f"update_balance_status_{order[0]}"):
-                                    if update_balance_status(order[0], new_status, order[10]):
-                                        st.success("Status updated!")
-                                        st.rerun()
-                        
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_balance_{order[0]}"):
-                                st.session_state[f"edit_balance_{order[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_balance_{order[0]}"):
-                                if delete_balance_order(order[0]):
-                                    st.success("Balance order deleted!")
-                                    st.rerun()
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_balance_{order[0]}", False):
-                        edit_balance_order_form(order)
-                    
-                    st.divider()
+                reset_row("balance_row", order[0])
+                if st.session_state.user_role in ["Admin", "Project Manager"]:
+                    st.checkbox("Select", key=f"select_balance_{order[0]}")
+                show_balance_order_row(order)
         else:
             st.info("No balance orders found matching the criteria.")
             
     except Exception as e:
         st.error(f"Error loading balance orders: {str(e)}")
 
+def show_completion_forecast():
+    st.subheader("Completion Forecast")
+    st.caption(f"Projected from each order's production rate over the last {FORECAST_WINDOW_DAYS} days, "
+               "weighted towards recent days.")
+    
+    try:
+        forecast = get_completion_forecast()
+    except Exception as e:
+        st.error(f"Error forecasting balance orders: {str(e)}")
+        return
+    
+    if forecast.empty:
+        st.info("No open balance orders to forecast.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Open Orders", len(forecast))
+    with col2:
+        st.metric("At Risk", int((forecast['Risk'] == "At risk").sum()))
+    with col3:
+        st.metric("Stalled", int((forecast['Risk'] == "Stalled").sum()))
+    with col4:
+        st.metric("On Track", int((forecast['Risk'] == "On track").sum()))
+    
+    risk_filter = st.multiselect("Risk", options=["At risk", "Stalled", "On track"],
+                                 default=["At risk", "Stalled"], key="balance_forecast_risk")
+    
+    if risk_filter:
+        forecast = forecast[forecast['Risk'].isin(risk_filter)]
+    
+    st.dataframe(forecast, use_container_width=True, hide_index=True, column_config={
+        "Rate / Day": st.column_config.NumberColumn("Rate / Day", format="%.1f"),
+        "Days Late": st.column_config.NumberColumn("Days Late", help="Projected completion minus due date")
+    })
+
+@st.fragment
+def show_balance_order_row(order):
+    """Render one balance order; its controls rerun only this row"""
+    order = current_row("balance_row", order)
+    if order is None:
+        return
+    
+    with st.container():
+        # Check if overdue
+        is_overdue = order[9] and order[9] < date.today() and order[10] != "Completed"
+        
+        if is_overdue:
+            st.error("🚨 OVERDUE ORDER")
+        
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**WO: {order[1]}**")
+            st.write(f"Project: {order[2] or 'N/A'}")
+            st.write(f"Floor: {order[3] or 'N/A'}")
+            if order[5]:  # Specifications
+                st.write(f"Specs: {order[5][:60]}{'...' if len(order[5]) > 60 else ''}")
+        
+        with col2:
+            # Priority with color coding
+            priority_color = {
+                "High": "🔴",
+                "Medium": "🟡",
+                "Low": "🟢"
+            }
+            st.write(f"Priority: {priority_color.get(order[4], '⚪')} **{order[4]}**")
+            
+            # Status with color coding
+            status_color = {
+                "Pending": "🔴",
+                "In Progress": "🟡",
+                "Completed": "🟢"
+            }
+            st.write(f"Status: {status_color.get(order[10], '⚪')} **{order[10]}**")
+            st.write(f"Due: {order[9] or 'Not set'}")
+        
+        with col3:
+            # Quantity tracking
+            required = order[6] or 0
+            fulfilled = order[7] or 0
+            total = order[8] or 0
+            
+            st.write(f"Required: {required}")
+            st.write(f"Fulfilled: {fulfilled}")
+            st.write(f"Total: {total}")
+            
+            # Progress bar
+            if required > 0:
+                progress = min(fulfilled / required, 1.0)
+                st.progress(progress)
+                st.write(f"{progress:.1%} Complete")
+            
+            # Quick fulfillment update
+            if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
+                new_fulfilled = st.number_input(
+                    "Update Fulfilled",
+                    min_value=0,
+                    value=fulfilled,
+                    key=f"fulfilled_update_{order[0]}"
+                )
+                
+                if new_fulfilled != fulfilled:
+                    if st.button("Update Qty", key=f"update_fulfilled_{order[0]}"):
+                        if update_fulfilled_quantity(order[0], new_fulfilled, fulfilled):
+                            st.success("Quantity updated!")
+                            refresh_row("balance_row", order[0], get_balance_order)
+        
+        with col4:
+            # Status update
+            if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
+                new_status = st.selectbox(
+                    "Status",
+                    options=["Pending", "In Progress", "Completed"],
+                    index=["Pending", "In Progress", "Completed"].index(order[10]),
+                    key=f"balance_status_update_{order[0]}"
+                )
+                
+                if new_status != order[10]:
+                    if st.button("Update", key=f"update_balance_status_{order[0]}"):
+                        if update_balance_status(order[0], new_status, order[10]):
+                            st.success("Status updated!")
+                            refresh_row("balance_row", order[0], get_balance_order)
+            
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_balance_{order[0]}"):
+                    st.session_state[f"edit_balance_{order[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_balance_{order[0]}"):
+                    if delete_balance_order(order[0]):
+                        st.success("Balance order deleted!")
+                        refresh_row("balance_row", order[0], get_balance_order)
+        
+        # Edit form
+        if st.session_state.get(f"edit_balance_{order[0]}", False):
+            edit_balance_order_form(order)
+        
+        st.divider()
+
+def show_balance_batch_actions(balance_orders):
+    """Batch status, priority and fulfilled quantity updates for the selected orders"""
+    record_ids = [order[0] for order in balance_orders]
+    labels = {order[0]: f"WO {order[1]}" for order in balance_orders}
+    
+    show_batch_result("balance_batch_result", labels)
+    
+    selected_ids = get_selected_ids("select_balance", record_ids)
+    selected = [order for order in balance_orders if order[0] in selected_ids]
+    
+    with st.expander(f"⚡ Batch Actions ({len(selected)} selected)", expanded=bool(selected)):
+        col1, col2 = st.columns(2)
+        if col1.button("Select All", key="balance_select_all"):
+            for record_id in record_ids:
+                st.session_state[f"select_balance_{record_id}"] = True
+            st.rerun()
+        if col2.button("Clear Selection", key="balance_clear_selection"):
+            clear_selection("select_balance", record_ids)
+            st.rerun()
+        
+        if not selected:
+            st.info("Tick the orders below to act on several of them at once.")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            batch_status = st.selectbox("Set Status", options=["Pending", "In Progress", "Completed"],
+                                      key="balance_batch_status")
+            if st.button("Apply Status", key="balance_batch_status_apply"):
+                updated_ids, conflicts = batch_update_field(
+                    "balance_orders", "status", batch_status, [(order[0], order[10]) for order in selected]
+                )
+                store_batch_result("balance_batch_result", f"Set status to {batch_status}", updated_ids, conflicts)
+                clear_selection("select_balance", selected_ids)
+                st.rerun()
+        
+        with col2:
+            batch_priority = st.selectbox("Set Priority", options=["High", "Medium", "Low"],
+                                        key="balance_batch_priority")
+            if st.button("Apply Priority", key="balance_batch_priority_apply"):
+                updated_ids, conflicts = batch_update_field(
+                    "balance_orders", "priority", batch_priority, [(order[0], order[4]) for order in selected]
+                )
+                store_batch_result("balance_batch_result", f"Set priority to {batch_priority}", updated_ids, conflicts)
+                clear_selection("select_balance", selected_ids)
+                st.rerun()
+        
+        with col3:
+            batch_quantity = st.number_input("Add Fulfilled Qty", min_value=1, value=1,
+                                           key="balance_batch_fulfilled")
+            if st.button("Apply Quantity", key="balance_batch_fulfilled_apply"):
+                updated_ids, conflicts = add_fulfilled_quantity_batch(selected_ids, batch_quantity)
+                store_batch_result("balance_batch_result", f"Add {batch_quantity} fulfilled", updated_ids, conflicts)
+                clear_selection("select_balance", selected_ids)
+                st.rerun()
+
 def edit_balance_order_form(order):
     st.subheader(f"Edit Balance Order: {order[1]}")
     
@@ -248,12 +370,12 @@ def edit_balance_order_form(order):
                                       specifications, required_qty, fulfilled_qty, total_qty, due_date):
                     st.success("Balance order updated successfully!")
                     st.session_state[f"edit_balance_{order[0]}"] = False
-                    st.rerun()
+                    refresh_row("balance_row", order[0], get_balance_order)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_balance_{order[0]}"] = False
-                st.rerun()
+                refresh_row("balance_row", order[0], get_balance_order)
 
 def add_balance_order_form():
     st.subheader("Add New Balance Order")
@@ -299,6 +421,14 @@ def add_balance_order_form():
                 st.success("Balance order created successfully!")
                 st.rerun()
 
+def get_balance_order(order_id):
+    """Fetch one balance order in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(BALANCE_ORDER_SELECT + " WHERE bo.id = :id"), {"id": order_id}).fetchone()
+    finally:
+        db.close()
+
 def create_balance_order(wo_number, project_id, floor, priority, specifications, required_qty, fulfilled_qty, total_qty, due_date):
     """Create a new balance order"""
     try:
@@ -444,6 +574,58 @@ def update_fulfilled_quantity(order_id, new_quantity, old_quantity):
         st.error(f"Error updating fulfilled quantity: {str(e)}")
         return False
 
+def add_fulfilled_quantity_batch(order_ids, quantity):
+    """Add the same fulfilled quantity to several balance orders in one statement
+    
+    Orders that would go past their required quantity are skipped and reported
+    as conflicts. Returns (updated_ids, conflicts).
+    """
+    try:
+        db = get_db()
+        
+        result = db.execute(text("""
+            UPDATE balance_orders 
+            SET fulfilled_qty = COALESCE(fulfilled_qty, 0) + :quantity, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ANY(:ids)
+                AND (required_qty IS NULL OR COALESCE(fulfilled_qty, 0) + :quantity <= required_qty)
+            RETURNING id, fulfilled_qty - :quantity, fulfilled_qty
+        """), {
+            "quantity": quantity,
+            "ids": list(order_ids)
+        })
+        updated = result.fetchall()
+        
+        log_audit_trail_batch(
+            [("balance_orders", row[0], "UPDATE", "fulfilled_qty", row[1], row[2]) for row in updated],
+            db=db
+        )
+        
+        updated_ids = {row[0] for row in updated}
+        skipped_ids = [order_id for order_id in order_ids if order_id not in updated_ids]
+        remaining = {}
+        if skipped_ids:
+            remaining = dict(db.execute(text("""
+                SELECT id, COALESCE(required_qty, 0) - COALESCE(fulfilled_qty, 0)
+                FROM balance_orders WHERE id = ANY(:ids)
+            """), {"ids": skipped_ids}).fetchall())
+        
+        db.commit()
+        db.close()
+        
+        conflicts = [
+            (order_id, f"only {remaining[order_id]} left to fulfil" if order_id in remaining else "record was deleted")
+            for order_id in skipped_ids
+        ]
+        
+        if updated_ids:
+            request_analytics_refresh()
+        
+        return list(updated_ids), conflicts
+        
+    except Exception as e:
+        st.error(f"Error updating fulfilled quantities: {str(e)}")
+        return [], []
+
 def delete_balance_order(order_id):
     """Delete a balance order"""
     try:
@@ -1,19 +1,40 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, fetch_summary
 from sqlalchemy import text
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+
+CUTTING_ITEM_SELECT = """
+    SELECT 
+        cl.id,
+        cl.order_number,
+        p.name as project_name,
+        cl.floor,
+        cl.description,
+        cl.width,
+        cl.height,
+        cl.quantity,
+        cl.color,
+        cl.status,
+        cl.cut_date,
+        u.username as created_by,
+        cl.created_at
+    FROM cutting_lists cl
+    LEFT JOIN projects p ON cl.project_id = p.id
+    LEFT JOIN users u ON cl.created_by = u.id
+"""
 
 def show():
     st.title("✂️ Cutting Lists")
     
-    tab1, tab2 = st.tabs(["📋 All Cutting Lists", "➕ Add Cutting Item"])
-    
-    with tab1:
-        show_cutting_lists()
-    
-    with tab2:
-        add_cutting_item_form()
+    show_lazy_tabs({
+        "📋 All Cutting Lists": show_cutting_lists,
+        "➕ Add Cutting Item": add_cutting_item_form
+    }, key="cutting_lists_tab")
 
 def show_cutting_lists():
     st.subheader("All Cutting Lists")
@@ -45,140 +66,138 @@ def show_cutting_lists():
     with col4:
         search_term = st.text_input("Search", placeholder="Order number or description...", key="cutting_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            cl.id,
-            cl.order_number,
-            p.name as project_name,
-            cl.floor,
-            cl.description,
-            cl.width,
-            cl.height,
-            cl.quantity,
-            cl.color,
-            cl.status,
-            cl.cut_date,
-            u.username as created_by,
-            cl.created_at
-        FROM cutting_lists cl
-        LEFT JOIN projects p ON cl.project_id = p.id
-        LEFT JOIN users u ON cl.created_by = u.id
-        WHERE 1=1
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE 1=1"
     params = {}
     
     if status_filter != "All":
-        query += " AND cl.status = :status"
+        where += " AND cl.status = :status"
         params["status"] = status_filter
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND cl.project_id = :project_id"
+        where += " AND cl.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if color_filter != "All":
-        query += " AND cl.color = :color"
+        where += " AND cl.color = :color"
         params["color"] = color_filter
     
     if search_term:
-        query += " AND (LOWER(cl.order_number) LIKE LOWER(:search) OR LOWER(cl.description) LIKE LOWER(:search))"
+        where += " AND (LOWER(cl.order_number) LIKE LOWER(:search) OR LOWER(cl.description) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY cl.created_at DESC"
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        cutting_items = result.fetchall()
-        db.close()
+        summary = fetch_summary("cutting_lists cl", where, params, {
+            "total_items": "COUNT(*)",
+            "pending_items": "COUNT(*) FILTER (WHERE cl.status = 'Pending')",
+            "cut_items": "COUNT(*) FILTER (WHERE cl.status = 'Cut')",
+            "total_quantity": "SUM(cl.quantity)",
+        })
         
-        if cutting_items:
+        if summary["total_items"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_items = len(cutting_items)
-            pending_items = len([item for item in cutting_items if item[9] == "Pending"])
-            cut_items = len([item for item in cutting_items if item[9] == "Cut"])
-            total_quantity = sum([item[7] for item in cutting_items if item[7]])
+            col1.metric("Total Items", summary["total_items"])
+            col2.metric("Pending", summary["pending_items"])
+            col3.metric("Cut", summary["cut_items"])
+            col4.metric("Total Quantity", summary["total_quantity"])
             
-            col1.metric("Total Items", total_items)
-            col2.metric("Pending", pending_items)
-            col3.metric("Cut", cut_items)
-            col4.metric("Total Quantity", total_quantity)
+            order_by = " ORDER BY cl.created_at DESC, cl.id DESC"
+            show_csv_export("cutting_lists", CUTTING_ITEM_SELECT + where + order_by, params, key="cutting_export")
+            
+            limit, offset = show_pagination(summary["total_items"], key="cutting_page")
+            
+            query = CUTTING_ITEM_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
+            
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            cutting_items = result.fetchall()
+            db.close()
             
             st.divider()
             
             # Display cutting items
             for item in cutting_items:
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**Order: {item[1]}**")
-                        st.write(f"Project: {item[2] or 'N/A'}")
-                        st.write(f"Floor: {item[3] or 'N/A'}")
-                        if item[4]:  # Description
-                            st.write(f"Description: {item[4][:50]}{'...' if len(item[4]) > 50 else ''}")
-                    
-                    with col2:
-                        st.write(f"Dimensions: {item[5]} x {item[6]}" if item[5] and item[6] else "Dimensions: N/A")
-                        st.write(f"Quantity: {item[7] or 'N/A'}")
-                        st.write(f"Color: {item[8] or 'N/A'}")
-                        
-                        # Status with color coding
-                        status_color = {
-                            "Pending": "🔴",
-                            "Cut": "🟢",
-                            "Re-cut": "🟡"
-                        }
-                        st.write(f"Status: {status_color.get(item[9], '⚪')} **{item[9]}**")
-                    
-                    with col3:
-                        # Status update
-                        if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
-                            new_status = st.selectbox(
-                                "Update Status",
-                                options=["Pending", "Cut", "Re-cut"],
-                                index=["Pending", "Cut", "Re-cut"].index(item[9]),
-                                key=f"cutting_status_update_{item[0]}"
-                            )
-                            
-                            if new_status != item[9]:
-                                if st.button("Update", key=f"update_cutting_status_{item[0]}"):
-                                    if update_cutting_status(item[0], new_status, item[9]):
-                                        st.success("Status updated!")
-                                        st.rerun()
-                            
-                            # Cut date update
-                            if new_status == "Cut" and not item[10]:
-                                cut_date = st.date_input("Cut Date", value=date.today(), key=f"cut_date_{item[0]}")
-                                if st.button("Set Cut Date", key=f"set_cut_date_{item[0]}"):
-                                    if update_cut_date(item[0], cut_date):
-                                        st.success("Cut date updated!")
-                                        st.rerun()
-                    
-                    with col4:
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_cutting_{item[0]}"):
-                                st.session_state[f"edit_cutting_{item[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_cutting_{item[0]}"):
-                                if delete_cutting_item(item[0]):
-                                    st.success("Cutting item deleted!")
-                                    st.rerun()
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_cutting_{item[0]}", False):
-                        edit_cutting_item_form(item)
-                    
-                    st.divider()
+                reset_row("cutting_row", item[0])
+                show_cutting_item_row(item)
         else:
             st.info("No cutting items found matching the criteria.")
             
     except Exception as e:
         st.error(f"Error loading cutting lists: {str(e)}")
 
+@st.fragment
+def show_cutting_item_row(item):
+    """Render one cutting item; its controls rerun only this row"""
+    item = current_row("cutting_row", item)
+    if item is None:
+        return
+    
+    with st.container():
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**Order: {item[1]}**")
+            st.write(f"Project: {item[2] or 'N/A'}")
+            st.write(f"Floor: {item[3] or 'N/A'}")
+            if item[4]:  # Description
+                st.write(f"Description: {item[4][:50]}{'...' if len(item[4]) > 50 else ''}")
+        
+        with col2:
+            st.write(f"Dimensions: {item[5]} x {item[6]}" if item[5] and item[6] else "Dimensions: N/A")
+            st.write(f"Quantity: {item[7] or 'N/A'}")
+            st.write(f"Color: {item[8] or 'N/A'}")
+            
+            # Status with color coding
+            status_color = {
+                "Pending": "🔴",
+                "Cut": "🟢",
+                "Re-cut": "🟡"
+            }
+            st.write(f"Status: {status_color.get(item[9], '⚪')} **{item[9]}**")
+        
+        with col3:
+            # Status update
+            if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
+                new_status = st.selectbox(
+                    "Update Status",
+                    options=["Pending", "Cut", "Re-cut"],
+                    index=["Pending", "Cut", "Re-cut"].index(item[9]),
+                    key=f"cutting_status_update_{item[0]}"
+                )
+                
+                if new_status != item[9]:
+                    if st.button("Update", key=f"update_cutting_status_{item[0]}"):
+                        if update_cutting_status(item[0], new_status, item[9]):
+                            st.success("Status updated!")
+                            refresh_row("cutting_row", item[0], get_cutting_item)
+                
+                # Cut date update
+                if new_status == "Cut" and not item[10]:
+                    cut_date = st.date_input("Cut Date", value=date.today(), key=f"cut_date_{item[0]}")
+                    if st.button("Set Cut Date", key=f"set_cut_date_{item[0]}"):
+                        if update_cut_date(item[0], cut_date):
+                            st.success("Cut date updated!")
+                            refresh_row("cutting_row", item[0], get_cutting_item)
+        
+        with col4:
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_cutting_{item[0]}"):
+                    st.session_state[f"edit_cutting_{item[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_cutting_{item[0]}"):
+                    if delete_cutting_item(item[0]):
+                        st.success("Cutting item deleted!")
+                        refresh_row("cutting_row", item[0], get_cutting_item)
+        
+        # Edit form
+        if st.session_state.get(f"edit_cutting_{item[0]}", False):
+            edit_cutting_item_form(item)
+        
+        st.divider()
+
 def edit_cutting_item_form(item):
     st.subheader(f"Edit Cutting Item: {item[1]}")
     
@@ -215,12 +234,12 @@ def edit_cutting_item_form(item):
                                      width, height, quantity, color):
                     st.success("Cutting item updated successfully!")
                     st.session_state[f"edit_cutting_{item[0]}"] = False
-                    st.rerun()
+                    refresh_row("cutting_row", item[0], get_cutting_item)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_cutting_{item[0]}"] = False
-                st.rerun()
+                refresh_row("cutting_row", item[0], get_cutting_item)
 
 def add_cutting_item_form():
     st.subheader("Add New Cutting Item")
@@ -267,6 +286,14 @@ def add_cutting_item_form():
                 st.success("Cutting item created successfully!")
                 st.rerun()
 
+def get_cutting_item(item_id):
+    """Fetch one cutting item in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(CUTTING_ITEM_SELECT + " WHERE cl.id = :id"), {"id": item_id}).fetchone()
+    finally:
+        db.close()
+
 def create_cutting_item(order_number, project_id, floor, description, width, height, quantity, color):
     """Create a new cutting item"""
     try:
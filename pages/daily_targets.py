@@ -2,22 +2,73 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, date, timedelta
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, batch_update_field, fetch_summary
 from sqlalchemy import text
+from utils.batch_actions import get_selected_ids, clear_selection, store_batch_result, show_batch_result
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.planned_vs_actual import get_target_variance, summarize_variance, sync_target_actuals
+from utils.chart_series import prepare_series, GRAIN_LABELS
+from utils.analytics import show_snapshot_freshness, snapshots_enabled
+
+TARGET_SELECT = """
+    SELECT 
+        dt.id,
+        dt.order_number,
+        p.name as project_name,
+        dt.description,
+        dt.target_quantity,
+        dt.target_date,
+        u.username as assigned_to,
+        dt.status,
+        dt.actual_quantity,
+        dt.completion_date,
+        dt.notes,
+        creator.username as created_by,
+        dt.created_at
+    FROM daily_targets dt
+    LEFT JOIN projects p ON dt.project_id = p.id
+    LEFT JOIN users u ON dt.assigned_to = u.id
+    LEFT JOIN users creator ON dt.created_by = creator.id
+"""
+
+# Every performance figure for a period from one scan of daily_targets. GROUPING()
+# tags each output row with the grouping set it belongs to: bits are set for the
+# columns rolled up, in the order target_date, username, status.
+TARGET_PERFORMANCE_QUERY = """
+    SELECT
+        GROUPING(dt.target_date, u.username, dt.status) as grouping_set,
+        dt.target_date,
+        u.username,
+        dt.status,
+        COUNT(*) as total,
+        COUNT(*) FILTER (WHERE dt.status = 'Completed') as completed,
+        COUNT(*) FILTER (WHERE dt.status = 'Completed'
+                         AND (dt.completion_date IS NULL OR dt.completion_date <= dt.target_date)) as on_time,
+        CAST(AVG(dt.actual_quantity * 100.0 / dt.target_quantity) FILTER (WHERE dt.target_quantity > 0) AS FLOAT) as avg_completion,
+        CAST(AVG(CASE WHEN dt.target_quantity > 0 THEN (dt.actual_quantity * 100.0 / dt.target_quantity) ELSE 0 END) AS FLOAT) as avg_member_completion
+    FROM daily_targets dt
+    LEFT JOIN users u ON dt.assigned_to = u.id
+    WHERE dt.target_date >= :start_date AND dt.target_date <= :end_date
+    GROUP BY GROUPING SETS ((), (dt.target_date), (u.username), (dt.status))
+"""
+
+GROUPING_TOTAL = 7
+GROUPING_BY_DATE = 3
+GROUPING_BY_MEMBER = 5
+GROUPING_BY_STATUS = 6
 
 def show():
     st.title("🎯 Daily Targets")
     
-    tab1, tab2, tab3 = st.tabs(["📋 All Targets", "➕ Add Target", "📊 Performance"])
-    
-    with tab1:
-        show_daily_targets()
-    
-    with tab2:
-        add_daily_target_form()
-    
-    with tab3:
-        show_target_performance()
+    show_lazy_tabs({
+        "📋 All Targets": show_daily_targets,
+        "➕ Add Target": add_daily_target_form,
+        "📊 Performance": show_target_performance,
+        "⚖️ Planned vs Actual": show_planned_vs_actual
+    }, key="daily_targets_tab")
 
 def show_daily_targets():
     st.subheader("Daily Targets")
@@ -55,171 +106,231 @@ def show_daily_targets():
     # Search
     search_term = st.text_input("Search Targets", placeholder="Order number or description...", key="target_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            dt.id,
-            dt.order_number,
-            p.name as project_name,
-            dt.description,
-            dt.target_quantity,
-            dt.target_date,
-            u.username as assigned_to,
-            dt.status,
-            dt.actual_quantity,
-            dt.completion_date,
-            dt.notes,
-            creator.username as created_by,
-            dt.created_at
-        FROM daily_targets dt
-        LEFT JOIN projects p ON dt.project_id = p.id
-        LEFT JOIN users u ON dt.assigned_to = u.id
-        LEFT JOIN users creator ON dt.created_by = creator.id
-        WHERE 1=1
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE 1=1"
     params = {}
     
     if status_filter != "All":
-        query += " AND dt.status = :status"
+        where += " AND dt.status = :status"
         params["status"] = status_filter
     
     if date_filter == "Today":
-        query += " AND dt.target_date = CURRENT_DATE"
+        where += " AND dt.target_date = CURRENT_DATE"
     elif date_filter == "This Week":
-        query += " AND dt.target_date >= CURRENT_DATE AND dt.target_date < CURRENT_DATE + INTERVAL '7 days'"
+        where += " AND dt.target_date >= CURRENT_DATE AND dt.target_date < CURRENT_DATE + INTERVAL '7 days'"
     elif date_filter == "Overdue":
-        query += " AND dt.target_date < CURRENT_DATE AND dt.status != 'Completed'"
+        where += " AND dt.target_date < CURRENT_DATE AND dt.status != 'Completed'"
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND dt.project_id = :project_id"
+        where += " AND dt.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if assigned_filter != "All":
         assigned_id = assigned_filter.split("ID: ")[1].split(")")[0]
-        query += " AND dt.assigned_to = :assigned_to"
+        where += " AND dt.assigned_to = :assigned_to"
         params["assigned_to"] = int(assigned_id)
     
     if search_term:
-        query += " AND (LOWER(dt.order_number) LIKE LOWER(:search) OR LOWER(dt.description) LIKE LOWER(:search))"
+        where += " AND (LOWER(dt.order_number) LIKE LOWER(:search) OR LOWER(dt.description) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY dt.target_date ASC, dt.status ASC, dt.created_at DESC"
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        targets = result.fetchall()
-        db.close()
+        summary = fetch_summary("daily_targets dt", where, params, {
+            "total_targets": "COUNT(*)",
+            "completed_targets": "COUNT(*) FILTER (WHERE dt.status = 'Completed')",
+            "overdue_targets": "COUNT(*) FILTER (WHERE dt.target_date < CURRENT_DATE AND dt.status != 'Completed')",
+            "today_targets": "COUNT(*) FILTER (WHERE dt.target_date = CURRENT_DATE)",
+        })
         
-        if targets:
+        if summary["total_targets"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_targets = len(targets)
-            completed_targets = len([t for t in targets if t[7] == "Completed"])
-            overdue_targets = len([t for t in targets if t[5] and t[5] < date.today() and t[7] != "Completed"])
-            today_targets = len([t for t in targets if t[5] == date.today()])
+            overdue_targets = summary["overdue_targets"]
             
-            col1.metric("Total Targets", total_targets)
-            col2.metric("Completed", completed_targets)
+            col1.metric("Total Targets", summary["total_targets"])
+            col2.metric("Completed", summary["completed_targets"])
             col3.metric("Overdue", overdue_targets, delta=f"-{overdue_targets}" if overdue_targets > 0 else "0")
-            col4.metric("Due Today", today_targets)
+            col4.metric("Due Today", summary["today_targets"])
+            
+            order_by = " ORDER BY dt.target_date ASC, dt.status ASC, dt.created_at DESC, dt.id DESC"
+            show_csv_export("daily_targets", TARGET_SELECT + where + order_by, params, key="target_export")
+            
+            limit, offset = show_pagination(summary["total_targets"], key="target_page")
+            
+            query = TARGET_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
+            
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            targets = result.fetchall()
+            db.close()
             
             st.divider()
             
+            # Batch actions on selected rows
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                show_target_batch_actions(targets, users)
+            
             # Display targets
             for target in targets:
-                with st.container():
-                    # Check if overdue
-                    is_overdue = target[5] and target[5] < date.today() and target[7] != "Completed"
-                    is_today = target[5] == date.today()
-                    
-                    if is_overdue:
-                        st.error("🚨 OVERDUE TARGET")
-                    elif is_today:
-                        st.warning("⏰ DUE TODAY")
-                    
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**Order: {target[1]}**")
-                        st.write(f"Project: {target[2] or 'N/A'}")
-                        if target[3]:  # Description
-                            st.write(f"Description: {target[3][:50]}{'...' if len(target[3]) > 50 else ''}")
-                        st.write(f"Assigned to: {target[6] or 'Unassigned'}")
-                    
-                    with col2:
-                        # Status with color coding
-                        status_color = {
-                            "Not Started": "🔴",
-                            "In Progress": "🟡",
-                            "Completed": "🟢"
-                        }
-                        st.write(f"Status: {status_color.get(target[7], '⚪')} **{target[7]}**")
-                        st.write(f"Target Date: {target[5]}")
-                        st.write(f"Target Qty: {target[4] or 0}")
-                        st.write(f"Actual Qty: {target[8] or 0}")
-                        
-                        # Progress calculation
-                        if target[4] and target[4] > 0:
-                            progress = min((target[8] or 0) / target[4], 1.0)
-                            st.progress(progress)
-                            st.write(f"{progress:.1%} Complete")
-                    
-                    with col3:
-                        # Quick status and quantity update
-                        if (st.session_state.user_role in ["Admin", "Project Manager"] or 
-                            (target[6] and st.session_state.username == target[6])):
-                            
-                            # Status update
-                            new_status = st.selectbox(
-                                "Update Status",
-                                options=["Not Started", "In Progress", "Completed"],
-                                index=["Not Started", "In Progress", "Completed"].index(target[7]),
-                                key=f"target_status_update_{target[0]}"
-                            )
-                            
-                            # Actual quantity update
-                            new_actual_qty = st.number_input(
-                                "Actual Qty",
-                                min_value=0,
-                                value=target[8] or 0,
-                                key=f"actual_qty_update_{target[0]}"
-                            )
-                            
-                            if new_status != target[7] or new_actual_qty != (target[8] or 0):
-                                if st.button("Update Progress", key=f"update_target_progress_{target[0]}"):
-                                    if update_target_progress(target[0], new_status, new_actual_qty, target[7], target[8] or 0):
-                                        st.success("Target updated!")
-                                        st.rerun()
-                    
-                    with col4:
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_target_{target[0]}"):
-                                st.session_state[f"edit_target_{target[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_target_{target[0]}"):
-                                if delete_target(target[0]):
-                                    st.success("Target deleted!")
-                                    st.rerun()
-                        
-                        # Notes display
-                        if target[10]:  # Notes
-                            with st.expander("📝 Notes"):
-                                st.write(target[10])
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_target_{target[0]}", False):
-                        edit_target_form(target)
-                    
-                    st.divider()
+                reset_row("target_row", target[0])
+                if st.session_state.user_role in ["Admin", "Project Manager"]:
+                    st.checkbox("Select", key=f"select_target_{target[0]}")
+                show_target_row(target)
         else:
             st.info("No targets found matching the criteria.")
             
     except Exception as e:
         st.error(f"Error loading targets: {str(e)}")
 
+@st.fragment
+def show_target_row(target):
+    """Render one target; its controls rerun only this row"""
+    target = current_row("target_row", target)
+    if target is None:
+        return
+    
+    with st.container():
+        # Check if overdue
+        is_overdue = target[5] and target[5] < date.today() and target[7] != "Completed"
+        is_today = target[5] == date.today()
+        
+        if is_overdue:
+            st.error("🚨 OVERDUE TARGET")
+        elif is_today:
+            st.warning("⏰ DUE TODAY")
+        
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**Order: {target[1]}**")
+            st.write(f"Project: {target[2] or 'N/A'}")
+            if target[3]:  # Description
+                st.write(f"Description: {target[3][:50]}{'...' if len(target[3]) > 50 else ''}")
+            st.write(f"Assigned to: {target[6] or 'Unassigned'}")
+        
+        with col2:
+            # Status with color coding
+            status_color = {
+                "Not Started": "🔴",
+                "In Progress": "🟡",
+                "Completed": "🟢"
+            }
+            st.write(f"Status: {status_color.get(target[7], '⚪')} **{target[7]}**")
+            st.write(f"Target Date: {target[5]}")
+            st.write(f"Target Qty: {target[4] or 0}")
+            st.write(f"Actual Qty: {target[8] or 0}")
+            
+            # Progress calculation
+            if target[4] and target[4] > 0:
+                progress = min((target[8] or 0) / target[4], 1.0)
+                st.progress(progress)
+                st.write(f"{progress:.1%} Complete")
+        
+        with col3:
+            # Quick status and quantity update
+            if (st.session_state.user_role in ["Admin", "Project Manager"] or 
+                (target[6] and st.session_state.username == target[6])):
+                
+                # Status update
+                new_status = st.selectbox(
+                    "Update Status",
+                    options=["Not Started", "In Progress", "Completed"],
+                    index=["Not Started", "In Progress", "Completed"].index(target[7]),
+                    key=f"target_status_update_{target[0]}"
+                )
+                
+                # Actual quantity update
+                new_actual_qty = st.number_input(
+                    "Actual Qty",
+                    min_value=0,
+                    value=target[8] or 0,
+                    key=f"actual_qty_update_{target[0]}"
+                )
+                
+                if new_status != target[7] or new_actual_qty != (target[8] or 0):
+                    if st.button("Update Progress", key=f"update_target_progress_{target[0]}"):
+                        if update_target_progress(target[0], new_status, new_actual_qty, target[7], target[8] or 0):
+                            st.success("Target updated!")
+                            refresh_row("target_row", target[0], get_target)
+        
+        with col4:
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_target_{target[0]}"):
+                    st.session_state[f"edit_target_{target[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_target_{target[0]}"):
+                    if delete_target(target[0]):
+                        st.success("Target deleted!")
+                        refresh_row("target_row", target[0], get_target)
+            
+            # Notes display
+            if target[10]:  # Notes
+                with st.expander("📝 Notes"):
+                    st.write(target[10])
+        
+        # Edit form
+        if st.session_state.get(f"edit_target_{target[0]}", False):
+            edit_target_form(target)
+        
+        st.divider()
+
+def show_target_batch_actions(targets, users):
+    """Batch status and assignment updates for the selected targets"""
+    record_ids = [target[0] for target in targets]
+    labels = {target[0]: f"Order {target[1]} ({target[5]})" for target in targets}
+    
+    show_batch_result("target_batch_result", labels)
+    
+    selected_ids = get_selected_ids("select_target", record_ids)
+    selected = [target for target in targets if target[0] in selected_ids]
+    
+    with st.expander(f"⚡ Batch Actions ({len(selected)} selected)", expanded=bool(selected)):
+        col1, col2 = st.columns(2)
+        if col1.button("Select All", key="target_select_all"):
+            for record_id in record_ids:
+                st.session_state[f"select_target_{record_id}"] = True
+            st.rerun()
+        if col2.button("Clear Selection", key="target_clear_selection"):
+            clear_selection("select_target", record_ids)
+            st.rerun()
+        
+        if not selected:
+            st.info("Tick the targets below to act on several of them at once.")
+            return
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            batch_status = st.selectbox("Set Status", options=["Not Started", "In Progress", "Completed"],
+                                      key="target_batch_status")
+            if st.button("Apply Status", key="target_batch_status_apply"):
+                # Stamp the completion date on targets that become Completed
+                updated_ids, conflicts = batch_update_field(
+                    "daily_targets", "status", batch_status, [(target[0], target[7]) for target in selected],
+                    extra_set=", completion_date = CASE WHEN :new_value = 'Completed' AND t.status != 'Completed' "
+                              "THEN CURRENT_DATE ELSE t.completion_date END"
+                )
+                store_batch_result("target_batch_result", f"Set status to {batch_status}", updated_ids, conflicts)
+                clear_selection("select_target", selected_ids)
+                st.rerun()
+        
+        with col2:
+            user_options = ["Unassigned"] + [f"{u[1]} (ID: {u[0]})" for u in users]
+            batch_assignee = st.selectbox("Reassign To", options=user_options, key="target_batch_assignee")
+            if st.button("Apply Assignment", key="target_batch_assignee_apply"):
+                assigned_user_id = None if batch_assignee == "Unassigned" else int(batch_assignee.split("ID: ")[1].split(")")[0])
+                # The list query only carries the username, so look up the ids the user saw
+                current_ids = {u[1]: u[0] for u in users}
+                updated_ids, conflicts = batch_update_field(
+                    "daily_targets", "assigned_to", assigned_user_id,
+                    [(target[0], current_ids.get(target[6])) for target in selected]
+                )
+                store_batch_result("target_batch_result", f"Reassign to {batch_assignee}", updated_ids, conflicts)
+                clear_selection("select_target", selected_ids)
+                st.rerun()
+
 def edit_target_form(target):
     st.subheader(f"Edit Target: {target[1]}")
     
@@ -267,12 +378,12 @@ def edit_target_form(target):
                                target_date, assigned_user_id, status, actual_quantity, notes):
                     st.success("Target updated successfully!")
                     st.session_state[f"edit_target_{target[0]}"] = False
-                    st.rerun()
+                    refresh_row("target_row", target[0], get_target)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_target_{target[0]}"] = False
-                st.rerun()
+                refresh_row("target_row", target[0], get_target)
 
 def add_daily_target_form():
     st.subheader("Add New Daily Target")
@@ -323,6 +434,76 @@ def add_daily_target_form():
                 st.success("Target created successfully!")
                 st.rerun()
 
+def show_planned_vs_actual():
+    st.subheader("⚖️ Planned vs Actual")
+    st.caption("Targets are matched to production log entries with the same order number and date.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("From", value=date.today() - timedelta(days=14), key="variance_start")
+    with col2:
+        end_date = st.date_input("To", value=date.today(), key="variance_end")
+    with col3:
+        db = get_db()
+        projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+        db.close()
+        project_options = ["All"] + [f"{p[1]} (ID: {p[0]})" for p in projects]
+        project_filter = st.selectbox("Project", options=project_options, key="variance_project_filter")
+    
+    project_id = None
+    if project_filter != "All":
+        project_id = int(project_filter.split("ID: ")[1].split(")")[0])
+    
+    try:
+        df = get_target_variance(start_date, end_date, project_id)
+        
+        if df.empty:
+            st.info("No targets in the selected period.")
+            return
+        
+        planned = int(df['Planned'].sum())
+        actual = int(df['Actual'].sum())
+        mismatched = int((df['Reported'] != df['Actual']).sum())
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Planned", planned)
+        col2.metric("Actual (logged)", actual, actual - planned)
+        col3.metric("Attainment", f"{(actual / planned * 100):.1f}%" if planned > 0 else "N/A")
+        col4.metric("Reported ≠ Logged", mismatched)
+        
+        if mismatched and st.session_state.user_role in ["Admin", "Project Manager"]:
+            if st.button("🔄 Update target actuals from production log", key="variance_sync"):
+                updated = sync_target_actuals(start_date, end_date, project_id)
+                if updated is not None:
+                    st.success(f"Updated actual quantity on {updated} targets.")
+                    st.rerun()
+        
+        st.divider()
+        
+        # Day-by-day planned vs actual
+        by_day = summarize_variance(df, 'Date').sort_values('Date')
+        fig_day = px.bar(by_day.melt(id_vars='Date', value_vars=['Planned', 'Actual'],
+                                     var_name='Series', value_name='Quantity'),
+                         x='Date', y='Quantity', color='Series', barmode='group',
+                         title="Planned vs Actual by Day")
+        st.plotly_chart(fig_day, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("👥 By Operator")
+            st.dataframe(summarize_variance(df, 'Operator'), use_container_width=True, hide_index=True)
+        
+        with col2:
+            st.subheader("🏗️ By Project")
+            st.dataframe(summarize_variance(df, 'Project'), use_container_width=True, hide_index=True)
+        
+        st.subheader("📋 By Order")
+        st.dataframe(summarize_variance(df, ['Order Number', 'Project']), use_container_width=True, hide_index=True)
+        
+    except Exception as e:
+        st.error(f"Error loading planned vs actual: {str(e)}")
+
 def show_target_performance():
     st.subheader("📊 Target Performance Analytics")
     
@@ -334,37 +515,22 @@ def show_target_performance():
         end_date = st.date_input("Analysis To", value=date.today(), key="perf_end")
     
     try:
-        db = get_db()
+        if snapshots_enabled():
+            from utils.snapshots import target_performance
+            
+            show_snapshot_freshness(key="sync_targets_snapshot")
+            performance = target_performance(start_date, end_date)
+        else:
+            performance = get_target_performance(start_date, end_date)
+        totals = performance["totals"]
         
         # Overall performance metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        # Total targets in period
-        total_targets = db.execute(text("""
-            SELECT COUNT(*) FROM daily_targets 
-            WHERE target_date >= :start_date AND target_date <= :end_date
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
-        
-        # Completed targets
-        completed_targets = db.execute(text("""
-            SELECT COUNT(*) FROM daily_targets 
-            WHERE target_date >= :start_date AND target_date <= :end_date AND status = 'Completed'
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
-        
-        # On-time completion rate
-        on_time_completed = db.execute(text("""
-            SELECT COUNT(*) FROM daily_targets 
-            WHERE target_date >= :start_date AND target_date <= :end_date 
-                AND status = 'Completed' 
-                AND (completion_date IS NULL OR completion_date <= target_date)
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
-        
-        # Average completion rate
-        completion_data = db.execute(text("""
-            SELECT AVG(CASE WHEN target_quantity > 0 THEN (actual_quantity * 100.0 / target_quantity) ELSE 0 END) 
-            FROM daily_targets 
-            WHERE target_date >= :start_date AND target_date <= :end_date AND target_quantity > 0
-        """), {"start_date": start_date, "end_date": end_date}).fetchone()[0]
+        total_targets = totals["total"]
+        completed_targets = totals["completed"]
+        on_time_completed = totals["on_time"]
+        completion_data = totals["avg_completion"]
         
         col1.metric("Total Targets", total_targets)
         col2.metric("Completed", completed_targets, f"{(completed_targets/total_targets*100):.1f}%" if total_targets > 0 else "0%")
@@ -378,23 +544,14 @@ def show_target_performance():
         with col1:
             # Targets completion trend
             st.subheader("📈 Daily Completion Trend")
-            trend_data = db.execute(text("""
-                SELECT 
-                    target_date,
-                    COUNT(*) as total_targets,
-                    COUNT(CASE WHEN status = 'Completed' THEN 1 END) as completed_targets
-                FROM daily_targets 
-                WHERE target_date >= :start_date AND target_date <= :end_date
-                GROUP BY target_date
-                ORDER BY target_date
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
+            df_trend = performance["trend"]
             
-            if trend_data:
-                df_trend = pd.DataFrame(trend_data, columns=['Date', 'Total Targets', 'Completed Targets'])
+            if not df_trend.empty:
+                df_trend, grain = prepare_series(df_trend, 'Date', start_date, end_date)
                 df_trend['Completion Rate'] = (df_trend['Completed Targets'] / df_trend['Total Targets'] * 100).round(1)
                 
                 fig_trend = px.line(df_trend, x='Date', y='Completion Rate',
-                                   title="Daily Completion Rate (%)",
+                                   title=f"{GRAIN_LABELS[grain]} Completion Rate (%)",
                                    markers=True)
                 st.plotly_chart(fig_trend, use_container_width=True)
             else:
@@ -403,21 +560,9 @@ def show_target_performance():
         with col2:
             # Performance by team member
             st.subheader("👥 Performance by Team Member")
-            member_data = db.execute(text("""
-                SELECT 
-                    u.username,
-                    COUNT(dt.id) as total_assigned,
-                    COUNT(CASE WHEN dt.status = 'Completed' THEN 1 END) as completed,
-                    AVG(CASE WHEN dt.target_quantity > 0 THEN (dt.actual_quantity * 100.0 / dt.target_quantity) ELSE 0 END) as avg_completion_rate
-                FROM daily_targets dt
-                JOIN users u ON dt.assigned_to = u.id
-                WHERE dt.target_date >= :start_date AND dt.target_date <= :end_date
-                GROUP BY u.username
-                ORDER BY completed DESC
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
+            df_member = performance["members"]
             
-            if member_data:
-                df_member = pd.DataFrame(member_data, columns=['Team Member', 'Total Assigned', 'Completed', 'Avg Completion %'])
+            if not df_member.empty:
                 df_member['Completion Rate %'] = (df_member['Completed'] / df_member['Total Assigned'] * 100).round(1)
                 st.dataframe(df_member, use_container_width=True)
             else:
@@ -425,28 +570,74 @@ def show_target_performance():
         
         # Status distribution
         st.subheader("📊 Target Status Distribution")
-        status_data = db.execute(text("""
-            SELECT 
-                status,
-                COUNT(*) as count
-            FROM daily_targets 
-            WHERE target_date >= :start_date AND target_date <= :end_date
-            GROUP BY status
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
-        
-        if status_data:
-            df_status = pd.DataFrame(status_data, columns=['Status', 'Count'])
+        df_status = performance["status"]
+        
+        if not df_status.empty:
             fig_status = px.pie(df_status, values='Count', names='Status',
                                title="Target Status Distribution")
             st.plotly_chart(fig_status, use_container_width=True)
         else:
             st.info("No status distribution data available.")
         
-        db.close()
-        
     except Exception as e:
         st.error(f"Error loading performance analytics: {str(e)}")
 
+def get_target_performance(start_date, end_date):
+    """Compute every performance figure for the period in one scan of daily_targets
+    
+    Returns a dict with "totals" (total, completed, on_time, avg_completion) and
+    the "trend", "members" and "status" DataFrames behind the charts.
+    """
+    db = get_db()
+    try:
+        rows = db.execute(text(TARGET_PERFORMANCE_QUERY), {"start_date": start_date, "end_date": end_date}).fetchall()
+    finally:
+        db.close()
+    
+    df = pd.DataFrame(rows, columns=[
+        'grouping_set', 'target_date', 'username', 'status',
+        'total', 'completed', 'on_time', 'avg_completion', 'avg_member_completion'
+    ])
+    
+    # The grand total row is always present, even for an empty period
+    totals = df[df['grouping_set'] == GROUPING_TOTAL].iloc[0]
+    
+    trend = df[df['grouping_set'] == GROUPING_BY_DATE].sort_values('target_date')
+    members = df[(df['grouping_set'] == GROUPING_BY_MEMBER) & df['username'].notna()].sort_values('completed', ascending=False)
+    status = df[df['grouping_set'] == GROUPING_BY_STATUS]
+    
+    return {
+        "totals": {
+            "total": int(totals['total']),
+            "completed": int(totals['completed']),
+            "on_time": int(totals['on_time']),
+            "avg_completion": totals['avg_completion']
+        },
+        "trend": pd.DataFrame({
+            'Date': trend['target_date'],
+            'Total Targets': trend['total'],
+            'Completed Targets': trend['completed']
+        }).reset_index(drop=True),
+        "members": pd.DataFrame({
+            'Team Member': members['username'],
+            'Total Assigned': members['total'],
+            'Completed': members['completed'],
+            'Avg Completion %': members['avg_member_completion']
+        }).reset_index(drop=True),
+        "status": pd.DataFrame({
+            'Status': status['status'],
+            'Count': status['total']
+        }).reset_index(drop=True)
+    }
+
+def get_target(target_id):
+    """Fetch one target in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(TARGET_SELECT + " WHERE dt.id = :id"), {"id": target_id}).fetchone()
+    finally:
+        db.close()
+
 def create_target(order_number, project_id, description, target_quantity, target_date, assigned_to, status, actual_quantity, notes):
     """Create a new daily target"""
     try:
@@ -6,42 +6,110 @@ from datetime import datetime, timedelta
 from database import get_db
 from sqlalchemy import text
 
+# Every dashboard figure in one statement, so a render costs a single round trip.
+# Row sets come back as JSON arrays and are turned into DataFrames in Python.
+DASHBOARD_QUERY = """
+    WITH wo_status AS (
+        SELECT status, COUNT(*) as count
+        FROM work_orders
+        GROUP BY status
+    ),
+    weekly_production AS (
+        SELECT 
+            DATE_TRUNC('week', production_date) as week,
+            SUM(total_quantity) as total_produced
+        FROM production_daily_rollup 
+        WHERE production_date >= CURRENT_DATE - INTERVAL '8 weeks'
+        GROUP BY week
+    ),
+    recent_work_orders AS (
+        SELECT 
+            wo.wo_number,
+            p.name as project_name,
+            wo.wo_type,
+            wo.status,
+            wo.priority,
+            u.username as assigned_to,
+            wo.created_at
+        FROM work_orders wo
+        LEFT JOIN projects p ON wo.project_id = p.id
+        LEFT JOIN users u ON wo.assigned_to = u.id
+        ORDER BY wo.created_at DESC
+        LIMIT 10
+    ),
+    todays_targets AS (
+        SELECT 
+            dt.order_number,
+            p.name as project_name,
+            dt.description,
+            dt.target_quantity,
+            dt.actual_quantity,
+            dt.status,
+            u.username as assigned_to
+        FROM daily_targets dt
+        LEFT JOIN projects p ON dt.project_id = p.id
+        LEFT JOIN users u ON dt.assigned_to = u.id
+        WHERE dt.target_date = CURRENT_DATE
+    )
+    SELECT
+        (SELECT COUNT(*) FROM projects WHERE status = 'Active') as active_projects,
+        (SELECT COALESCE(SUM(count), 0) FROM wo_status WHERE status = 'Pending') as pending_wo,
+        (SELECT COUNT(*) FROM todays_targets WHERE status != 'Completed') as todays_pending_targets,
+        (SELECT COUNT(*) FROM balance_orders WHERE status = 'Pending') as pending_balance_orders,
+        (SELECT COALESCE(json_agg(json_build_array(status, count)), '[]') FROM wo_status) as wo_status,
+        (SELECT COALESCE(json_agg(json_build_array(week, total_produced) ORDER BY week), '[]')
+         FROM weekly_production) as weekly_production,
+        (SELECT COALESCE(json_agg(json_build_array(wo_number, project_name, wo_type, status, priority,
+                                                   assigned_to, created_at) ORDER BY created_at DESC), '[]')
+         FROM recent_work_orders) as recent_work_orders,
+        (SELECT COALESCE(json_agg(json_build_array(order_number, project_name, description, target_quantity,
+                                                   actual_quantity, status, assigned_to) ORDER BY status ASC), '[]')
+         FROM todays_targets) as todays_targets
+"""
+
+def get_dashboard_data():
+    """Fetch all dashboard KPIs and chart data with a single query"""
+    db = get_db()
+    try:
+        row = db.execute(text(DASHBOARD_QUERY)).fetchone()
+    finally:
+        db.close()
+    
+    df_wo = pd.DataFrame(row[4], columns=['Status', 'Count'])
+    df_prod = pd.DataFrame(row[5], columns=['Week', 'Total Produced'])
+    df_prod['Week'] = pd.to_datetime(df_prod['Week'])
+    df_recent = pd.DataFrame(row[6], columns=[
+        'WO Number', 'Project', 'Type', 'Status', 'Priority', 'Assigned To', 'Created At'
+    ])
+    df_recent['Created At'] = pd.to_datetime(df_recent['Created At'])
+    df_targets = pd.DataFrame(row[7], columns=[
+        'Order Number', 'Project', 'Description', 'Target Qty', 'Actual Qty', 'Status', 'Assigned To'
+    ])
+    
+    return {
+        "active_projects": row[0],
+        "pending_wo": row[1],
+        "todays_targets": row[2],
+        "balance_orders": row[3],
+        "wo_status": df_wo,
+        "weekly_production": df_prod,
+        "recent_work_orders": df_recent,
+        "todays_target_list": df_targets
+    }
+
 def show():
     st.title("📊 Dashboard")
     
-    # Fetch dashboard data
-    db = get_db()
-    
     try:
+        data = get_dashboard_data()
+        
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        with col1:
-            # Total Projects
-            result = db.execute(text("SELECT COUNT(*) FROM projects WHERE status = 'Active'"))
-            active_projects = result.fetchone()[0]
-            st.metric("Active Projects", active_projects)
-        
-        with col2:
-            # Pending Work Orders
-            result = db.execute(text("SELECT COUNT(*) FROM work_orders WHERE status = 'Pending'"))
-            pending_wo = result.fetchone()[0]
-            st.metric("Pending Work Orders", pending_wo)
-        
-        with col3:
-            # Today's Targets
-            result = db.execute(text("""
-                SELECT COUNT(*) FROM daily_targets 
-                WHERE target_date = CURRENT_DATE AND status != 'Completed'
-            """))
-            todays_targets = result.fetchone()[0]
-            st.metric("Today's Pending Targets", todays_targets)
-        
-        with col4:
-            # Balance Orders
-            result = db.execute(text("SELECT COUNT(*) FROM balance_orders WHERE status = 'Pending'"))
-            balance_orders = result.fetchone()[0]
-            st.metric("Pending Balance Orders", balance_orders)
+        col1.metric("Active Projects", data["active_projects"])
+        col2.metric("Pending Work Orders", data["pending_wo"])
+        col3.metric("Today's Pending Targets", data["todays_targets"])
+        col4.metric("Pending Balance Orders", data["balance_orders"])
         
         st.divider()
         
@@ -50,14 +118,9 @@ def show():
         
         with col1:
             st.subheader("Work Orders by Status")
-            wo_status_data = db.execute(text("""
-                SELECT status, COUNT(*) as count 
-                FROM work_orders 
-                GROUP BY status
-            """)).fetchall()
+            df_wo = data["wo_status"]
             
-            if wo_status_data:
-                df_wo = pd.DataFrame(wo_status_data, columns=['Status', 'Count'])
+            if not df_wo.empty:
                 fig_wo = px.pie(df_wo, values='Count', names='Status', 
                                title="Work Orders Distribution")
                 st.plotly_chart(fig_wo, use_container_width=True)
@@ -66,18 +129,9 @@ def show():
         
         with col2:
             st.subheader("Production by Week")
-            production_data = db.execute(text("""
-                SELECT 
-                    DATE_TRUNC('week', production_date) as week,
-                    SUM(produced_quantity) as total_produced
-                FROM production_log 
-                WHERE production_date >= CURRENT_DATE - INTERVAL '8 weeks'
-                GROUP BY week
-                ORDER BY week
-            """)).fetchall()
+            df_prod = data["weekly_production"]
             
-            if production_data:
-                df_prod = pd.DataFrame(production_data, columns=['Week', 'Total Produced'])
+            if not df_prod.empty:
                 fig_prod = px.bar(df_prod, x='Week', y='Total Produced',
                                  title="Weekly Production Trend")
                 st.plotly_chart(fig_prod, use_container_width=True)
@@ -86,57 +140,21 @@ def show():
         
         # Recent activity
         st.subheader("📋 Recent Work Orders")
-        recent_wo = db.execute(text("""
-            SELECT 
-                wo.wo_number,
-                p.name as project_name,
-                wo.wo_type,
-                wo.status,
-                wo.priority,
-                u.username as assigned_to,
-                wo.created_at
-            FROM work_orders wo
-            LEFT JOIN projects p ON wo.project_id = p.id
-            LEFT JOIN users u ON wo.assigned_to = u.id
-            ORDER BY wo.created_at DESC
-            LIMIT 10
-        """)).fetchall()
+        df_recent = data["recent_work_orders"]
         
-        if recent_wo:
-            df_recent = pd.DataFrame(recent_wo, columns=[
-                'WO Number', 'Project', 'Type', 'Status', 'Priority', 'Assigned To', 'Created At'
-            ])
+        if not df_recent.empty:
             st.dataframe(df_recent, use_container_width=True)
         else:
             st.info("No recent work orders")
         
         # Today's targets
         st.subheader("🎯 Today's Targets")
-        todays_targets_data = db.execute(text("""
-            SELECT 
-                dt.order_number,
-                p.name as project_name,
-                dt.description,
-                dt.target_quantity,
-                dt.actual_quantity,
-                dt.status,
-                u.username as assigned_to
-            FROM daily_targets dt
-            LEFT JOIN projects p ON dt.project_id = p.id
-            LEFT JOIN users u ON dt.assigned_to = u.id
-            WHERE dt.target_date = CURRENT_DATE
-            ORDER BY dt.status ASC
-        """)).fetchall()
+        df_targets = data["todays_target_list"]
         
-        if todays_targets_data:
-            df_targets = pd.DataFrame(todays_targets_data, columns=[
-                'Order Number', 'Project', 'Description', 'Target Qty', 'Actual Qty', 'Status', 'Assigned To'
-            ])
+        if not df_targets.empty:
             st.dataframe(df_targets, use_container_width=True)
         else:
             st.info("No targets for today")
             
     except Exception as e:
         st.error(f"Error loading dashboard: {str(e)}")
-    finally:
-        db.close()
@@ -1,20 +1,44 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, create_record, fetch_summary
 from sqlalchemy import text
 from utils.reports import generate_delivery_challan
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.report_jobs import show_report_job
+
+DISPATCH_SELECT = """
+    SELECT 
+        d.id,
+        p.name as project_name,
+        d.order_number,
+        d.vehicle_number,
+        d.driver_name,
+        d.dispatch_date,
+        d.delivery_date,
+        d.status,
+        u.username as responsible_person,
+        d.challan_number,
+        d.notes,
+        creator.username as created_by,
+        d.created_at
+    FROM dispatch d
+    LEFT JOIN projects p ON d.project_id = p.id
+    LEFT JOIN users u ON d.responsible_person = u.id
+    LEFT JOIN users creator ON d.created_by = creator.id
+"""
 
 def show():
     st.title("🚚 Dispatch & Delivery")
     
-    tab1, tab2 = st.tabs(["📋 Dispatch Records", "➕ Add Dispatch"])
-    
-    with tab1:
-        show_dispatch_records()
-    
-    with tab2:
-        add_dispatch_form()
+    show_lazy_tabs({
+        "📋 Dispatch Records": show_dispatch_records,
+        "➕ Add Dispatch": add_dispatch_form,
+        "🖨️ Bulk Challans": show_bulk_challans
+    }, key="dispatch_tab")
 
 def show_dispatch_records():
     st.subheader("Dispatch Records")
@@ -44,169 +68,168 @@ def show_dispatch_records():
     with col4:
         search_term = st.text_input("Search", placeholder="Order number, vehicle, or challan...", key="dispatch_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            d.id,
-            p.name as project_name,
-            d.order_number,
-            d.vehicle_number,
-            d.driver_name,
-            d.dispatch_date,
-            d.delivery_date,
-            d.status,
-            u.username as responsible_person,
-            d.challan_number,
-            d.notes,
-            creator.username as created_by,
-            d.created_at
-        FROM dispatch d
-        LEFT JOIN projects p ON d.project_id = p.id
-        LEFT JOIN users u ON d.responsible_person = u.id
-        LEFT JOIN users creator ON d.created_by = creator.id
-        WHERE 1=1
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE 1=1"
     params = {}
     
     if status_filter != "All":
-        query += " AND d.status = :status"
+        where += " AND d.status = :status"
         params["status"] = status_filter
     
     if date_range == "Today":
-        query += " AND d.dispatch_date = CURRENT_DATE"
+        where += " AND d.dispatch_date = CURRENT_DATE"
     elif date_range == "This Week":
-        query += " AND d.dispatch_date >= CURRENT_DATE - INTERVAL '7 days'"
+        where += " AND d.dispatch_date >= CURRENT_DATE - INTERVAL '7 days'"
     elif date_range == "This Month":
-        query += " AND d.dispatch_date >= CURRENT_DATE - INTERVAL '30 days'"
+        where += " AND d.dispatch_date >= CURRENT_DATE - INTERVAL '30 days'"
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND d.project_id = :project_id"
+        where += " AND d.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if search_term:
-        query += " AND (LOWER(d.order_number) LIKE LOWER(:search) OR LOWER(d.vehicle_number) LIKE LOWER(:search) OR LOWER(d.challan_number) LIKE LOWER(:search))"
+        where += " AND (LOWER(d.order_number) LIKE LOWER(:search) OR LOWER(d.vehicle_number) LIKE LOWER(:search) OR LOWER(d.challan_number) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY d.dispatch_date DESC, d.created_at DESC"
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        dispatch_records = result.fetchall()
-        db.close()
+        summary = fetch_summary("dispatch d", where, params, {
+            "total_dispatches": "COUNT(*)",
+            "delivered_count": "COUNT(*) FILTER (WHERE d.status = 'Delivered')",
+            "in_transit_count": "COUNT(*) FILTER (WHERE d.status = 'In Transit')",
+            "delayed_count": "COUNT(*) FILTER (WHERE d.status = 'Delayed')",
+        })
         
-        if dispatch_records:
+        if summary["total_dispatches"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_dispatches = len(dispatch_records)
-            delivered_count = len([d for d in dispatch_records if d[7] == "Delivered"])
-            in_transit_count = len([d for d in dispatch_records if d[7] == "In Transit"])
-            delayed_count = len([d for d in dispatch_records if d[7] == "Delayed"])
+            delayed_count = summary["delayed_count"]
             
-            col1.metric("Total Dispatches", total_dispatches)
-            col2.metric("Delivered", delivered_count)
-            col3.metric("In Transit", in_transit_count)
+            col1.metric("Total Dispatches", summary["total_dispatches"])
+            col2.metric("Delivered", summary["delivered_count"])
+            col3.metric("In Transit", summary["in_transit_count"])
             col4.metric("Delayed", delayed_count, delta=f"+{delayed_count}" if delayed_count > 0 else "0")
             
+            order_by = " ORDER BY d.dispatch_date DESC, d.created_at DESC, d.id DESC"
+            show_csv_export("dispatch", DISPATCH_SELECT + where + order_by, params, key="dispatch_export")
+            
+            limit, offset = show_pagination(summary["total_dispatches"], key="dispatch_page")
+            
+            query = DISPATCH_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
+            
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            dispatch_records = result.fetchall()
+            db.close()
+            
             st.divider()
             
             # Display dispatch records
             for dispatch in dispatch_records:
-                with st.container():
-                    # Highlight delayed or overdue deliveries
-                    is_delayed = dispatch[7] == "Delayed"
-                    is_overdue = dispatch[6] and dispatch[6] < date.today() and dispatch[7] not in ["Delivered"]
-                    
-                    if is_delayed:
-                        st.error("🚨 DELAYED DISPATCH")
-                    elif is_overdue:
-                        st.warning("⏰ OVERDUE DELIVERY")
-                    
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**Order: {dispatch[2]}**")
-                        st.write(f"Project: {dispatch[1] or 'N/A'}")
-                        st.write(f"Vehicle: {dispatch[3] or 'N/A'}")
-                        st.write(f"Driver: {dispatch[4] or 'N/A'}")
-                        if dispatch[9]:  # Challan number
-                            st.write(f"Challan: {dispatch[9]}")
-                    
-                    with col2:
-                        # Status with color coding
-                        status_color = {
-                            "Dispatched": "🟡",
-                            "In Transit": "🔵",
-                            "Delivered": "🟢",
-                            "Delayed": "🔴"
-                        }
-                        st.write(f"Status: {status_color.get(dispatch[7], '⚪')} **{dispatch[7]}**")
-                        st.write(f"Dispatch Date: {dispatch[5]}")
-                        st.write(f"Expected Delivery: {dispatch[6] or 'Not set'}")
-                        st.write(f"Responsible: {dispatch[8] or 'N/A'}")
-                    
-                    with col3:
-                        # Status update
-                        if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
-                            new_status = st.selectbox(
-                                "Update Status",
-                                options=["Dispatched", "In Transit", "Delivered", "Delayed"],
-                                index=["Dispatched", "In Transit", "Delivered", "Delayed"].index(dispatch[7]),
-                                key=f"dispatch_status_update_{dispatch[0]}"
-                            )
-                            
-                            if new_status != dispatch[7]:
-                                if st.button("Update Status", key=f"update_dispatch_status_{dispatch[0]}"):
-                                    if update_dispatch_status(dispatch[0], new_status, dispatch[7]):
-                                        st.success("Status updated!")
-                                        st.rerun()
-                        
-                        # Quick delivery date update
-                        if dispatch[7] == "Delivered" and not dispatch[6]:
-                            if st.button("Set Delivery Date", key=f"set_delivery_date_{dispatch[0]}"):
-                                if update_delivery_date(dispatch[0], date.today()):
-                                    st.success("Delivery date set!")
-                                    st.rerun()
-                    
-                    with col4:
-                        # Generate challan
-                        if st.button("📄 Challan", key=f"generate_challan_{dispatch[0]}"):
-                            challan_content = generate_delivery_challan(dispatch)
-                            st.download_button(
-                                "📥 Download Challan",
-                                data=challan_content,
-                                file_name=f"challan_{dispatch[2]}_{dispatch[5]}.txt",
-                                mime="text/plain",
-                                key=f"download_challan_{dispatch[0]}"
-                            )
-                        
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_dispatch_{dispatch[0]}"):
-                                st.session_state[f"edit_dispatch_{dispatch[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_dispatch_{dispatch[0]}"):
-                                if delete_dispatch_record(dispatch[0]):
-                                    st.success("Dispatch record deleted!")
-                                    st.rerun()
-                        
-                        # Notes display
-                        if dispatch[10]:  # Notes
-                            with st.expander("📝 Notes"):
-                                st.write(dispatch[10])
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_dispatch_{dispatch[0]}", False):
-                        edit_dispatch_form(dispatch)
-                    
-                    st.divider()
+                reset_row("dispatch_row", dispatch[0])
+                show_dispatch_row(dispatch)
         else:
             st.info("No dispatch records found matching the criteria.")
             
     except Exception as e:
         st.error(f"Error loading dispatch records: {str(e)}")
 
+@st.fragment
+def show_dispatch_row(dispatch):
+    """Render one dispatch record; its controls rerun only this row"""
+    dispatch = current_row("dispatch_row", dispatch)
+    if dispatch is None:
+        return
+    
+    with st.container():
+        # Highlight delayed or overdue deliveries
+        is_delayed = dispatch[7] == "Delayed"
+        is_overdue = dispatch[6] and dispatch[6] < date.today() and dispatch[7] not in ["Delivered"]
+        
+        if is_delayed:
+            st.error("🚨 DELAYED DISPATCH")
+        elif is_overdue:
+            st.warning("⏰ OVERDUE DELIVERY")
+        
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**Order: {dispatch[2]}**")
+            st.write(f"Project: {dispatch[1] or 'N/A'}")
+            st.write(f"Vehicle: {dispatch[3] or 'N/A'}")
+            st.write(f"Driver: {dispatch[4] or 'N/A'}")
+            if dispatch[9]:  # Challan number
+                st.write(f"Challan: {dispatch[9]}")
+        
+        with col2:
+            # Status with color coding
+            status_color = {
+                "Dispatched": "🟡",
+                "In Transit": "🔵",
+                "Delivered": "🟢",
+                "Delayed": "🔴"
+            }
+            st.write(f"Status: {status_color.get(dispatch[7], '⚪')} **{dispatch[7]}**")
+            st.write(f"Dispatch Date: {dispatch[5]}")
+            st.write(f"Expected Delivery: {dispatch[6] or 'Not set'}")
+            st.write(f"Responsible: {dispatch[8] or 'N/A'}")
+        
+        with col3:
+            # Status update
+            if st.session_state.user_role in ["Admin", "Project Manager", "Operator"]:
+                new_status = st.selectbox(
+                    "Update Status",
+                    options=["Dispatched", "In Transit", "Delivered", "Delayed"],
+                    index=["Dispatched", "In Transit", "Delivered", "Delayed"].index(dispatch[7]),
+                    key=f"dispatch_status_update_{dispatch[0]}"
+                )
+                
+                if new_status != dispatch[7]:
+                    if st.button("Update Status", key=f"update_dispatch_status_{dispatch[0]}"):
+                        if update_dispatch_status(dispatch[0], new_status, dispatch[7]):
+                            st.success("Status updated!")
+                            refresh_row("dispatch_row", dispatch[0], get_dispatch_record)
+            
+            # Quick delivery date update
+            if dispatch[7] == "Delivered" and not dispatch[6]:
+                if st.button("Set Delivery Date", key=f"set_delivery_date_{dispatch[0]}"):
+                    if update_delivery_date(dispatch[0], date.today()):
+                        st.success("Delivery date set!")
+                        refresh_row("dispatch_row", dispatch[0], get_dispatch_record)
+        
+        with col4:
+            # Generate challan
+            if st.button("📄 Challan", key=f"generate_challan_{dispatch[0]}"):
+                challan_content = generate_delivery_challan(dispatch)
+                st.download_button(
+                    "📥 Download Challan",
+                    data=challan_content,
+                    file_name=f"challan_{dispatch[2]}_{dispatch[5]}.txt",
+                    mime="text/plain",
+                    key=f"download_challan_{dispatch[0]}"
+                )
+            
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_dispatch_{dispatch[0]}"):
+                    st.session_state[f"edit_dispatch_{dispatch[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_dispatch_{dispatch[0]}"):
+                    if delete_dispatch_record(dispatch[0]):
+                        st.success("Dispatch record deleted!")
+                        refresh_row("dispatch_row", dispatch[0], get_dispatch_record)
+            
+            # Notes display
+            if dispatch[10]:  # Notes
+                with st.expander("📝 Notes"):
+                    st.write(dispatch[10])
+        
+        # Edit form
+        if st.session_state.get(f"edit_dispatch_{dispatch[0]}", False):
+            edit_dispatch_form(dispatch)
+        
+        st.divider()
+
 def edit_dispatch_form(dispatch):
     st.subheader(f"Edit Dispatch: {dispatch[2]}")
     
@@ -254,12 +277,48 @@ def edit_dispatch_form(dispatch):
                                         dispatch_date, delivery_date, status, responsible_id, challan_number, notes):
                     st.success("Dispatch record updated successfully!")
                     st.session_state[f"edit_dispatch_{dispatch[0]}"] = False
-                    st.rerun()
+                    refresh_row("dispatch_row", dispatch[0], get_dispatch_record)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_dispatch_{dispatch[0]}"] = False
-                st.rerun()
+                refresh_row("dispatch_row", dispatch[0], get_dispatch_record)
+
+def show_bulk_challans():
+    st.subheader("Bulk Challans")
+    st.caption("Reprint the challans of every dispatch for a project and/or dispatch date range. "
+               "They are generated in the background.")
+    
+    db = get_db()
+    projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+    db.close()
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        project_options = ["All Projects"] + [f"{p[1]} (ID: {p[0]})" for p in projects]
+        project_filter = st.selectbox("Project", options=project_options, key="bulk_challan_project")
+        project_id = None if project_filter == "All Projects" else int(project_filter.split("ID: ")[1].split(")")[0])
+    
+    with col2:
+        from_date = st.date_input("From Date", value=date.today().replace(day=1), key="bulk_challan_from")
+    
+    with col3:
+        to_date = st.date_input("To Date", value=date.today(), key="bulk_challan_to")
+    
+    as_zip = st.radio("Output", options=["Single printable document", "Zip of individual files"],
+                      horizontal=True, key="bulk_challan_output") == "Zip of individual files"
+    
+    if from_date > to_date:
+        st.warning("From Date must be on or before To Date.")
+        return
+    
+    show_report_job("challans", {
+        "project_id": project_id,
+        "from_date": from_date.isoformat(),
+        "to_date": to_date.isoformat(),
+        "as_zip": as_zip
+    }, "🖨️ Generate Challans", key="bulk_challans")
 
 def add_dispatch_form():
     st.subheader("Add New Dispatch")
@@ -319,20 +378,18 @@ def add_dispatch_form():
                 st.success("Dispatch record created successfully!")
                 st.rerun()
 
+def get_dispatch_record(dispatch_id):
+    """Fetch one dispatch record in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(DISPATCH_SELECT + " WHERE d.id = :id"), {"id": dispatch_id}).fetchone()
+    finally:
+        db.close()
+
 def create_dispatch_record(project_id, order_number, vehicle_number, driver_name, dispatch_date, delivery_date, status, responsible_person, challan_number, notes):
-    """Create a new dispatch record"""
+    """Create a new dispatch record; resubmitting an identical one is not an error"""
     try:
-        db = get_db()
-        
-        result = db.execute(text("""
-            INSERT INTO dispatch (project_id, order_number, vehicle_number, driver_name,
-                                dispatch_date, delivery_date, status, responsible_person,
-                                challan_number, notes, created_by)
-            VALUES (:project_id, :order_number, :vehicle_number, :driver_name,
-                   :dispatch_date, :delivery_date, :status, :responsible_person,
-                   :challan_number, :notes, :created_by)
-            RETURNING id
-        """), {
+        record_id, action = create_record("dispatch", {
             "project_id": project_id,
             "order_number": order_number,
             "vehicle_number": vehicle_number,
@@ -346,12 +403,9 @@ def create_dispatch_record(project_id, order_number, vehicle_number, driver_name
             "created_by": st.session_state.user_id
         })
         
-        dispatch_id = result.fetchone()[0]
-        db.commit()
-        db.close()
-        
-        # Log audit trail
-        log_audit_trail("dispatch", dispatch_id, "CREATE")
+        if action == "CONFLICT":
+            st.error("Challan number already exists!")
+            return False
         
         return True
         
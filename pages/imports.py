@@ -0,0 +1,105 @@
+import streamlit as st
+from database import get_db
+from sqlalchemy import text
+from utils.importer import parse_unified_workbook, diff_import, load_import, IMPORT_SHEETS
+
+# Rejected rows and changes shown on the page; the full lists are offered as downloads
+IMPORT_ERRORS_SHOWN = 500
+IMPORT_CHANGES_SHOWN = 500
+
+def show():
+    st.title("📥 Import")
+    
+    if st.session_state.user_role not in ["Admin", "Project Manager"]:
+        st.warning("Only Admins and Project Managers can import data.")
+        return
+    
+    show_workbook_import()
+
+def show_workbook_import():
+    st.subheader("Import Unified Workbook")
+    st.caption(f"Loads the {', '.join(IMPORT_SHEETS)} sheets. Rows that fail validation are listed and left out; "
+               "rows matching an existing record update it. Nothing is written until the changes have been reviewed.")
+    
+    uploaded = st.file_uploader("Workbook (.xlsx)", type=["xlsx"], key="import_workbook")
+    
+    db = get_db()
+    projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+    db.close()
+    
+    project_options = ["None"] + [f"{p[1]} (ID: {p[0]})" for p in projects]
+    default_project = st.selectbox("Project for rows without one", options=project_options, key="import_default_project")
+    default_project_id = None if default_project == "None" else int(default_project.split("ID: ")[1].split(")")[0])
+    
+    if uploaded is not None and st.button("🔍 Validate and Compare", key="validate_import"):
+        try:
+            with st.spinner("Reading workbook..."):
+                parsed = parse_unified_workbook(uploaded, default_project_id)
+            with st.spinner("Comparing with stored records..."):
+                parsed["diff"] = diff_import(parsed["tables"])
+            st.session_state.import_batch = (uploaded.name, parsed)
+        except Exception as e:
+            st.error(f"Error reading workbook: {str(e)}")
+    
+    batch = st.session_state.get("import_batch")
+    if not batch or uploaded is None or batch[0] != uploaded.name:
+        return
+    
+    file_name, parsed = batch
+    
+    columns = st.columns(len(parsed["sheets"]) or 1)
+    for column, (sheet_name, (rows_read, rows_valid)) in zip(columns, parsed["sheets"].items()):
+        with column:
+            st.metric(sheet_name, f"{rows_valid:,} valid", delta=f"{rows_read - rows_valid:,} rejected",
+                      delta_color="inverse" if rows_read > rows_valid else "off")
+    
+    errors = parsed["errors"]
+    if not errors.empty:
+        with st.expander(f"⚠️ {len(errors):,} problems"):
+            st.dataframe(errors.head(IMPORT_ERRORS_SHOWN), use_container_width=True, hide_index=True)
+            st.download_button("📥 Download Problems", data=errors.to_csv(index=False).encode("utf-8"),
+                               file_name=f"import_problems_{file_name}.csv", mime="text/csv",
+                               key="download_import_problems")
+    
+    for table, frame in parsed["tables"].items():
+        if not frame.empty:
+            with st.expander(f"Preview: {table.replace('_', ' ').title()} ({len(frame):,} rows)"):
+                st.dataframe(frame.head(50), use_container_width=True, hide_index=True)
+    
+    diff = parsed["diff"]
+    st.markdown("#### Changes")
+    columns = st.columns(len(diff["summary"]) or 1)
+    for column, (table, (added, updated, unchanged, deleted)) in zip(columns, diff["summary"].items()):
+        with column:
+            st.markdown(f"**{table.replace('_', ' ').title()}**")
+            st.caption(f"{added:,} added · {updated:,} updated · {unchanged:,} unchanged · {deleted:,} missing from the sheet")
+    
+    changes = diff["changes"]
+    if not changes.empty:
+        st.dataframe(changes.head(IMPORT_CHANGES_SHOWN), use_container_width=True, hide_index=True)
+        st.download_button("📥 Download Changes", data=changes.to_csv(index=False).encode("utf-8"),
+                           file_name=f"import_changes_{file_name}.csv", mime="text/csv",
+                           key="download_import_changes")
+    
+    total_deleted = sum(len(ids) for ids in diff["deleted"].values())
+    delete_missing = total_deleted > 0 and st.checkbox(
+        f"Delete the {total_deleted:,} stored records missing from the sheet", value=False, key="import_delete_missing")
+    
+    total_changes = sum(len(frame) for frame in diff["delta"].values()) + (total_deleted if delete_missing else 0)
+    if not total_changes:
+        st.info("The stored records already match this workbook; there is nothing to import.")
+        return
+    
+    if st.button(f"📥 Apply {total_changes:,} Changes", type="primary", key="run_import"):
+        try:
+            with st.spinner("Importing..."):
+                summary = load_import(diff["delta"], file_name, st.session_state.user_id,
+                                      diff["deleted"] if delete_missing else None)
+            
+            st.success("Import complete: " + ", ".join(
+                f"{table.replace('_', ' ')} {inserted:,} added, {updated:,} updated, {deleted:,} deleted"
+                for table, (staged, inserted, updated, deleted) in summary.items()
+            ))
+            del st.session_state.import_batch
+        except Exception as e:
+            st.error(f"Error importing workbook: {str(e)}")
@@ -1,23 +1,51 @@
 import streamlit as st
+import io
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, date, timedelta
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, log_audit_trail_batch, fetch_summary
 from sqlalchemy import text
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.analytics import show_freshness, show_snapshot_freshness, snapshots_enabled
+from utils.machine_analytics import SHIFTS, get_machine_cube, get_shift_calendar, save_shift_calendar, machine_shift_metrics, machine_day_matrix
+from utils.chart_series import prepare_series, GRAIN_LABELS
+
+PRODUCTION_RECORD_SELECT = """
+    SELECT 
+        pl.id,
+        pl.wo_number,
+        p.name as project_name,
+        u.username as operator_name,
+        pl.machine_used,
+        pl.produced_quantity,
+        pl.production_date,
+        pl.shift,
+        pl.notes,
+        creator.username as created_by,
+        pl.created_at
+    FROM production_log pl
+    LEFT JOIN projects p ON pl.project_id = p.id
+    LEFT JOIN users u ON pl.operator_id = u.id
+    LEFT JOIN users creator ON pl.created_by = creator.id
+"""
+
+# Columns of the bulk entry grid, and of rows pasted into it (which take the default project)
+BULK_ENTRY_COLUMNS = ["WO Number", "Project", "Operator", "Machine", "Quantity", "Notes"]
+BULK_PASTE_COLUMNS = ["WO Number", "Operator", "Machine", "Quantity", "Notes"]
 
 def show():
     st.title("🏭 Production Log")
     
-    tab1, tab2, tab3 = st.tabs(["📋 Production Records", "➕ Add Production Entry", "📊 Analytics"])
-    
-    with tab1:
-        show_production_records()
-    
-    with tab2:
-        add_production_entry_form()
-    
-    with tab3:
-        show_production_analytics()
+    show_lazy_tabs({
+        "📋 Production Records": show_production_records,
+        "➕ Add Production Entry": add_production_entry_form,
+        "📋 Bulk Entry": bulk_production_entry_form,
+        "📊 Analytics": show_production_analytics,
+        "🔧 Machines": show_machine_analytics
+    }, key="production_log_tab")
 
 def show_production_records():
     st.subheader("Production Records")
@@ -67,26 +95,8 @@ def show_production_records():
     with col3:
         search_term = st.text_input("Search", placeholder="WO number or notes...", key="prod_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            pl.id,
-            pl.wo_number,
-            p.name as project_name,
-            u.username as operator_name,
-            pl.machine_used,
-            pl.produced_quantity,
-            pl.production_date,
-            pl.shift,
-            pl.notes,
-            creator.username as created_by,
-            pl.created_at
-        FROM production_log pl
-        LEFT JOIN projects p ON pl.project_id = p.id
-        LEFT JOIN users u ON pl.operator_id = u.id
-        LEFT JOIN users creator ON pl.created_by = creator.id
-        WHERE pl.production_date >= :start_date AND pl.production_date <= :end_date
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE pl.production_date >= :start_date AND pl.production_date <= :end_date"
     params = {
         "start_date": start_date,
         "end_date": end_date
@@ -94,108 +104,129 @@ def show_production_records():
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND pl.project_id = :project_id"
+        where += " AND pl.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if operator_filter != "All":
         operator_id = operator_filter.split("ID: ")[1].split(")")[0]
-        query += " AND pl.operator_id = :operator_id"
+        where += " AND pl.operator_id = :operator_id"
         params["operator_id"] = int(operator_id)
     
     if shift_filter != "All":
-        query += " AND pl.shift = :shift"
+        where += " AND pl.shift = :shift"
         params["shift"] = shift_filter
     
     if machine_filter != "All":
-        query += " AND pl.machine_used = :machine"
+        where += " AND pl.machine_used = :machine"
         params["machine"] = machine_filter
     
     if search_term:
-        query += " AND (LOWER(pl.wo_number) LIKE LOWER(:search) OR LOWER(pl.notes) LIKE LOWER(:search))"
+        where += " AND (LOWER(pl.wo_number) LIKE LOWER(:search) OR LOWER(pl.notes) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY pl.production_date DESC, pl.created_at DESC"
-    
     try:
-        db = get_db()
-        result = db.execute(text(query), params)
-        production_records = result.fetchall()
-        db.close()
+        summary = fetch_summary("production_log pl", where, params, {
+            "total_records": "COUNT(*)",
+            "total_quantity": "SUM(pl.produced_quantity)",
+            "unique_operators": "COUNT(DISTINCT pl.operator_id)",
+        })
         
-        if production_records:
+        if summary["total_records"]:
             # Summary statistics
             col1, col2, col3, col4 = st.columns(4)
             
-            total_records = len(production_records)
-            total_quantity = sum([record[5] for record in production_records if record[5]])
-            unique_operators = len(set([record[3] for record in production_records if record[3]]))
+            total_quantity = summary["total_quantity"]
             date_range_days = (end_date - start_date).days + 1
             
-            col1.metric("Total Records", total_records)
+            col1.metric("Total Records", summary["total_records"])
             col2.metric("Total Quantity", total_quantity)
-            col3.metric("Operators", unique_operators)
+            col3.metric("Operators", summary["unique_operators"])
             col4.metric("Avg Daily Production", f"{total_quantity // date_range_days if date_range_days > 0 else 0}")
             
+            order_by = " ORDER BY pl.production_date DESC, pl.created_at DESC, pl.id DESC"
+            show_csv_export("production_log", PRODUCTION_RECORD_SELECT + where + order_by, params, key="prod_export")
+            
+            limit, offset = show_pagination(summary["total_records"], key="prod_page")
+            
+            query = PRODUCTION_RECORD_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
+            
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            production_records = result.fetchall()
+            db.close()
+            
             st.divider()
             
             # Display production records
             for record in production_records:
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**WO: {record[1]}**")
-                        st.write(f"Project: {record[2] or 'N/A'}")
-                        st.write(f"Operator: {record[3] or 'N/A'}")
-                        st.write(f"Machine: {record[4] or 'N/A'}")
-                    
-                    with col2:
-                        st.write(f"Quantity: **{record[5] or 0}**")
-                        st.write(f"Date: {record[6]}")
-                        st.write(f"Shift: {record[7] or 'N/A'}")
-                        st.write(f"Created by: {record[9]}")
-                    
-                    with col3:
-                        if record[8]:  # Notes
-                            with st.expander("📝 Notes"):
-                                st.write(record[8])
-                        
-                        # Performance indicator
-                        if record[5] and record[5] > 0:
-                            if record[5] >= 100:
-                                st.success(f"🟢 High Output")
-                            elif record[5] >= 50:
-                                st.info(f"🟡 Medium Output")
-                            else:
-                                st.warning(f"🔴 Low Output")
-                    
-                    with col4:
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_prod_{record[0]}"):
-                                st.session_state[f"edit_prod_{record[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_prod_{record[0]}"):
-                                if delete_production_record(record[0]):
-                                    st.success("Production record deleted!")
-                                    st.rerun()
-                        
-                        # Quick duplicate entry
-                        if st.button("📋 Duplicate", key=f"duplicate_prod_{record[0]}"):
-                            duplicate_production_record(record)
-                            st.success("Record duplicated! Check the add form.")
-                            st.rerun()
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_prod_{record[0]}", False):
-                        edit_production_record_form(record)
-                    
-                    st.divider()
+                reset_row("prod_row", record[0])
+                show_production_record_row(record)
         else:
             st.info("No production records found for the selected criteria.")
             
     except Exception as e:
         st.error(f"Error loading production records: {str(e)}")
 
+@st.fragment
+def show_production_record_row(record):
+    """Render one production record; its controls rerun only this row"""
+    record = current_row("prod_row", record)
+    if record is None:
+        return
+    
+    with st.container():
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**WO: {record[1]}**")
+            st.write(f"Project: {record[2] or 'N/A'}")
+            st.write(f"Operator: {record[3] or 'N/A'}")
+            st.write(f"Machine: {record[4] or 'N/A'}")
+        
+        with col2:
+            st.write(f"Quantity: **{record[5] or 0}**")
+            st.write(f"Date: {record[6]}")
+            st.write(f"Shift: {record[7] or 'N/A'}")
+            st.write(f"Created by: {record[9]}")
+        
+        with col3:
+            if record[8]:  # Notes
+                with st.expander("📝 Notes"):
+                    st.write(record[8])
+            
+            # Performance indicator
+            if record[5] and record[5] > 0:
+                if record[5] >= 100:
+                    st.success(f"🟢 High Output")
+                elif record[5] >= 50:
+                    st.info(f"🟡 Medium Output")
+                else:
+                    st.warning(f"🔴 Low Output")
+        
+        with col4:
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_prod_{record[0]}"):
+                    st.session_state[f"edit_prod_{record[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_prod_{record[0]}"):
+                    if delete_production_record(record[0]):
+                        st.success("Production record deleted!")
+                        refresh_row("prod_row", record[0], get_production_record)
+            
+            # Quick duplicate entry
+            if st.button("📋 Duplicate", key=f"duplicate_prod_{record[0]}"):
+                duplicate_production_record(record)
+                # The add form lives outside this row, so the whole page reruns on its tab
+                st.session_state["production_log_tab"] = "➕ Add Production Entry"
+                st.session_state.pop("production_log_tab_selector", None)
+                st.rerun()
+        
+        # Edit form
+        if st.session_state.get(f"edit_prod_{record[0]}", False):
+            edit_production_record_form(record)
+        
+        st.divider()
+
 def edit_production_record_form(record):
     st.subheader(f"Edit Production Record: {record[1]}")
     
@@ -241,12 +272,12 @@ def edit_production_record_form(record):
                                           produced_quantity, production_date, shift, notes):
                     st.success("Production record updated successfully!")
                     st.session_state[f"edit_prod_{record[0]}"] = False
-                    st.rerun()
+                    refresh_row("prod_row", record[0], get_production_record)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_prod_{record[0]}"] = False
-                st.rerun()
+                refresh_row("prod_row", record[0], get_production_record)
 
 def add_production_entry_form():
     st.subheader("Add Production Entry")
@@ -308,6 +339,8 @@ def add_production_entry_form():
                            value=duplicate_data[8] if duplicate_data else "",
                            placeholder="Production notes, issues, observations", height=80)
         
+        log_again = st.checkbox("Add even if this WO already has an entry for the operator, date and shift")
+        
         submitted = st.form_submit_button("🏭 Add Production Entry")
         
         if submitted:
@@ -318,6 +351,14 @@ def add_production_entry_form():
             project_id = int(project.split("ID: ")[1].split(")")[0])
             operator_id = int(operator.split("ID: ")[1].split(")")[0])
             
+            # A second entry for the same shift is valid, but is more often a resubmitted form
+            if not log_again:
+                logged = count_logged_entries(wo_number, operator_id, production_date, shift)
+                if logged:
+                    st.warning(f"{wo_number} already has {logged} entr{'y' if logged == 1 else 'ies'} for this operator "
+                               f"on {production_date} ({shift} shift). Tick the box above to add another.")
+                    return
+            
             if create_production_record(wo_number, project_id, operator_id, machine_used, 
                                       produced_quantity, production_date, shift, notes):
                 st.success("Production entry added successfully!")
@@ -326,6 +367,241 @@ def add_production_entry_form():
                     del st.session_state["duplicate_production_data"]
                 st.rerun()
 
+def bulk_production_entry_form():
+    st.subheader("Bulk Production Entry")
+    st.caption("Record a whole shift at once: fill in the grid, or paste rows from a spreadsheet, then save them together.")
+    
+    db = get_db()
+    projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+    operators = db.execute(text("SELECT id, username FROM users ORDER BY username")).fetchall()
+    db.close()
+    
+    if not projects:
+        st.warning("No projects available. Please create a project first.")
+        return
+    
+    saved = st.session_state.pop("bulk_production_saved", None)
+    if saved:
+        st.success(saved)
+    
+    project_options = [f"{p[1]} (ID: {p[0]})" for p in projects]
+    operator_options = [u[1] for u in operators]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        production_date = st.date_input("Production Date", value=date.today(), key="bulk_production_date")
+    with col2:
+        shift = st.selectbox("Shift", options=SHIFTS, key="bulk_production_shift")
+    with col3:
+        default_project = st.selectbox("Default Project", options=project_options, key="bulk_production_project",
+                                       help="Used for rows that leave the project blank")
+    
+    version = st.session_state.setdefault("bulk_production_version", 0)
+    
+    with st.expander("📋 Paste from spreadsheet"):
+        st.caption("Tab-separated columns: " + ", ".join(BULK_PASTE_COLUMNS) + ". A header row is ignored.")
+        pasted = st.text_area("Rows", height=150, key=f"bulk_production_paste_{version}")
+        if st.button("Load Pasted Rows", key="load_bulk_production_paste"):
+            try:
+                st.session_state.bulk_production_rows = parse_pasted_production(pasted)
+                st.session_state.bulk_production_version = version + 1
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error reading pasted rows: {str(e)}")
+    
+    rows = st.session_state.get("bulk_production_rows")
+    if rows is None:
+        rows = pd.DataFrame({
+            column: pd.Series(dtype="float64" if column == "Quantity" else "object") for column in BULK_ENTRY_COLUMNS
+        })
+    
+    edited = st.data_editor(
+        rows, num_rows="dynamic", use_container_width=True, hide_index=True,
+        key=f"bulk_production_editor_{version}",
+        column_config={
+            "WO Number": st.column_config.TextColumn("WO Number", required=True, max_chars=100),
+            "Project": st.column_config.SelectboxColumn("Project", options=project_options),
+            "Operator": st.column_config.SelectboxColumn("Operator", options=operator_options, required=True),
+            "Machine": st.column_config.TextColumn("Machine", max_chars=200),
+            "Quantity": st.column_config.NumberColumn("Quantity", min_value=1, step=1, required=True),
+            "Notes": st.column_config.TextColumn("Notes")
+        }
+    )
+    
+    skip_duplicates = st.checkbox("Skip rows already logged for this date and shift", value=True,
+                                  key="bulk_production_skip_duplicates")
+    
+    if st.button("💾 Save Entries", type="primary", key="save_bulk_production"):
+        entries = edited.dropna(how="all").reset_index(drop=True)
+        if entries.empty:
+            st.warning("Add at least one row.")
+            return
+        
+        default_project_id = int(default_project.split("ID: ")[1].split(")")[0])
+        entries, problems, already_logged = validate_production_entries(
+            entries, production_date, shift, projects, operators, default_project_id
+        )
+        
+        if problems:
+            st.error("Nothing was saved. Fix these rows first:\n\n" + "\n".join(f"- {problem}" for problem in problems))
+            return
+        
+        if already_logged.any():
+            rows_logged = ", ".join(str(row + 1) for row in already_logged[already_logged].index)
+            if not skip_duplicates:
+                st.error(f"Rows {rows_logged} are already logged for {production_date} ({shift}). Nothing was saved.")
+                return
+            entries = entries[~already_logged]
+        
+        if entries.empty:
+            st.warning("Every row is already logged for this date and shift.")
+            return
+        
+        created = create_production_records(entries, production_date, shift)
+        if created:
+            skipped = int(already_logged.sum())
+            st.session_state.bulk_production_saved = (
+                f"{created} production entries added" + (f", {skipped} already logged skipped" if skipped else "") + "."
+            )
+            st.session_state.bulk_production_rows = None
+            st.session_state.bulk_production_version = version + 1
+            st.rerun()
+
+def parse_pasted_production(pasted):
+    """Read tab-separated rows pasted from a spreadsheet into the bulk entry grid's columns"""
+    if not pasted.strip():
+        return None
+    
+    frame = pd.read_csv(io.StringIO(pasted), sep="\t", header=None, dtype=str, keep_default_na=False)
+    frame = frame.iloc[:, :len(BULK_PASTE_COLUMNS)]
+    frame.columns = BULK_PASTE_COLUMNS[:frame.shape[1]]
+    
+    # Skip a copied header row
+    if frame.iloc[0, 0].strip().lower() == BULK_PASTE_COLUMNS[0].lower():
+        frame = frame.iloc[1:]
+    
+    frame = frame.apply(lambda column: column.str.strip()).replace("", None).reindex(columns=BULK_ENTRY_COLUMNS).astype(object)
+    frame["Quantity"] = pd.to_numeric(frame["Quantity"], errors="coerce")
+    return frame.reset_index(drop=True)
+
+def validate_production_entries(entries, production_date, shift, projects, operators, default_project_id):
+    """Check a batch of grid rows in one pass
+    
+    Returns (entries with resolved ids, problems, already_logged). problems lists
+    every invalid row; already_logged flags rows whose (WO number, operator)
+    already has an entry for this date and shift, found with one query.
+    """
+    project_ids = {f"{p[1]} (ID: {p[0]})": p[0] for p in projects}
+    project_ids.update({p[1].strip().lower(): p[0] for p in projects})
+    operator_ids = {u[1].strip().lower(): u[0] for u in operators}
+    
+    def cleaned(column):
+        return entries[column].astype("string").str.strip().replace("", pd.NA)
+    
+    entries = entries.assign(
+        wo_number=cleaned("WO Number"),
+        machine_used=cleaned("Machine"),
+        notes=cleaned("Notes"),
+        produced_quantity=pd.to_numeric(entries["Quantity"], errors="coerce")
+    )
+    project = cleaned("Project")
+    operator = cleaned("Operator")
+    project_id = project.map(lambda value: project_ids.get(value, project_ids.get(value.lower())), na_action="ignore")
+    entries["project_id"] = project_id.where(project.notna(), default_project_id)
+    entries["operator_id"] = operator.str.lower().map(operator_ids)
+    
+    quantity = entries["produced_quantity"]
+    checks = [
+        (entries["wo_number"].isna(), "WO Number is required"),
+        (entries["wo_number"].str.len() > 100, "WO Number is longer than 100 characters"),
+        (project.notna() & project_id.isna(), "unknown project"),
+        (operator.isna(), "Operator is required"),
+        (operator.notna() & entries["operator_id"].isna(), "unknown operator"),
+        (entries["machine_used"].str.len() > 200, "Machine is longer than 200 characters"),
+        (quantity.isna() | (quantity < 1) | (quantity % 1 != 0), "Quantity must be a whole number of at least 1"),
+        (entries.duplicated(["wo_number", "operator_id"], keep=False) & entries["wo_number"].notna(),
+         "same WO Number and operator entered twice")
+    ]
+    
+    problems = sorted(
+        (row, message)
+        for mask, message in checks
+        for row in mask.fillna(False).to_numpy().nonzero()[0]
+    )
+    if problems:
+        return entries, [f"Row {row + 1}: {message}" for row, message in problems], None
+    
+    entries["project_id"] = entries["project_id"].astype(int)
+    entries["operator_id"] = entries["operator_id"].astype(int)
+    entries["produced_quantity"] = quantity.astype(int)
+    
+    db = get_db()
+    try:
+        logged = db.execute(text("""
+            SELECT DISTINCT pl.wo_number, pl.operator_id
+            FROM production_log pl
+            JOIN unnest(CAST(:wo_numbers AS VARCHAR[]), CAST(:operator_ids AS INTEGER[])) AS b(wo_number, operator_id)
+                ON pl.wo_number = b.wo_number AND pl.operator_id = b.operator_id
+            WHERE pl.production_date = :production_date AND pl.shift = :shift
+        """), {
+            "wo_numbers": entries["wo_number"].tolist(),
+            "operator_ids": entries["operator_id"].tolist(),
+            "production_date": production_date,
+            "shift": shift
+        }).fetchall()
+    finally:
+        db.close()
+    
+    already_logged = pd.Series(
+        pd.MultiIndex.from_frame(entries[["wo_number", "operator_id"]]).isin([tuple(row) for row in logged]),
+        index=entries.index
+    )
+    return entries, [], already_logged
+
+def create_production_records(entries, production_date, shift):
+    """Insert a validated batch with one INSERT ... RETURNING and audit it with one batched write
+    
+    Returns the number of records created, or 0 on error.
+    """
+    try:
+        db = get_db()
+        
+        def values(column):
+            return [None if pd.isna(value) else value for value in entries[column].tolist()]
+        
+        record_ids = [row[0] for row in db.execute(text("""
+            INSERT INTO production_log (wo_number, project_id, operator_id, machine_used,
+                                      produced_quantity, production_date, shift, notes, created_by)
+            SELECT b.wo_number, b.project_id, b.operator_id, b.machine_used,
+                   b.produced_quantity, :production_date, :shift, b.notes, :created_by
+            FROM unnest(CAST(:wo_numbers AS VARCHAR[]), CAST(:project_ids AS INTEGER[]),
+                        CAST(:operator_ids AS INTEGER[]), CAST(:machines AS VARCHAR[]),
+                        CAST(:quantities AS INTEGER[]), CAST(:notes AS TEXT[]))
+                AS b(wo_number, project_id, operator_id, machine_used, produced_quantity, notes)
+            RETURNING id
+        """), {
+            "wo_numbers": values("wo_number"),
+            "project_ids": values("project_id"),
+            "operator_ids": values("operator_id"),
+            "machines": values("machine_used"),
+            "quantities": values("produced_quantity"),
+            "notes": values("notes"),
+            "production_date": production_date,
+            "shift": shift,
+            "created_by": st.session_state.user_id
+        }).fetchall()]
+        
+        log_audit_trail_batch([("production_log", record_id, "CREATE", None, None, None) for record_id in record_ids],
+                              db=db)
+        db.commit()
+        db.close()
+        
+        return len(record_ids)
+        
+    except Exception as e:
+        st.error(f"Error creating production records: {str(e)}")
+        return 0
+
 def show_production_analytics():
     st.subheader("📊 Production Analytics")
     
@@ -337,24 +613,21 @@ def show_production_analytics():
         end_date = st.date_input("Analysis To", value=date.today(), key="analytics_end")
     
     try:
-        db = get_db()
+        if snapshots_enabled():
+            from utils.snapshots import production_analytics
+            
+            show_snapshot_freshness(key="sync_production_snapshot")
+            analytics = production_analytics(start_date, end_date)
+        else:
+            analytics = get_production_analytics(start_date, end_date)
         
         # Production trend over time
         st.subheader("📈 Production Trend")
-        trend_data = db.execute(text("""
-            SELECT 
-                production_date,
-                SUM(produced_quantity) as daily_total
-            FROM production_log 
-            WHERE production_date >= :start_date AND production_date <= :end_date
-            GROUP BY production_date
-            ORDER BY production_date
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
         
-        if trend_data:
-            df_trend = pd.DataFrame(trend_data, columns=['Date', 'Total Produced'])
+        if not analytics["trend"].empty:
+            df_trend, grain = prepare_series(analytics["trend"], 'Date', start_date, end_date)
             fig_trend = px.line(df_trend, x='Date', y='Total Produced', 
-                               title="Daily Production Trend",
+                               title=f"{GRAIN_LABELS[grain]} Production Trend",
                                markers=True)
             st.plotly_chart(fig_trend, use_container_width=True)
         else:
@@ -365,20 +638,9 @@ def show_production_analytics():
         with col1:
             # Production by operator
             st.subheader("👨‍💼 Production by Operator")
-            operator_data = db.execute(text("""
-                SELECT 
-                    u.username,
-                    SUM(pl.produced_quantity) as total_produced,
-                    COUNT(pl.id) as records_count
-                FROM production_log pl
-                JOIN users u ON pl.operator_id = u.id
-                WHERE pl.production_date >= :start_date AND pl.production_date <= :end_date
-                GROUP BY u.username
-                ORDER BY total_produced DESC
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
+            df_operator = analytics["operators"]
             
-            if operator_data:
-                df_operator = pd.DataFrame(operator_data, columns=['Operator', 'Total Produced', 'Records'])
+            if not df_operator.empty:
                 fig_operator = px.bar(df_operator, x='Operator', y='Total Produced',
                                     title="Production by Operator")
                 st.plotly_chart(fig_operator, use_container_width=True)
@@ -388,49 +650,145 @@ def show_production_analytics():
         with col2:
             # Production by shift
             st.subheader("🕐 Production by Shift")
-            shift_data = db.execute(text("""
-                SELECT 
-                    shift,
-                    SUM(produced_quantity) as total_produced
-                FROM production_log 
-                WHERE production_date >= :start_date AND production_date <= :end_date
-                    AND shift IS NOT NULL
-                GROUP BY shift
-                ORDER BY total_produced DESC
-            """), {"start_date": start_date, "end_date": end_date}).fetchall()
+            df_shift = analytics["shifts"]
             
-            if shift_data:
-                df_shift = pd.DataFrame(shift_data, columns=['Shift', 'Total Produced'])
+            if not df_shift.empty:
                 fig_shift = px.pie(df_shift, values='Total Produced', names='Shift',
                                  title="Production Distribution by Shift")
                 st.plotly_chart(fig_shift, use_container_width=True)
             else:
                 st.info("No shift production data available.")
         
-        # Machine utilization
-        st.subheader("🔧 Machine Utilization")
-        machine_data = db.execute(text("""
+    except Exception as e:
+        st.error(f"Error loading analytics: {str(e)}")
+
+def get_production_analytics(start_date, end_date):
+    """Production trend, per-operator and per-shift totals for the period
+    
+    Aggregates read the daily rollup, which is maintained by a trigger on production_log.
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    
+    db = get_db()
+    try:
+        trend_data = db.execute(text("""
             SELECT 
-                machine_used,
-                SUM(produced_quantity) as total_produced,
-                COUNT(DISTINCT production_date) as days_used
-            FROM production_log 
+                production_date,
+                CAST(SUM(total_quantity) AS BIGINT) as daily_total
+            FROM production_daily_rollup 
             WHERE production_date >= :start_date AND production_date <= :end_date
-                AND machine_used IS NOT NULL
-            GROUP BY machine_used
-            ORDER BY total_produced DESC
-        """), {"start_date": start_date, "end_date": end_date}).fetchall()
+            GROUP BY production_date
+            ORDER BY production_date
+        """), params).fetchall()
         
-        if machine_data:
-            df_machine = pd.DataFrame(machine_data, columns=['Machine', 'Total Produced', 'Days Used'])
-            st.dataframe(df_machine, use_container_width=True)
-        else:
-            st.info("No machine utilization data available.")
+        operator_data = db.execute(text("""
+            SELECT 
+                u.username,
+                CAST(SUM(r.total_quantity) AS BIGINT) as total_produced,
+                CAST(SUM(r.entry_count) AS BIGINT) as records_count
+            FROM production_daily_rollup r
+            JOIN users u ON r.operator_id = u.id
+            WHERE r.production_date >= :start_date AND r.production_date <= :end_date
+            GROUP BY u.username
+            ORDER BY total_produced DESC
+        """), params).fetchall()
         
+        shift_data = db.execute(text("""
+            SELECT 
+                shift,
+                CAST(SUM(total_quantity) AS BIGINT) as total_produced
+            FROM production_daily_rollup 
+            WHERE production_date >= :start_date AND production_date <= :end_date
+                AND shift IS NOT NULL
+            GROUP BY shift
+            ORDER BY total_produced DESC
+        """), params).fetchall()
+    finally:
         db.close()
+    
+    return {
+        "trend": pd.DataFrame(trend_data, columns=['Date', 'Total Produced']),
+        "operators": pd.DataFrame(operator_data, columns=['Operator', 'Total Produced', 'Records']),
+        "shifts": pd.DataFrame(shift_data, columns=['Shift', 'Total Produced'])
+    }
+
+def show_machine_analytics():
+    st.subheader("🔧 Machine Utilization")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Analysis From", value=date.today() - timedelta(days=30), key="machine_start")
+    with col2:
+        end_date = st.date_input("Analysis To", value=date.today(), key="machine_end")
+    
+    try:
+        cube = get_machine_cube(start_date, end_date)
+        calendar = get_shift_calendar()
+        show_freshness("mv_machine_day_cube", key="refresh_machine_cube")
+        
+        # Shift calendar: planned output per machine and shift
+        with st.expander("🗓️ Shift Calendar", expanded=calendar.empty):
+            st.caption("Planned output per shift. Every day in the period counts as a scheduled shift.")
+            
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                machines = sorted(set(cube['Machine']) | set(calendar['Machine']))
+                edited = st.data_editor(
+                    calendar, num_rows="dynamic", use_container_width=True, hide_index=True,
+                    key="shift_calendar_editor",
+                    column_config={
+                        "Machine": st.column_config.SelectboxColumn("Machine", options=machines, required=True),
+                        "Shift": st.column_config.SelectboxColumn("Shift", options=SHIFTS, required=True),
+                        "Capacity": st.column_config.NumberColumn("Capacity per Shift", min_value=0, step=1, required=True)
+                    }
+                )
+                if st.button("💾 Save Calendar", key="save_shift_calendar"):
+                    if save_shift_calendar(edited):
+                        st.success("Shift calendar saved!")
+                        st.rerun()
+            else:
+                st.dataframe(calendar, use_container_width=True, hide_index=True)
+        
+        if cube.empty:
+            st.info("No machine production data available for the selected period.")
+            return
+        
+        # Availability, performance and utilization per machine-shift
+        metrics = machine_shift_metrics(cube, calendar, start_date, end_date)
+        st.dataframe(metrics, use_container_width=True, hide_index=True)
+        
+        # Machine x day heatmap
+        matrix, is_utilization = machine_day_matrix(cube, calendar)
+        fig_heatmap = px.imshow(
+            matrix, aspect="auto", color_continuous_scale="RdYlGn",
+            labels={"x": "Date", "y": "Machine", "color": "Utilization %" if is_utilization else "Produced"},
+            title="Daily Utilization by Machine (%)" if is_utilization else "Daily Output by Machine"
+        )
+        fig_heatmap.update_layout(height=max(300, 22 * len(matrix)))
+        st.plotly_chart(fig_heatmap, use_container_width=True)
         
     except Exception as e:
-        st.error(f"Error loading analytics: {str(e)}")
+        st.error(f"Error loading machine analytics: {str(e)}")
+
+def get_production_record(record_id):
+    """Fetch one production record in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(PRODUCTION_RECORD_SELECT + " WHERE pl.id = :id"), {"id": record_id}).fetchone()
+    finally:
+        db.close()
+
+def count_logged_entries(wo_number, operator_id, production_date, shift):
+    """Number of entries already logged for a WO, operator, date and shift"""
+    db = get_db()
+    try:
+        return db.execute(text("""
+            SELECT COUNT(*) FROM production_log
+            WHERE wo_number = :wo_number AND operator_id = :operator_id
+                AND production_date = :production_date AND shift = :shift
+        """), {"wo_number": wo_number, "operator_id": operator_id,
+               "production_date": production_date, "shift": shift}).scalar()
+    finally:
+        db.close()
 
 def create_production_record(wo_number, project_id, operator_id, machine_used, produced_quantity, production_date, shift, notes):
     """Create a new production record"""
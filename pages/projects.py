@@ -3,6 +3,9 @@ import pandas as pd
 from datetime import datetime, date
 from database import get_db, log_audit_trail
 from sqlalchemy import text
+from utils.lazy_tabs import show_lazy_tabs
+from utils.analytics import show_freshness
+from utils.exports import show_csv_export
 
 def show():
     st.title("🏗️ Projects")
@@ -12,13 +15,10 @@ def show():
         st.warning("You don't have permission to manage projects.")
         return
     
-    tab1, tab2 = st.tabs(["📋 All Projects", "➕ Add Project"])
-    
-    with tab1:
-        show_projects_list()
-    
-    with tab2:
-        add_project_form()
+    show_lazy_tabs({
+        "📋 All Projects": show_projects_list,
+        "➕ Add Project": add_project_form
+    }, key="projects_tab")
 
 def show_projects_list():
     st.subheader("All Projects")
@@ -81,10 +81,16 @@ def show_projects_list():
         db.close()
         
         if projects:
+            show_csv_export("projects", query, params, key="projects_export")
+            
             df = pd.DataFrame(projects, columns=[
                 'ID', 'Name', 'Client', 'Location', 'Start Date', 'End Date', 'Status', 'Created By', 'Created At'
             ])
             
+            # Cross-module totals come from the project KPI view
+            kpis = get_project_kpis([project[0] for project in projects])
+            show_freshness("mv_project_kpis", key="refresh_project_kpis")
+            
             # Display projects in a more interactive way
             for _, project in df.iterrows():
                 with st.container():
@@ -110,6 +116,16 @@ def show_projects_list():
                                 st.success("Project deleted successfully!")
                                 st.rerun()
                     
+                    project_kpis = kpis.get(project['ID'])
+                    if project_kpis:
+                        st.caption(
+                            f"Work orders: {project_kpis[1]}/{project_kpis[0]} completed · "
+                            f"Produced: {project_kpis[2]} · "
+                            f"Cut: {project_kpis[4]}/{project_kpis[3]} items · "
+                            f"Balance fulfilled: {project_kpis[6]}/{project_kpis[5]} · "
+                            f"Delivered: {project_kpis[8]}/{project_kpis[7]} dispatches"
+                        )
+                    
                     # Edit form
                     if st.session_state.get(f"edit_project_{project['ID']}", False):
                         edit_project_form(project)
@@ -121,6 +137,20 @@ def show_projects_list():
     except Exception as e:
         st.error(f"Error loading projects: {str(e)}")
 
+def get_project_kpis(project_ids):
+    """Fetch materialized KPI totals for the given projects, keyed by project id"""
+    db = get_db()
+    try:
+        rows = db.execute(text("""
+            SELECT project_id, total_wo, completed_wo, total_produced, cutting_items, cut_items,
+                   balance_required, balance_fulfilled, total_dispatches, delivered_count
+            FROM mv_project_kpis
+            WHERE project_id = ANY(:ids)
+        """), {"ids": project_ids}).fetchall()
+        return {row[0]: row[1:] for row in rows}
+    finally:
+        db.close()
+
 def edit_project_form(project):
     st.subheader(f"Edit Project: {project['Name']}")
     
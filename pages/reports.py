@@ -0,0 +1,161 @@
+import streamlit as st
+from datetime import date
+from database import get_db
+from sqlalchemy import text
+from utils.lazy_tabs import show_lazy_tabs
+from utils.report_jobs import show_report_job, show_report_job_status, get_recent_report_jobs, REPORTS
+
+def show():
+    st.title("📑 Reports")
+    
+    show_lazy_tabs({
+        "📗 Unified Workbook": show_unified_workbook_export,
+        "📊 Project Summaries": show_project_summaries,
+        "🏭 Production Report": show_production_report,
+        "⏳ Report Jobs": show_report_jobs
+    }, key="reports_tab")
+
+def show_unified_workbook_export():
+    st.subheader("Unified Workbook")
+    st.caption("Cutting List, Balance Order, Production Log, Daily Production Targets and Despatch sheets "
+               "in the layout of the workbook shared with clients. The workbook is built in the background.")
+    
+    db = get_db()
+    projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+    db.close()
+    
+    project_options = ["All Projects"] + [f"{p[1]} (ID: {p[0]})" for p in projects]
+    project_filter = st.selectbox("Project", options=project_options, key="unified_project")
+    project_id = None if project_filter == "All Projects" else int(project_filter.split("ID: ")[1].split(")")[0])
+    
+    label = "all_projects" if project_id is None else project_filter.split(" (ID:")[0].replace(" ", "_")
+    show_report_job("unified_workbook", {"project_id": project_id, "label": label}, "📗 Build Workbook",
+                    key="unified_workbook")
+
+def show_project_summaries():
+    st.subheader("Project Summaries")
+    st.caption("Summary report for any set of projects, as text, CSV or a workbook. The summaries are built "
+               "in the background.")
+    
+    db = get_db()
+    projects = db.execute(text("SELECT id, name FROM projects ORDER BY name")).fetchall()
+    db.close()
+    
+    project_names = {p[0]: p[1] for p in projects}
+    selected = st.multiselect("Projects (leave empty for all)", options=list(project_names),
+                              format_func=lambda project_id: project_names[project_id], key="summary_projects")
+    
+    use_period = st.checkbox("Limit to a period", key="summary_use_period")
+    from_date = to_date = None
+    if use_period:
+        col1, col2 = st.columns(2)
+        with col1:
+            from_date = st.date_input("From Date", value=date.today().replace(day=1), key="summary_from")
+        with col2:
+            to_date = st.date_input("To Date", value=date.today(), key="summary_to")
+    
+    params = {
+        "project_ids": sorted(selected) or None,
+        "from_date": from_date.isoformat() if from_date else None,
+        "to_date": to_date.isoformat() if to_date else None
+    }
+    show_report_job("project_summaries", params, "📊 Generate Summaries", key="project_summaries",
+                    render=show_project_summaries_result)
+
+def show_project_summaries_result(report):
+    if report["summaries"].empty:
+        st.info("No projects match the selection.")
+        return
+    
+    st.dataframe(report["summaries"], use_container_width=True, hide_index=True)
+    
+    stamp = date.today().strftime('%Y%m%d')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📄 Download Text", data=report["text"], file_name=f"project_summaries_{stamp}.txt",
+                           mime="text/plain", key="download_summary_text")
+    with col2:
+        st.download_button("📥 Download CSV", data=report["csv"], file_name=f"project_summaries_{stamp}.csv",
+                           mime="text/csv", key="download_summary_csv")
+    with col3:
+        st.download_button("📗 Download Workbook", data=report["xlsx"], file_name=f"project_summaries_{stamp}.xlsx",
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                           key="download_summary_xlsx")
+    
+    with st.expander("Text report"):
+        st.text(report["text"])
+
+def show_production_report():
+    st.subheader("Production Report")
+    st.caption("Production for any period, broken down by operator, machine and shift and compared with "
+               "the period before it. The report is built in the background.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From Date", value=date.today().replace(day=1), key="production_report_from")
+    with col2:
+        end_date = st.date_input("To Date", value=date.today(), key="production_report_to")
+    
+    if start_date > end_date:
+        st.warning("From Date must be on or before To Date.")
+        return
+    
+    show_report_job("production_report", {"from_date": start_date.isoformat(), "to_date": end_date.isoformat()},
+                    "🏭 Generate Report", key="production_report", render=show_production_report_result)
+
+def show_production_report_result(report):
+    summary = report["summary"]
+    previous = report["previous_summary"]
+    st.caption(f"{report['start_date']} to {report['end_date']}, compared with "
+               f"{report['previous_start']} to {report['previous_end']}")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Production", f"{summary['total_quantity']:,}",
+                  delta=f"{summary['total_quantity'] - previous['total_quantity']:,}")
+    with col2:
+        st.metric("Working Days", summary['working_days'], delta=summary['working_days'] - previous['working_days'])
+    with col3:
+        st.metric("Active Operators", summary['operators'], delta=summary['operators'] - previous['operators'])
+    with col4:
+        st.metric("Daily Average", f"{summary['daily_average']:.1f}",
+                  delta=f"{summary['daily_average'] - previous['daily_average']:.1f}")
+    
+    st.write("**Operator × Day**")
+    st.dataframe(report["operator_day"].rename(columns=str), use_container_width=True)
+    
+    st.write("**Machine × Day**")
+    st.dataframe(report["machine_day"].rename(columns=str), use_container_width=True)
+    
+    st.write("**By Shift**")
+    st.dataframe(report["shifts"], use_container_width=True)
+    
+    st.download_button("📄 Download Report", data=report["text"],
+                       file_name=f"production_report_{report['start_date']:%Y%m%d}_{report['end_date']:%Y%m%d}.txt",
+                       mime="text/plain", key="download_production_report")
+
+def show_report_jobs():
+    st.subheader("Report Jobs")
+    st.caption("Reports queued to run in the background. Identical requests share a job until the data changes.")
+    
+    if st.button("🔄 Refresh", key="refresh_report_jobs"):
+        st.rerun()
+    
+    try:
+        jobs = get_recent_report_jobs()
+    except Exception as e:
+        st.error(f"Error fetching report jobs: {str(e)}")
+        return
+    
+    if not jobs:
+        st.info("No reports have been queued yet.")
+        return
+    
+    for job in jobs:
+        col1, col2 = st.columns([2, 3])
+        with col1:
+            title = REPORTS[job["report"]]["title"] if job["report"] in REPORTS else job["report"]
+            st.write(f"**{title}** #{job['id']}")
+            st.caption(f"Requested by {job['requested_by'] or 'N/A'} at {job['created_at']:%Y-%m-%d %H:%M}")
+        with col2:
+            show_report_job_status(job["id"], key=f"report_job_{job['id']}")
@@ -0,0 +1,180 @@
+import streamlit as st
+from database import get_db
+from sqlalchemy import text
+
+# Where each indexed entity lives in the app: its label, page, list tab, and the
+# filter widgets and pagination to reset so the linked record is visible in the list
+SEARCH_ENTITIES = {
+    "work_orders": {
+        "label": "📋 Work Order",
+        "page": "work_orders",
+        "tab_key": "work_orders_tab",
+        "tab": "📋 All Work Orders",
+        "search_key": "wo_search",
+        "page_key": "wo_page",
+        "filters": ["wo_status_filter", "wo_type_filter", "wo_priority_filter", "wo_project_filter"]
+    },
+    "cutting_lists": {
+        "label": "✂️ Cutting Item",
+        "page": "cutting_lists",
+        "tab_key": "cutting_lists_tab",
+        "tab": "📋 All Cutting Lists",
+        "search_key": "cutting_search",
+        "page_key": "cutting_page",
+        "filters": ["cutting_status_filter", "cutting_project_filter", "cutting_color_filter"]
+    },
+    "balance_orders": {
+        "label": "⚖️ Balance Order",
+        "page": "balance_orders",
+        "tab_key": "balance_orders_tab",
+        "tab": "📋 All Balance Orders",
+        "search_key": "balance_search",
+        "page_key": "balance_page",
+        "filters": ["balance_status_filter", "balance_priority_filter", "balance_project_filter"]
+    },
+    "production_log": {
+        "label": "🏭 Production Entry",
+        "page": "production_log",
+        "tab_key": "production_log_tab",
+        "tab": "📋 Production Records",
+        "search_key": "prod_search",
+        "page_key": "prod_page",
+        "filters": ["prod_project_filter", "prod_operator_filter", "prod_shift_filter", "prod_machine_filter"]
+    },
+    "daily_targets": {
+        "label": "🎯 Daily Target",
+        "page": "daily_targets",
+        "tab_key": "daily_targets_tab",
+        "tab": "📋 All Targets",
+        "search_key": "target_search",
+        "page_key": "target_page",
+        "filters": ["target_status_filter", "target_date_filter", "target_project_filter", "target_assigned_filter"]
+    },
+    "dispatch": {
+        "label": "🚚 Dispatch",
+        "page": "dispatch",
+        "tab_key": "dispatch_tab",
+        "tab": "📋 Dispatch Records",
+        "search_key": "dispatch_search",
+        "page_key": "dispatch_page",
+        "filters": ["dispatch_status_filter", "dispatch_date_filter", "dispatch_project_filter"]
+    }
+}
+
+def show():
+    st.title("🔍 Search")
+    
+    term = st.session_state.get("global_search", "").strip()
+    if not term:
+        st.info("Enter an order number, WO number, vehicle, challan or any text in the sidebar search.")
+        return
+    
+    type_filter = st.multiselect("Show", options=list(SEARCH_ENTITIES.keys()),
+                                 format_func=lambda entity_type: SEARCH_ENTITIES[entity_type]["label"],
+                                 key="global_search_types")
+    
+    hits = search_records(term, entity_types=type_filter or None)
+    
+    if not hits:
+        st.info(f"No records found for \"{term}\".")
+        return
+    
+    st.caption(f"{len(hits)} best matches for \"{term}\"")
+    
+    for hit in hits:
+        entity = SEARCH_ENTITIES[hit[0]]
+        
+        with st.container():
+            col1, col2, col3 = st.columns([3, 2, 1])
+            
+            with col1:
+                st.write(f"{entity['label']} · **{hit[2]}**")
+                if hit[3]:
+                    st.caption(f"{hit[3][:150]}{'...' if len(hit[3]) > 150 else ''}")
+            
+            with col2:
+                st.write(f"Project: {hit[5] or 'N/A'}")
+                st.write(f"Date: {hit[4] or 'N/A'}")
+            
+            with col3:
+                st.button("Open", key=f"open_search_{hit[0]}_{hit[1]}",
+                          on_click=open_search_hit, args=(hit[0], hit[2], hit[4]))
+            
+            st.divider()
+
+def search_records(term, entity_types=None, limit=50):
+    """Return the best matching indexed records for term, ranked across all entity types
+    
+    Full-text matches are ranked by ts_rank over the weighted document; trigram
+    similarity on the title catches partial and misspelled order numbers when
+    pg_trgm is installed. Returns (entity_type, entity_id, title, body,
+    entity_date, project_name) rows.
+    """
+    if trigram_search_available():
+        rank, matches = "+ similarity(title, :term)", "OR title % :term"
+    else:
+        rank, matches = "", ""
+    
+    query = f"""
+        SELECT
+            si.entity_type,
+            si.entity_id,
+            si.title,
+            si.body,
+            si.entity_date,
+            p.name as project_name
+        FROM (
+            SELECT entity_type, entity_id, project_id, title, body, entity_date,
+                   ts_rank(document, plainto_tsquery('simple', :term)) {rank} AS rank
+            FROM search_index
+            WHERE (document @@ plainto_tsquery('simple', :term) {matches} OR title ILIKE :prefix)
+    """
+    params = {"term": term, "prefix": f"{term}%", "limit": limit}
+    
+    if entity_types:
+        query += " AND entity_type = ANY(:entity_types)"
+        params["entity_types"] = list(entity_types)
+    
+    query += """
+            ORDER BY rank DESC
+            LIMIT :limit
+        ) si
+        LEFT JOIN projects p ON si.project_id = p.id
+        ORDER BY si.rank DESC
+    """
+    
+    try:
+        db = get_db()
+        hits = db.execute(text(query), params).fetchall()
+        db.close()
+        return hits
+    except Exception as e:
+        st.error(f"Error searching records: {str(e)}")
+        return []
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def trigram_search_available():
+    """True when pg_trgm is installed; the search index is created without it where it cannot be"""
+    db = get_db()
+    try:
+        return db.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")).scalar()
+    finally:
+        db.close()
+
+def open_search_hit(entity_type, title, entity_date):
+    """Navigate to the hit's page with its list filtered down to the record"""
+    entity = SEARCH_ENTITIES[entity_type]
+    
+    st.session_state.current_page = entity["page"]
+    st.session_state[entity["tab_key"]] = entity["tab"]
+    st.session_state.pop(f"{entity['tab_key']}_selector", None)
+    
+    for filter_key in entity["filters"]:
+        st.session_state[filter_key] = "All"
+    st.session_state[entity["search_key"]] = title
+    st.session_state.pop(f"{entity['page_key']}_number", None)
+    
+    # The production list is bounded by a date range; widen it to include the entry
+    if entity_type == "production_log" and entity_date:
+        st.session_state["prod_start_date"] = entity_date
+        st.session_state["prod_end_date"] = entity_date
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from auth import create_user, get_all_users, update_user_role, delete_user
+from utils.lazy_tabs import show_lazy_tabs
 
 def show():
     st.title("👥 User Management")
@@ -11,13 +12,10 @@ def show():
         st.error("You don't have permission to manage users.")
         return
     
-    tab1, tab2 = st.tabs(["👥 All Users", "➕ Add User"])
-    
-    with tab1:
-        show_users_list()
-    
-    with tab2:
-        add_user_form()
+    show_lazy_tabs({
+        "👥 All Users": show_users_list,
+        "➕ Add User": add_user_form
+    }, key="users_tab")
 
 def show_users_list():
     st.subheader("All Users")
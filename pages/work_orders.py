@@ -1,22 +1,49 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from database import get_db, log_audit_trail
+from database import get_db, log_audit_trail, create_record, batch_update_field, fetch_summary
 from sqlalchemy import text
+from utils.batch_actions import get_selected_ids, clear_selection, store_batch_result, show_batch_result
+from utils.row_fragments import reset_row, current_row, refresh_row
+from utils.lazy_tabs import show_lazy_tabs
+from utils.pagination import show_pagination
+from utils.exports import show_csv_export
+from utils.analytics import show_freshness
+
+WORK_ORDER_SELECT = """
+    SELECT 
+        wo.id,
+        wo.wo_number,
+        p.name as project_name,
+        wo.floor,
+        wo.description,
+        wo.wo_type,
+        wo.status,
+        wo.priority,
+        wo.due_date,
+        u.username as assigned_to,
+        creator.username as created_by,
+        wo.created_at
+    FROM work_orders wo
+    LEFT JOIN projects p ON wo.project_id = p.id
+    LEFT JOIN users u ON wo.assigned_to = u.id
+    LEFT JOIN users creator ON wo.created_by = creator.id
+"""
 
 def show():
     st.title("📋 Work Orders")
     
-    tab1, tab2 = st.tabs(["📋 All Work Orders", "➕ Add Work Order"])
-    
-    with tab1:
-        show_work_orders_list()
-    
-    with tab2:
-        if st.session_state.user_role in ["Admin", "Project Manager"]:
-            add_work_order_form()
-        else:
-            st.warning("You don't have permission to create work orders.")
+    show_lazy_tabs({
+        "📋 All Work Orders": show_work_orders_list,
+        "📈 Progress": show_work_order_progress,
+        "➕ Add Work Order": show_add_work_order_tab
+    }, key="work_orders_tab")
+
+def show_add_work_order_tab():
+    if st.session_state.user_role in ["Admin", "Project Manager"]:
+        add_work_order_form()
+    else:
+        st.warning("You don't have permission to create work orders.")
 
 def show_work_orders_list():
     st.subheader("All Work Orders")
@@ -50,121 +77,267 @@ def show_work_orders_list():
     # Search
     search_term = st.text_input("Search Work Orders", placeholder="Enter WO number or description...", key="wo_search")
     
-    # Build query with filters
-    query = """
-        SELECT 
-            wo.id,
-            wo.wo_number,
-            p.name as project_name,
-            wo.floor,
-            wo.description,
-            wo.wo_type,
-            wo.status,
-            wo.priority,
-            wo.due_date,
-            u.username as assigned_to,
-            creator.username as created_by,
-            wo.created_at
-        FROM work_orders wo
-        LEFT JOIN projects p ON wo.project_id = p.id
-        LEFT JOIN users u ON wo.assigned_to = u.id
-        LEFT JOIN users creator ON wo.created_by = creator.id
-        WHERE 1=1
-    """
+    # Build the filter once; the metrics and the listing share it
+    where = " WHERE 1=1"
     params = {}
     
     if status_filter != "All":
-        query += " AND wo.status = :status"
+        where += " AND wo.status = :status"
         params["status"] = status_filter
     
     if type_filter != "All":
-        query += " AND wo.wo_type = :wo_type"
+        where += " AND wo.wo_type = :wo_type"
         params["wo_type"] = type_filter
     
     if priority_filter != "All":
-        query += " AND wo.priority = :priority"
+        where += " AND wo.priority = :priority"
         params["priority"] = priority_filter
     
     if project_filter != "All":
         project_id = project_filter.split("ID: ")[1].split(")")[0]
-        query += " AND wo.project_id = :project_id"
+        where += " AND wo.project_id = :project_id"
         params["project_id"] = int(project_id)
     
     if search_term:
-        query += " AND (LOWER(wo.wo_number) LIKE LOWER(:search) OR LOWER(wo.description) LIKE LOWER(:search))"
+        where += " AND (LOWER(wo.wo_number) LIKE LOWER(:search) OR LOWER(wo.description) LIKE LOWER(:search))"
+        params["search"] = f"%{search_term}%"
+    
+    try:
+        summary = fetch_summary("work_orders wo", where, params, {
+            "total_orders": "COUNT(*)",
+            "pending_orders": "COUNT(*) FILTER (WHERE wo.status = 'Pending')",
+            "in_progress_orders": "COUNT(*) FILTER (WHERE wo.status = 'In Progress')",
+            "high_priority": "COUNT(*) FILTER (WHERE wo.priority = 'High')",
+        })
+        
+        if summary["total_orders"]:
+            # Summary statistics
+            col1, col2, col3, col4 = st.columns(4)
+            
+            col1.metric("Total Work Orders", summary["total_orders"])
+            col2.metric("Pending", summary["pending_orders"])
+            col3.metric("In Progress", summary["in_progress_orders"])
+            col4.metric("High Priority", summary["high_priority"])
+            
+            order_by = " ORDER BY wo.created_at DESC, wo.id DESC"
+            show_csv_export("work_orders", WORK_ORDER_SELECT + where + order_by, params, key="wo_export")
+            
+            limit, offset = show_pagination(summary["total_orders"], key="wo_page")
+            
+            query = WORK_ORDER_SELECT + where + order_by + " LIMIT :limit OFFSET :offset"
+            
+            db = get_db()
+            result = db.execute(text(query), {**params, "limit": limit, "offset": offset})
+            work_orders = result.fetchall()
+            db.close()
+            
+            st.divider()
+            
+            # Batch actions on selected rows
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                show_work_order_batch_actions(work_orders)
+            
+            for wo in work_orders:
+                reset_row("wo_row", wo[0])
+                if st.session_state.user_role in ["Admin", "Project Manager"]:
+                    st.checkbox("Select", key=f"select_wo_{wo[0]}")
+                show_work_order_row(wo)
+        else:
+            st.info("No work orders found matching the criteria.")
+            
+    except Exception as e:
+        st.error(f"Error loading work orders: {str(e)}")
+
+def show_work_order_progress():
+    st.subheader("Work Order Progress")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        status_filter = st.selectbox("Filter by Status",
+                                   options=["All", "Pending", "In Progress", "Completed", "Dispatched"],
+                                   key="wo_progress_status_filter")
+    
+    with col2:
+        search_term = st.text_input("Search", placeholder="WO number or project...", key="wo_progress_search")
+    
+    # Progress figures come from the work-order progress view, not live joins
+    query = """
+        SELECT 
+            wo_number, project_name, wo_type, status, priority, due_date,
+            produced_quantity, last_production_date, required_qty, fulfilled_qty,
+            cutting_items, cut_items, dispatches, delivered
+        FROM mv_work_order_progress
+        WHERE 1=1
+    """
+    params = {}
+    
+    if status_filter != "All":
+        query += " AND status = :status"
+        params["status"] = status_filter
+    
+    if search_term:
+        query += " AND (LOWER(wo_number) LIKE LOWER(:search) OR LOWER(project_name) LIKE LOWER(:search))"
         params["search"] = f"%{search_term}%"
     
-    query += " ORDER BY wo.created_at DESC"
+    query += " ORDER BY due_date ASC NULLS LAST, wo_number LIMIT 500"
     
     try:
+        show_freshness("mv_work_order_progress", key="refresh_wo_progress")
+        
         db = get_db()
-        result = db.execute(text(query), params)
-        work_orders = result.fetchall()
+        progress = db.execute(text(query), params).fetchall()
         db.close()
         
-        if work_orders:
-            for wo in work_orders:
-                with st.container():
-                    col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
-                    
-                    with col1:
-                        st.write(f"**{wo[1]}** ({wo[5]})")  # WO Number and Type
-                        st.write(f"Project: {wo[2] or 'N/A'}")
-                        st.write(f"Floor: {wo[3] or 'N/A'}")
-                        if wo[4]:  # Description
-                            st.write(f"Description: {wo[4][:50]}{'...' if len(wo[4]) > 50 else ''}")
-                    
-                    with col2:
-                        # Status with color coding
-                        status_color = {
-                            "Pending": "🔴",
-                            "In Progress": "🟡", 
-                            "Completed": "🟢",
-                            "Dispatched": "🔵"
-                        }
-                        st.write(f"Status: {status_color.get(wo[6], '⚪')} **{wo[6]}**")
-                        st.write(f"Priority: {wo[7]}")
-                        st.write(f"Due: {wo[8] or 'Not set'}")
-                        st.write(f"Assigned: {wo[9] or 'Unassigned'}")
-                    
-                    with col3:
-                        # Status update (only for assigned users or managers)
-                        if (st.session_state.user_role in ["Admin", "Project Manager"] or 
-                            (wo[9] and st.session_state.username == wo[9])):
-                            
-                            new_status = st.selectbox(
-                                "Update Status",
-                                options=["Pending", "In Progress", "Completed", "Dispatched"],
-                                index=["Pending", "In Progress", "Completed", "Dispatched"].index(wo[6]),
-                                key=f"status_update_{wo[0]}"
-                            )
-                            
-                            if new_status != wo[6]:
-                                if st.button("Update", key=f"update_status_{wo[0]}"):
-                                    if update_work_order_status(wo[0], new_status, wo[6]):
-                                        st.success("Status updated!")
-                                        st.rerun()
-                    
-                    with col4:
-                        if st.session_state.user_role in ["Admin", "Project Manager"]:
-                            if st.button("📝 Edit", key=f"edit_wo_{wo[0]}"):
-                                st.session_state[f"edit_wo_{wo[0]}"] = True
-                            
-                            if st.button("🗑️ Delete", key=f"delete_wo_{wo[0]}"):
-                                if delete_work_order(wo[0]):
-                                    st.success("Work order deleted!")
-                                    st.rerun()
-                    
-                    # Edit form
-                    if st.session_state.get(f"edit_wo_{wo[0]}", False):
-                        edit_work_order_form(wo)
-                    
-                    st.divider()
+        if progress:
+            df = pd.DataFrame(progress, columns=[
+                'WO Number', 'Project', 'Type', 'Status', 'Priority', 'Due Date',
+                'Produced', 'Last Production', 'Required', 'Fulfilled',
+                'Cutting Items', 'Cut', 'Dispatches', 'Delivered'
+            ])
+            df['Fulfilment'] = (df['Fulfilled'] / df['Required'].where(df['Required'] > 0)).fillna(0) * 100
+            df['Cutting'] = (df['Cut'] / df['Cutting Items'].where(df['Cutting Items'] > 0)).fillna(0) * 100
+            
+            st.dataframe(df, use_container_width=True, hide_index=True, column_config={
+                "Fulfilment": st.column_config.ProgressColumn("Fulfilment", format="%.0f%%", min_value=0, max_value=100),
+                "Cutting": st.column_config.ProgressColumn("Cutting", format="%.0f%%", min_value=0, max_value=100)
+            })
         else:
             st.info("No work orders found matching the criteria.")
             
     except Exception as e:
-        st.error(f"Error loading work orders: {str(e)}")
+        st.error(f"Error loading work order progress: {str(e)}")
+
+@st.fragment
+def show_work_order_row(wo):
+    """Render one work order; its controls rerun only this row"""
+    wo = current_row("wo_row", wo)
+    if wo is None:
+        return
+    
+    with st.container():
+        col1, col2, col3, col4 = st.columns([3, 2, 1.5, 1])
+        
+        with col1:
+            st.write(f"**{wo[1]}** ({wo[5]})")  # WO Number and Type
+            st.write(f"Project: {wo[2] or 'N/A'}")
+            st.write(f"Floor: {wo[3] or 'N/A'}")
+            if wo[4]:  # Description
+                st.write(f"Description: {wo[4][:50]}{'...' if len(wo[4]) > 50 else ''}")
+        
+        with col2:
+            # Status with color coding
+            status_color = {
+                "Pending": "🔴",
+                "In Progress": "🟡", 
+                "Completed": "🟢",
+                "Dispatched": "🔵"
+            }
+            st.write(f"Status: {status_color.get(wo[6], '⚪')} **{wo[6]}**")
+            st.write(f"Priority: {wo[7]}")
+            st.write(f"Due: {wo[8] or 'Not set'}")
+            st.write(f"Assigned: {wo[9] or 'Unassigned'}")
+        
+        with col3:
+            # Status update (only for assigned users or managers)
+            if (st.session_state.user_role in ["Admin", "Project Manager"] or 
+                (wo[9] and st.session_state.username == wo[9])):
+                
+                new_status = st.selectbox(
+                    "Update Status",
+                    options=["Pending", "In Progress", "Completed", "Dispatched"],
+                    index=["Pending", "In Progress", "Completed", "Dispatched"].index(wo[6]),
+                    key=f"status_update_{wo[0]}"
+                )
+                
+                if new_status != wo[6]:
+                    if st.button("Update", key=f"update_status_{wo[0]}"):
+                        if update_work_order_status(wo[0], new_status, wo[6]):
+                            st.success("Status updated!")
+                            refresh_row("wo_row", wo[0], get_work_order)
+        
+        with col4:
+            if st.session_state.user_role in ["Admin", "Project Manager"]:
+                if st.button("📝 Edit", key=f"edit_wo_{wo[0]}"):
+                    st.session_state[f"edit_wo_{wo[0]}"] = True
+                
+                if st.button("🗑️ Delete", key=f"delete_wo_{wo[0]}"):
+                    if delete_work_order(wo[0]):
+                        st.success("Work order deleted!")
+                        refresh_row("wo_row", wo[0], get_work_order)
+        
+        # Edit form
+        if st.session_state.get(f"edit_wo_{wo[0]}", False):
+            edit_work_order_form(wo)
+        
+        st.divider()
+
+def show_work_order_batch_actions(work_orders):
+    """Batch status, priority and assignment updates for the selected work orders"""
+    record_ids = [wo[0] for wo in work_orders]
+    labels = {wo[0]: wo[1] for wo in work_orders}
+    
+    show_batch_result("wo_batch_result", labels)
+    
+    selected_ids = get_selected_ids("select_wo", record_ids)
+    selected = [wo for wo in work_orders if wo[0] in selected_ids]
+    
+    with st.expander(f"⚡ Batch Actions ({len(selected)} selected)", expanded=bool(selected)):
+        col1, col2 = st.columns(2)
+        if col1.button("Select All", key="wo_select_all"):
+            for record_id in record_ids:
+                st.session_state[f"select_wo_{record_id}"] = True
+            st.rerun()
+        if col2.button("Clear Selection", key="wo_clear_selection"):
+            clear_selection("select_wo", record_ids)
+            st.rerun()
+        
+        if not selected:
+            st.info("Tick the work orders below to act on several of them at once.")
+            return
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            batch_status = st.selectbox("Set Status", options=["Pending", "In Progress", "Completed", "Dispatched"],
+                                      key="wo_batch_status")
+            if st.button("Apply Status", key="wo_batch_status_apply"):
+                updated_ids, conflicts = batch_update_field(
+                    "work_orders", "status", batch_status, [(wo[0], wo[6]) for wo in selected]
+                )
+                store_batch_result("wo_batch_result", f"Set status to {batch_status}", updated_ids, conflicts)
+                clear_selection("select_wo", selected_ids)
+                st.rerun()
+        
+        with col2:
+            batch_priority = st.selectbox("Set Priority", options=["High", "Medium", "Low"],
+                                        key="wo_batch_priority")
+            if st.button("Apply Priority", key="wo_batch_priority_apply"):
+                updated_ids, conflicts = batch_update_field(
+                    "work_orders", "priority", batch_priority, [(wo[0], wo[7]) for wo in selected]
+                )
+                store_batch_result("wo_batch_result", f"Set priority to {batch_priority}", updated_ids, conflicts)
+                clear_selection("select_wo", selected_ids)
+                st.rerun()
+        
+        with col3:
+            db = get_db()
+            users = db.execute(text("SELECT id, username FROM users ORDER BY username")).fetchall()
+            db.close()
+            
+            user_options = ["Unassigned"] + [f"{u[1]} (ID: {u[0]})" for u in users]
+            batch_assignee = st.selectbox("Reassign To", options=user_options, key="wo_batch_assignee")
+            if st.button("Apply Assignment", key="wo_batch_assignee_apply"):
+                assigned_user_id = None if batch_assignee == "Unassigned" else int(batch_assignee.split("ID: ")[1].split(")")[0])
+                # The list query only carries the username, so look up the ids the user saw
+                current_ids = {u[1]: u[0] for u in users}
+                updated_ids, conflicts = batch_update_field(
+                    "work_orders", "assigned_to", assigned_user_id,
+                    [(wo[0], current_ids.get(wo[9])) for wo in selected]
+                )
+                store_batch_result("wo_batch_result", f"Reassign to {batch_assignee}", updated_ids, conflicts)
+                clear_selection("select_wo", selected_ids)
+                st.rerun()
 
 def edit_work_order_form(wo):
     st.subheader(f"Edit Work Order: {wo[1]}")
@@ -211,12 +384,12 @@ def edit_work_order_form(wo):
                                     priority, due_date, assigned_user_id):
                     st.success("Work order updated successfully!")
                     st.session_state[f"edit_wo_{wo[0]}"] = False
-                    st.rerun()
+                    refresh_row("wo_row", wo[0], get_work_order)
         
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state[f"edit_wo_{wo[0]}"] = False
-                st.rerun()
+                refresh_row("wo_row", wo[0], get_work_order)
 
 def add_work_order_form():
     st.subheader("Add New Work Order")
@@ -264,26 +437,18 @@ def add_work_order_form():
                 st.success("Work order created successfully!")
                 st.rerun()
 
+def get_work_order(wo_id):
+    """Fetch one work order in the list layout, or None if it no longer exists"""
+    db = get_db()
+    try:
+        return db.execute(text(WORK_ORDER_SELECT + " WHERE wo.id = :id"), {"id": wo_id}).fetchone()
+    finally:
+        db.close()
+
 def create_work_order(wo_number, project_id, floor, description, wo_type, priority, due_date, assigned_to):
-    """Create a new work order"""
+    """Create a new work order; resubmitting an identical one is not an error"""
     try:
-        db = get_db()
-        
-        # Check if WO number already exists
-        existing = db.execute(text("SELECT id FROM work_orders WHERE wo_number = :wo_number"), 
-                            {"wo_number": wo_number}).fetchone()
-        if existing:
-            st.error("Work Order number already exists!")
-            db.close()
-            return False
-        
-        result = db.execute(text("""
-            INSERT INTO work_orders (wo_number, project_id, floor, description, wo_type, 
-                                   priority, due_date, assigned_to, created_by)
-            VALUES (:wo_number, :project_id, :floor, :description, :wo_type, 
-                   :priority, :due_date, :assigned_to, :created_by)
-            RETURNING id
-        """), {
+        record_id, action = create_record("work_orders", {
             "wo_number": wo_number,
             "project_id": project_id,
             "floor": floor if floor else None,
@@ -295,12 +460,9 @@ def create_work_order(wo_number, project_id, floor, description, wo_type, priori
             "created_by": st.session_state.user_id
         })
         
-        wo_id = result.fetchone()[0]
-        db.commit()
-        db.close()
-        
-        # Log audit trail
-        log_audit_trail("work_orders", wo_id, "CREATE")
+        if action == "CONFLICT":
+            st.error("Work Order number already exists!")
+            return False
         
         return True
         
@@ -0,0 +1,57 @@
+import streamlit as st
+from database import get_analytics_refresh_info, refresh_analytics_views, ANALYTICS_REFRESH_INTERVAL, ANALYTICS_SOURCE
+
+def snapshots_enabled():
+    """True when the analytics tabs should read the Parquet snapshots
+    
+    Kept here rather than in utils.snapshots so pages can check it without loading pyarrow.
+    """
+    return ANALYTICS_SOURCE == "snapshots"
+
+def show_freshness(view_name, key):
+    """Show how old an analytics view's figures are, with a manual refresh for managers"""
+    info = get_analytics_refresh_info(view_name)
+    
+    col1, col2 = st.columns([4, 1])
+    
+    with col1:
+        if info:
+            age_minutes = int(info[1] // 60)
+            age_label = "just now" if age_minutes < 1 else f"{age_minutes} min ago"
+            st.caption(f"Figures as of {info[0].strftime('%Y-%m-%d %H:%M')} ({age_label}) · "
+                       f"refreshed every {ANALYTICS_REFRESH_INTERVAL // 60} min and after bulk changes")
+        else:
+            st.caption("Figures have not been refreshed yet")
+    
+    with col2:
+        if st.session_state.user_role in ["Admin", "Project Manager"]:
+            if st.button("🔄 Refresh", key=key):
+                with st.spinner("Refreshing figures..."):
+                    refreshed = refresh_analytics_views()
+                if refreshed:
+                    st.rerun()
+                st.info("A refresh is already running; figures will update shortly.")
+
+def show_snapshot_freshness(key):
+    """Show when the Parquet snapshots behind an analytics tab were synced, with a manual sync for managers"""
+    from utils.snapshots import snapshot_synced_at, sync_snapshots
+    
+    synced_at = snapshot_synced_at()
+    
+    col1, col2 = st.columns([4, 1])
+    
+    with col1:
+        if synced_at:
+            st.caption(f"Figures from the analytics snapshot synced {synced_at.strftime('%Y-%m-%d %H:%M')} · "
+                       f"synced every {ANALYTICS_REFRESH_INTERVAL // 60} min")
+        else:
+            st.caption("The analytics snapshot has not been synced yet")
+    
+    with col2:
+        if st.session_state.user_role in ["Admin", "Project Manager"]:
+            if st.button("🔄 Sync", key=key):
+                with st.spinner("Syncing snapshot..."):
+                    written = sync_snapshots()
+                if written is not None:
+                    st.rerun()
+                st.info("A sync is already running; figures will update shortly.")
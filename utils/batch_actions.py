@@ -0,0 +1,32 @@
+import streamlit as st
+
+def get_selected_ids(key_prefix, record_ids):
+    """Return the ids of the listed records whose selection checkbox is ticked"""
+    return [record_id for record_id in record_ids if st.session_state.get(f"{key_prefix}_{record_id}", False)]
+
+def clear_selection(key_prefix, record_ids):
+    """Untick the selection checkboxes of the listed records"""
+    for record_id in record_ids:
+        st.session_state[f"{key_prefix}_{record_id}"] = False
+
+def store_batch_result(result_key, action_label, updated_ids, conflicts):
+    """Keep a batch outcome in session state so it survives the rerun"""
+    st.session_state[result_key] = {
+        "action": action_label,
+        "updated": len(updated_ids),
+        "conflicts": conflicts
+    }
+
+def show_batch_result(result_key, labels):
+    """Show the outcome of the last batch action, listing every conflicting row"""
+    result = st.session_state.pop(result_key, None)
+    if not result:
+        return
+
+    if result["updated"]:
+        st.success(f"{result['action']}: {result['updated']} record(s) updated")
+
+    if result["conflicts"]:
+        st.warning(f"{result['action']}: {len(result['conflicts'])} record(s) skipped")
+        for record_id, reason in result["conflicts"]:
+            st.write(f"- {labels.get(record_id, f'ID {record_id}')}: {reason}")
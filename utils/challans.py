@@ -0,0 +1,156 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, timedelta
+from sqlalchemy import text
+from database import get_db
+from utils.exports import create_export_file
+
+# Batches smaller than this render in-process; starting workers costs more than it saves
+CHALLAN_PROCESS_THRESHOLD = 200
+
+# Challans handed to a worker process at a time
+CHALLAN_CHUNK_SIZE = 250
+
+CHALLAN_WORKERS = min(4, os.cpu_count() or 1)
+
+# Form feed between challans, so each prints on its own page
+CHALLAN_PAGE_BREAK = "\f"
+
+# Compiled once at import; rendering is a single format_map per challan
+CHALLAN_TEMPLATE = """
+    =====================================
+           DELIVERY CHALLAN
+    =====================================
+    
+    Challan No: {challan_number}
+    Date: {challan_date}
+    
+    -------------------------------------
+    PROJECT DETAILS
+    -------------------------------------
+    Project Name: {project_name}
+    Order Number: {order_number}
+    
+    -------------------------------------
+    DISPATCH DETAILS
+    -------------------------------------
+    Vehicle Number: {vehicle_number}
+    Driver Name: {driver_name}
+    Dispatch Date: {dispatch_date}
+    Expected Delivery: {delivery_date}
+    Status: {status}
+    
+    -------------------------------------
+    RESPONSIBLE PERSON
+    -------------------------------------
+    Name: {responsible_person}
+    
+    -------------------------------------
+    NOTES
+    -------------------------------------
+    {notes}
+    
+    -------------------------------------
+    SIGNATURES
+    -------------------------------------
+    
+    Dispatcher: ___________________
+    Date: _______
+    
+    Receiver: _____________________
+    Date: _______
+    
+    =====================================
+    Generated by PPMS on {generated_at}
+    =====================================
+    """
+
+# Same leading columns as the dispatch list, which is what render_challan indexes
+CHALLAN_QUERY = """
+    SELECT
+        d.id,
+        p.name as project_name,
+        d.order_number,
+        d.vehicle_number,
+        d.driver_name,
+        d.dispatch_date,
+        d.delivery_date,
+        d.status,
+        u.username as responsible_person,
+        d.challan_number,
+        d.notes
+    FROM dispatch d
+    LEFT JOIN projects p ON d.project_id = p.id
+    LEFT JOIN users u ON d.responsible_person = u.id
+    WHERE (CAST(:project_id AS INTEGER) IS NULL OR d.project_id = :project_id)
+        AND (CAST(:from_date AS DATE) IS NULL OR d.dispatch_date >= :from_date)
+        AND (CAST(:until_date AS DATE) IS NULL OR d.dispatch_date < :until_date)
+    ORDER BY d.dispatch_date, d.id
+"""
+
+def render_challan(dispatch_record, generated_at):
+    """Fill the challan template from a dispatch row"""
+    return CHALLAN_TEMPLATE.format_map({
+        "challan_number": dispatch_record[9] or 'N/A',
+        "challan_date": dispatch_record[5] or date.today(),
+        "project_name": dispatch_record[1] or 'N/A',
+        "order_number": dispatch_record[2] or 'N/A',
+        "vehicle_number": dispatch_record[3] or 'N/A',
+        "driver_name": dispatch_record[4] or 'N/A',
+        "dispatch_date": dispatch_record[5] or 'N/A',
+        "delivery_date": dispatch_record[6] or 'N/A',
+        "status": dispatch_record[7] or 'N/A',
+        "responsible_person": dispatch_record[8] or 'N/A',
+        "notes": dispatch_record[10] or 'No additional notes',
+        "generated_at": generated_at
+    })
+
+def _render_chunk(records, generated_at):
+    return [render_challan(record, generated_at) for record in records]
+
+def challan_file_name(dispatch_record):
+    return f"challan_{dispatch_record[2]}_{dispatch_record[5]}_{dispatch_record[0]}.txt"
+
+def render_challans(records):
+    """Render every record, across worker processes when the batch is large enough"""
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    if len(records) < CHALLAN_PROCESS_THRESHOLD:
+        return _render_chunk(records, generated_at)
+    
+    chunks = [records[i:i + CHALLAN_CHUNK_SIZE] for i in range(0, len(records), CHALLAN_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=CHALLAN_WORKERS) as pool:
+        rendered = pool.map(_render_chunk, chunks, [generated_at] * len(chunks))
+        return [challan for chunk in rendered for challan in chunk]
+
+def generate_challan_batch(project_id=None, from_date=None, to_date=None, as_zip=False):
+    """Render the challans for every dispatch in a project and/or dispatch date range
+    
+    Writes one printable text file with a page break between challans, or a zip
+    of one file per challan, to the export directory. Returns (path, count).
+    """
+    db = get_db()
+    try:
+        records = [tuple(row) for row in db.execute(text(CHALLAN_QUERY), {
+            "project_id": project_id,
+            "from_date": from_date,
+            "until_date": to_date + timedelta(days=1) if to_date else None
+        }).fetchall()]
+    finally:
+        db.close()
+    
+    challans = render_challans(records)
+    
+    output = create_export_file(".zip" if as_zip else ".txt")
+    with output:
+        if as_zip:
+            with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+                for record, challan in zip(records, challans):
+                    archive.writestr(challan_file_name(record), challan)
+        else:
+            with io.TextIOWrapper(output, encoding="utf-8") as document:
+                document.write(CHALLAN_PAGE_BREAK.join(challans))
+    
+    return output.name, len(records)
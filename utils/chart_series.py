@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# Most points any one chart sends to the browser, across all of its series
+CHART_POINT_BUDGET = 400
+
+# Finest grain for a date range: daily up to four months, weekly up to two years
+GRAIN_MAX_DAYS = [("day", 120), ("week", 730)]
+
+GRAIN_LABELS = {"day": "Daily", "week": "Weekly", "month": "Monthly"}
+
+GRAIN_PERIODS = {"week": "W", "month": "M"}
+
+def choose_grain(start_date, end_date):
+    """Pick day, week or month buckets from the width of the date range"""
+    days = (end_date - start_date).days + 1
+    for grain, max_days in GRAIN_MAX_DAYS:
+        if days <= max_days:
+            return grain
+    return "month"
+
+def to_grain(df, date_col, grain):
+    """Sum the numeric columns of a per-day frame into week or month buckets
+    
+    Buckets are labelled by their first day; a day grain returns df unchanged.
+    """
+    if grain == "day" or df.empty:
+        return df
+    
+    period_start = pd.to_datetime(df[date_col]).dt.to_period(GRAIN_PERIODS[grain]).dt.start_time.dt.date
+    value_cols = df.select_dtypes('number').columns
+    
+    bucketed = df[value_cols].groupby(period_start.rename(date_col)).sum()
+    return bucketed.reset_index()
+
+def downsample_minmax(df, y_cols, max_points=CHART_POINT_BUDGET):
+    """Reduce an ordered frame to at most max_points points across y_cols, keeping each bucket's extremes
+    
+    Every row plots one point per series, so the frame is cut to max_points //
+    len(y_cols) rows. Rows are split into equal buckets and, for every series in
+    y_cols, the rows holding its minimum and maximum in each bucket are kept,
+    along with the first and last rows. Peaks and dips survive; flat stretches
+    are thinned out.
+    """
+    n = len(df)
+    max_rows = max(2, max_points // len(y_cols))
+    if n <= max_rows:
+        return df
+    
+    values = np.nan_to_num(df[y_cols].to_numpy(dtype=np.float64))
+    buckets = max(1, (max_rows - 2) // (2 * len(y_cols)))
+    bucket = np.arange(n) * buckets // n
+    
+    # bucket is non-decreasing, so each bucket is a contiguous run of rows
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    
+    for column in values.T:
+        # Sorted by bucket, then value: each bucket's run starts at its minimum and ends at its maximum
+        order = np.lexsort((column, bucket))
+        keep[order[starts]] = True
+        keep[order[ends]] = True
+    
+    return df[keep].reset_index(drop=True)
+
+def prepare_series(df, date_col, start_date, end_date, max_points=CHART_POINT_BUDGET):
+    """Bucket a per-day frame to the grain suited to the range, then cap it at max_points
+    
+    Returns (frame, grain). Every numeric column is treated as a summable series.
+    """
+    grain = choose_grain(start_date, end_date)
+    series = to_grain(df.sort_values(date_col), date_col, grain)
+    
+    y_cols = list(series.select_dtypes('number').columns)
+    if y_cols:
+        series = downsample_minmax(series, y_cols, max_points)
+    
+    return series, grain
@@ -0,0 +1,151 @@
+import csv
+import io
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+import streamlit as st
+from sqlalchemy import text
+from database import engine
+
+# Rows pulled from the server-side cursor and encoded per chunk
+EXPORT_CHUNK_ROWS = 5_000
+
+# Prepared export files older than this are removed when a new export is written
+EXPORT_FILE_MAX_AGE = 3600
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "ppms-exports")
+
+# CSV headers for each entity, in the column order of its list page's SELECT
+EXPORT_COLUMNS = {
+    "projects": [
+        'ID', 'Name', 'Client', 'Location', 'Start Date', 'End Date', 'Status', 'Created By', 'Created At'
+    ],
+    "work_orders": [
+        'ID', 'WO Number', 'Project', 'Floor', 'Description', 'Type', 'Status', 'Priority',
+        'Due Date', 'Assigned To', 'Created By', 'Created At'
+    ],
+    "production_log": [
+        'ID', 'WO Number', 'Project', 'Operator', 'Machine', 'Quantity',
+        'Production Date', 'Shift', 'Notes', 'Created By', 'Created At'
+    ],
+    "daily_targets": [
+        'ID', 'Order Number', 'Project', 'Description', 'Target Qty', 'Target Date',
+        'Assigned To', 'Status', 'Actual Qty', 'Completion Date', 'Notes', 'Created By', 'Created At'
+    ],
+    "cutting_lists": [
+        'ID', 'Order Number', 'Project', 'Floor', 'Description', 'Width', 'Height',
+        'Quantity', 'Color', 'Status', 'Cut Date', 'Created By', 'Created At'
+    ],
+    "balance_orders": [
+        'ID', 'WO Number', 'Project', 'Floor', 'Priority', 'Specifications',
+        'Required Qty', 'Fulfilled Qty', 'Total Qty', 'Due Date', 'Status',
+        'Created By', 'Created At'
+    ],
+    "dispatch": [
+        'ID', 'Project', 'Order Number', 'Vehicle Number', 'Driver Name',
+        'Dispatch Date', 'Delivery Date', 'Status', 'Responsible Person',
+        'Challan Number', 'Notes', 'Created By', 'Created At'
+    ],
+    "audit_trail": [
+        'Audit ID', 'Table', 'Record ID', 'Action', 'Field', 'Old Value', 'New Value', 'User', 'Timestamp'
+    ]
+}
+
+def stream_rows(query, params, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the rows of query in lists of up to chunk_rows, read through a server-side cursor"""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(text(query), params)
+        
+        while True:
+            rows = result.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+
+def stream_csv(query, params, columns, compress=False, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield a CSV export of query chunk by chunk, optionally gzip-compressed
+    
+    Rows are pulled through a server-side cursor and encoded a chunk at a time,
+    so memory stays flat however many rows the query returns. The header is
+    yielded before the query runs.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    
+    def drain():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
+    writer.writerow(columns)
+    yield drain()
+    
+    for rows in stream_rows(query, params, chunk_rows):
+        writer.writerows(rows)
+        yield drain()
+    
+    if compressor:
+        yield compressor.flush()
+
+def create_export_file(suffix):
+    """Open a new file in the export directory, clearing out stale exports first"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _remove_stale_exports()
+    return tempfile.NamedTemporaryFile(dir=EXPORT_DIR, suffix=suffix, delete=False)
+
+def write_export_file(query, params, columns, compress=False):
+    """Stream a CSV export into a temporary file and return its path"""
+    export_file = create_export_file(".csv.gz" if compress else ".csv")
+    with export_file:
+        for chunk in stream_csv(query, params, columns, compress):
+            export_file.write(chunk)
+    
+    return export_file.name
+
+def _remove_stale_exports():
+    cutoff = time.time() - EXPORT_FILE_MAX_AGE
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def show_csv_export(entity, query, params, key):
+    """Export button for a filtered list: writes the full result to a file, then offers it for download
+    
+    query must select the entity's list columns without LIMIT; every matching
+    row is exported, not just the current page. The download is offered only on
+    the rerun that wrote the file, which is removed once it has been handed to
+    the button, so a large export is not read back into memory on every rerun.
+    """
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    with col1:
+        compress = st.checkbox("Gzip", key=f"{key}_gzip")
+    
+    with col2:
+        if not st.button("📥 Export CSV", key=key):
+            return
+        
+        try:
+            with st.spinner("Exporting..."):
+                path = write_export_file(query, params, EXPORT_COLUMNS[entity], compress)
+        except Exception as e:
+            st.error(f"Error exporting {entity.replace('_', ' ')}: {str(e)}")
+            return
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    try:
+        with col3:
+            with open(path, "rb") as export_file:
+                # Downloading must not rerun the page, or the button would disappear before the click lands
+                st.download_button("⬇️ Download", data=export_file, file_name=f"{entity}_{stamp}.csv{'.gz' if compress else ''}",
+                                   mime="application/gzip" if compress else "text/csv", key=f"{key}_download",
+                                   on_click="ignore")
+    finally:
+        os.remove(path)
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from database import get_db
+
+# Days of production history the velocity is smoothed over
+FORECAST_WINDOW_DAYS = 28
+
+# Exponential smoothing factor; higher values weight recent days more
+SMOOTHING_ALPHA = 0.3
+
+# Most urgent first
+RISK_LEVELS = ["At risk", "Stalled", "On track"]
+
+FORECAST_COLUMNS = [
+    'ID', 'WO Number', 'Project', 'Priority', 'Required', 'Fulfilled', 'Remaining',
+    'Rate / Day', 'Projected Completion', 'Due Date', 'Days Late', 'Risk'
+]
+
+def get_completion_forecast(window=FORECAST_WINDOW_DAYS, alpha=SMOOTHING_ALPHA):
+    """Forecast completion of every open balance order
+    
+    The forecast is cached and only recomputed when production in the window or
+    the balance orders themselves change, or when the day rolls over.
+    """
+    today = date.today()
+    return _compute_forecast(_forecast_fingerprint(today, window), today, window, alpha)
+
+def _forecast_fingerprint(today, window):
+    """Cheap summary of the forecast inputs; it changes whenever a recompute is needed"""
+    db = get_db()
+    try:
+        return tuple(db.execute(text("""
+            SELECT
+                (SELECT COUNT(*) FROM production_order_rollup
+                 WHERE production_date > :since AND production_date <= :today),
+                (SELECT COALESCE(SUM(total_quantity), 0) FROM production_order_rollup
+                 WHERE production_date > :since AND production_date <= :today),
+                (SELECT COUNT(*) FROM balance_orders),
+                (SELECT MAX(updated_at) FROM balance_orders),
+                (SELECT COALESCE(SUM(fulfilled_qty), 0) FROM balance_orders)
+        """), {"since": today - timedelta(days=window), "today": today}).fetchone())
+    finally:
+        db.close()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _compute_forecast(fingerprint, today, window, alpha):
+    db = get_db()
+    try:
+        orders = db.execute(text("""
+            SELECT
+                bo.id, bo.wo_number, p.name as project_name, bo.priority,
+                COALESCE(bo.required_qty, 0), COALESCE(bo.fulfilled_qty, 0), bo.due_date
+            FROM balance_orders bo
+            LEFT JOIN projects p ON bo.project_id = p.id
+            WHERE bo.status != 'Completed' AND COALESCE(bo.required_qty, 0) > COALESCE(bo.fulfilled_qty, 0)
+        """)).fetchall()
+        
+        if not orders:
+            return pd.DataFrame(columns=FORECAST_COLUMNS)
+        
+        # Orders without a WO number have no production to measure and forecast as stalled
+        wo_numbers = sorted({order[1] for order in orders if order[1]})
+        daily = db.execute(text("""
+            SELECT wo_number, production_date, CAST(SUM(total_quantity) AS BIGINT)
+            FROM production_order_rollup
+            WHERE production_date > :since AND production_date <= :today AND wo_number = ANY(:wo_numbers)
+            GROUP BY wo_number, production_date
+        """), {"since": today - timedelta(days=window), "today": today, "wo_numbers": wo_numbers}).fetchall()
+    finally:
+        db.close()
+    
+    rates = smoothed_daily_rates(wo_numbers, daily, today, window, alpha)
+    
+    df = pd.DataFrame(orders, columns=['ID', 'WO Number', 'Project', 'Priority', 'Required', 'Fulfilled', 'Due Date'])
+    return project_completion(df, df['WO Number'].map(rates).to_numpy(), today)
+
+def smoothed_daily_rates(wo_numbers, daily, today, window, alpha):
+    """Exponentially smoothed units per day for each WO number, computed as one matrix product
+    
+    daily holds (wo_number, production_date, quantity) rows. Days without
+    production count as zero, so stalled orders decay towards a zero rate.
+    """
+    index = {wo_number: i for i, wo_number in enumerate(wo_numbers)}
+    series = np.zeros((len(wo_numbers), window))
+    
+    if daily:
+        rows = np.fromiter((index[row[0]] for row in daily), dtype=np.int64, count=len(daily))
+        ages = np.fromiter(((today - row[1]).days for row in daily), dtype=np.int64, count=len(daily))
+        quantities = np.fromiter((row[2] for row in daily), dtype=np.float64, count=len(daily))
+        np.add.at(series, (rows, ages), quantities)
+    
+    # Column 0 is today; weights fall off geometrically with age and sum to one
+    weights = alpha * (1 - alpha) ** np.arange(window)
+    weights /= weights.sum()
+    
+    return dict(zip(wo_numbers, series @ weights))
+
+def project_completion(df, rates, today):
+    """Add remaining quantity, projected completion date and risk to the open orders"""
+    remaining = (df['Required'] - df['Fulfilled']).to_numpy(dtype=np.float64)
+    rates = np.nan_to_num(rates.astype(np.float64))
+    
+    # Orders with no recent production have no projected date
+    days_needed = np.where(rates > 0, np.ceil(remaining / np.where(rates > 0, rates, 1)), np.nan)
+    
+    projected = pd.Series(pd.Timestamp(today) + pd.to_timedelta(days_needed, unit='D'), index=df.index).dt.date
+    due = pd.to_datetime(df['Due Date'])
+    days_late = (pd.to_datetime(projected) - due).dt.days
+    
+    df['Remaining'] = remaining.astype(np.int64)
+    df['Rate / Day'] = rates.round(1)
+    df['Projected Completion'] = projected.where(~np.isnan(days_needed), None)
+    df['Days Late'] = days_late
+    
+    df['Risk'] = pd.Categorical(np.select(
+        [rates <= 0, days_late.fillna(0).to_numpy() > 0],
+        ["Stalled", "At risk"],
+        default="On track"
+    ), categories=RISK_LEVELS, ordered=True)
+    
+    return df[FORECAST_COLUMNS].sort_values(['Risk', 'Days Late', 'Due Date'], ascending=[True, False, True])
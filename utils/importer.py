@@ -0,0 +1,563 @@
+"""Bulk import of Unified workbooks
+
+Each known sheet is read row by row from the .xlsx, its columns are mapped by
+header to a table, and every column is validated as a whole. diff_import then
+hashes the rows and the stored records they cover on each sheet's key and
+reports what would be added, updated or deleted. Only those rows are COPYed
+into a staging table and written with one INSERT ... SELECT and one
+UPDATE ... FROM per table, so importing the same workbook twice changes
+nothing. Each import writes one audit record summarizing what it loaded.
+"""
+import io
+import json
+import re
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from database import engine, get_db, log_audit_trail_batch, request_analytics_refresh
+from utils.workbook import read_workbook
+
+# Rows sent per COPY statement
+IMPORT_COPY_ROWS = 50_000
+
+# Rows searched for a sheet's header row
+IMPORT_HEADER_SEARCH_ROWS = 20
+
+# Columns kept from the stored record rather than compared and updated
+IMPORT_KEPT_COLUMNS = {"created_at"}
+
+# SQL type of each column kind, for passing a column as an array
+IMPORT_SQL_TYPES = {"text": "VARCHAR", "date": "DATE", "decimal": "NUMERIC"}
+
+EXCEL_ORIGIN = "1899-12-30"
+
+# Sheets that can be imported, by sheet name. Each column lists the headers it
+# may appear under and its kind:
+#   text (with an optional length limit), date, quantity (> 0), count (>= 0),
+#   decimal (> 0), project (resolved by name) or user (resolved by username).
+# "fill" columns are carried down from the row above when blank, as the
+# workbook writes an order's number and project only on its first row.
+# A row is imported only when one of its "row_columns" has a value, which
+# skips blank and total rows. "key" names the columns that match an imported
+# row to the stored record it corrects; rows sharing a key, which are all
+# valid lines, are matched to stored records in order. "scope" names the
+# columns that say which stored records a sheet covers: a stored record
+# sharing their values with an imported row, but not matched to one, was
+# deleted from the sheet. "updated_at" is False for tables without that column.
+IMPORT_SHEETS = {
+    "Cutting List": {
+        "table": "cutting_lists",
+        "columns": [
+            {"column": "order_number", "headers": ["ORDER #", "ORDER NO"], "kind": "text", "length": 100,
+             "required": True, "fill": True},
+            {"column": "project_id", "headers": ["PROJECT", "PARTY NAME"], "kind": "project", "fill": True},
+            {"column": "floor", "headers": ["FLOOR"], "kind": "text", "length": 100},
+            {"column": "created_at", "headers": ["C.L DATE"], "kind": "date"},
+            {"column": "description", "headers": ["DESCRIPTION", "DESCIPTION"], "kind": "text"},
+            {"column": "width", "headers": ["W", "WIDTH"], "kind": "decimal"},
+            {"column": "height", "headers": ["H", "HEIGHT"], "kind": "decimal"},
+            {"column": "quantity", "headers": ["QTY", "QUANTITY"], "kind": "quantity", "required": True},
+            {"column": "color", "headers": ["COLOR", "COLOUR"], "kind": "text", "length": 100},
+            {"column": "status", "headers": ["STATUS"], "kind": "text", "length": 50, "default": "Pending"},
+            {"column": "cut_date", "headers": ["CUT DATE"], "kind": "date"}
+        ],
+        "row_columns": ["description", "width", "height"],
+        "key": ["order_number", "floor", "description", "width", "height", "color"],
+        "scope": ["order_number"]
+    },
+    "Balance Order": {
+        "table": "balance_orders",
+        "columns": [
+            {"column": "created_at", "headers": ["DATE"], "kind": "date", "fill": True},
+            {"column": "wo_number", "headers": ["WO #", "WO NO"], "kind": "text", "length": 100,
+             "required": True, "fill": True},
+            {"column": "project_id", "headers": ["PROJECT"], "kind": "project", "fill": True},
+            {"column": "floor", "headers": ["FLOOR"], "kind": "text", "length": 100},
+            {"column": "priority", "headers": ["PRIORITY", "PRIORTY"], "kind": "text", "length": 20,
+             "default": "Medium"},
+            {"column": "specifications", "headers": ["GLASS SPECS", "SPECIFICATIONS"], "kind": "text"},
+            {"column": "required_qty", "headers": ["P.O", "REQUIRED"], "kind": "quantity", "required": True},
+            {"column": "fulfilled_qty", "headers": ["F. QTY", "F.QTY", "FULFILLED"], "kind": "count", "default": 0},
+            {"column": "total_qty", "headers": ["TOTAL"], "kind": "count"},
+            {"column": "due_date", "headers": ["DUE DATE"], "kind": "date"},
+            {"column": "status", "headers": ["STATUS"], "kind": "text", "length": 50, "default": "Pending"}
+        ],
+        "row_columns": ["floor", "specifications"],
+        "key": ["wo_number", "floor", "specifications"],
+        "scope": ["wo_number"]
+    },
+    "Production Log": {
+        "table": "production_log",
+        "columns": [
+            {"column": "wo_number", "headers": ["ORDER #", "WO #"], "kind": "text", "length": 100,
+             "required": True, "fill": True},
+            {"column": "project_id", "headers": ["PROJECT"], "kind": "project", "fill": True},
+            {"column": "production_date", "headers": ["DATE"], "kind": "date", "required": True},
+            {"column": "shift", "headers": ["SHIFT"], "kind": "text", "length": 20},
+            {"column": "operator_id", "headers": ["OPERATOR"], "kind": "user"},
+            {"column": "machine_used", "headers": ["MACHINE"], "kind": "text", "length": 200},
+            {"column": "produced_quantity", "headers": ["QTY"], "kind": "quantity", "required": True},
+            {"column": "notes", "headers": ["NOTES", "REMARKS"], "kind": "text"}
+        ],
+        "row_columns": ["production_date"],
+        "key": ["wo_number", "operator_id", "production_date", "shift", "machine_used"],
+        "scope": ["wo_number", "production_date"],
+        "updated_at": False
+    },
+    "Daily Production Targets": {
+        "table": "daily_targets",
+        "columns": [
+            {"column": "order_number", "headers": ["ORDER #"], "kind": "text", "length": 100,
+             "required": True, "fill": True},
+            {"column": "project_id", "headers": ["PROJECT"], "kind": "project", "fill": True},
+            {"column": "description", "headers": ["DESCRIPTION"], "kind": "text"},
+            {"column": "target_date", "headers": ["TARGET DATE"], "kind": "date"},
+            {"column": "target_quantity", "headers": ["QTY"], "kind": "quantity"},
+            {"column": "actual_quantity", "headers": ["ACTUAL"], "kind": "count", "default": 0},
+            {"column": "assigned_to", "headers": ["ASSIGNED TO", "R.P"], "kind": "user"},
+            {"column": "status", "headers": ["STATUS"], "kind": "text", "length": 50, "default": "Not Started"},
+            {"column": "completion_date", "headers": ["COMPLETED"], "kind": "date"},
+            {"column": "notes", "headers": ["REMARKS", "NOTES"], "kind": "text"}
+        ],
+        "row_columns": ["description", "target_date"],
+        "key": ["order_number", "target_date", "description"],
+        "scope": ["order_number", "target_date"]
+    }
+}
+
+def normalize_label(value):
+    """Upper-case a header or name and collapse its whitespace"""
+    return re.sub(r"\s+", " ", str(value)).strip().upper()
+
+def find_header(rows, columns):
+    """Consume rows up to the header row and return {column: cell index}, or None if not found
+    
+    The header row is the first one holding a header for every required column;
+    each column takes the first cell matching any of its headers.
+    """
+    required = [spec for spec in columns if spec.get("required")]
+    
+    for _ in range(IMPORT_HEADER_SEARCH_ROWS):
+        _, values = next(rows, (None, None))
+        if values is None:
+            return None
+        
+        labels = [normalize_label(value) if value is not None else "" for value in values]
+        positions = {}
+        for spec in columns:
+            matches = [labels.index(header) for header in spec["headers"] if header in labels]
+            if matches:
+                positions[spec["column"]] = min(matches)
+        
+        if all(spec["column"] in positions for spec in required):
+            return positions
+    
+    return None
+
+def read_sheet_frame(rows, columns):
+    """Read the rows below the header into a frame of the mapped columns, plus the source row number"""
+    positions = find_header(rows, columns)
+    if positions is None:
+        return None
+    
+    mapped = list(positions.items())
+    records = []
+    for row_number, values in rows:
+        records.append([row_number] + [values[index] if index < len(values) else None for _, index in mapped])
+    
+    frame = pd.DataFrame(records, columns=["_row"] + [column for column, _ in mapped], dtype=object)
+    
+    # Blank and whitespace-only cells are missing values
+    for column, _ in mapped:
+        frame[column] = frame[column].where(~frame[column].map(lambda value: isinstance(value, str) and not value.strip()))
+    
+    return frame
+
+def fill_down(values):
+    """Carry the last present value down over missing ones, keeping the column's dtype"""
+    positions = np.where(values.notna(), np.arange(len(values)), -1)
+    positions = np.maximum.accumulate(positions) if len(positions) else positions
+    filled = np.append(values.to_numpy(), None)[positions]
+    return pd.Series(filled, index=values.index, dtype=values.dtype)
+
+def is_header_row(frame, columns):
+    """Rows that repeat the header, as a sheet with several blocks does"""
+    matches = sum(
+        frame[spec["column"]].map(lambda value: isinstance(value, str) and normalize_label(value) in spec["headers"])
+        for spec in columns if spec["column"] in frame
+    )
+    return matches >= 2
+
+def to_dates(values):
+    """Date cells, Excel serials and date strings to datetimes; unparseable values become NaT"""
+    cells = values.map(lambda value: isinstance(value, date))
+    serials = pd.to_numeric(values.where(~cells), errors="coerce")
+    dates = pd.to_datetime(serials, unit="D", origin=EXCEL_ORIGIN, errors="coerce")
+    if cells.any():
+        dates[cells] = pd.to_datetime(values[cells])
+    
+    # Only strings that carry a year, so "27TH AUG" is not read as this year's
+    strings = values[serials.isna() & values.notna() & ~cells].astype(str)
+    strings = strings[strings.str.contains(r"\b\d{4}\b")]
+    if not strings.empty:
+        dates[strings.index] = pd.to_datetime(strings, errors="coerce", dayfirst=True, format="mixed")
+    return dates.dt.normalize()
+
+def to_text(values):
+    """Cells as strings, with whole numbers such as floor 14.0 written as 14"""
+    numbers = pd.to_numeric(values, errors="coerce")
+    whole = numbers.notna() & (numbers % 1 == 0)
+    as_text = values.where(values.isna(), values.astype(str).str.strip())
+    return as_text.where(~whole, numbers[whole].astype("int64").astype(str))
+
+def get_import_lookups():
+    """Projects and users by normalized name, for resolving the project and user columns"""
+    db = get_db()
+    try:
+        projects = db.execute(text("SELECT id, name FROM projects")).fetchall()
+        users = db.execute(text("SELECT id, username FROM users")).fetchall()
+    finally:
+        db.close()
+    
+    return {
+        "project": {normalize_label(name): project_id for project_id, name in projects},
+        "user": {normalize_label(username): user_id for user_id, username in users}
+    }
+
+def validate_sheet(sheet_name, frame, columns, lookups, default_project_id=None):
+    """Convert and check every column of a sheet frame at once
+    
+    Returns (valid rows with typed columns, errors). Errors list the sheet, row,
+    header, value and problem; a row with any error is left out.
+    """
+    problems = []
+    valid = pd.Series(True, index=frame.index)
+    typed = pd.DataFrame(index=frame.index)
+    
+    def reject(mask, spec, message):
+        nonlocal valid
+        if mask.any():
+            problems.append(pd.DataFrame({
+                "Sheet": sheet_name,
+                "Row": frame.loc[mask, "_row"],
+                "Column": spec["headers"][0],
+                "Value": frame.loc[mask, spec["column"]].map(lambda value: "" if pd.isna(value) else str(value)),
+                "Problem": message
+            }))
+            valid &= ~mask
+    
+    for spec in columns:
+        column = spec["column"]
+        kind = spec["kind"]
+        
+        if column not in frame:
+            if kind == "project" and default_project_id is not None:
+                typed[column] = default_project_id
+            continue
+        
+        values = frame[column]
+        present = values.notna()
+        
+        if kind == "text":
+            converted = to_text(values)
+            if spec.get("length"):
+                reject(converted.str.len() > spec["length"], spec, f"Longer than {spec['length']} characters")
+        elif kind == "date":
+            converted = to_dates(values)
+            reject(present & converted.isna(), spec, "Not a date")
+        elif kind in ("quantity", "count", "decimal"):
+            numbers = pd.to_numeric(values, errors="coerce")
+            reject(present & numbers.isna(), spec, "Not a number")
+            if kind == "count":
+                reject(numbers < 0, spec, "Negative quantity")
+            else:
+                reject(numbers <= 0, spec, "Must be greater than zero")
+            if kind != "decimal":
+                reject(numbers.notna() & (numbers % 1 != 0), spec, "Not a whole number")
+                converted = numbers.round().astype("Int64")
+            else:
+                converted = numbers.round(2)
+        else:
+            names = values.map(normalize_label, na_action="ignore")
+            converted = names.map(lookups[kind]).astype("Int64")
+            reject(present & converted.isna(), spec, f"Unknown {kind}")
+            if kind == "project" and default_project_id is not None:
+                converted = converted.where(present, default_project_id).astype("Int64")
+        
+        if spec.get("required"):
+            reject(~present, spec, "Missing")
+        if "default" in spec:
+            converted = converted.where(converted.notna(), spec["default"])
+        
+        typed[column] = converted
+    
+    errors = pd.concat(problems, ignore_index=True) if problems else pd.DataFrame(
+        columns=["Sheet", "Row", "Column", "Value", "Problem"])
+    return typed[valid], errors
+
+def parse_unified_workbook(source, default_project_id=None):
+    """Read and validate every known sheet of a Unified workbook
+    
+    Returns {"tables": {table: valid rows}, "errors": DataFrame, "sheets": {sheet:
+    (rows read, rows valid)}}. default_project_id fills in the project where a
+    sheet has no project column or a row leaves it blank.
+    """
+    lookups = get_import_lookups()
+    known_sheets = {normalize_label(name): name for name in IMPORT_SHEETS}
+    tables, errors, sheets = {}, [], {}
+    
+    for name, rows in read_workbook(source):
+        sheet_name = known_sheets.get(normalize_label(name))
+        if sheet_name is None:
+            continue
+        
+        sheet = IMPORT_SHEETS[sheet_name]
+        frame = read_sheet_frame(rows, sheet["columns"])
+        if frame is None:
+            required = ", ".join(spec["headers"][0] for spec in sheet["columns"] if spec.get("required"))
+            errors.append(pd.DataFrame([{"Sheet": sheet_name, "Row": None, "Column": None, "Value": "",
+                                         "Problem": f"No header row with {required}; sheet skipped"}]))
+            sheets[sheet_name] = (0, 0)
+            continue
+        
+        frame = frame[~is_header_row(frame, sheet["columns"])]
+        for spec in sheet["columns"]:
+            if spec.get("fill") and spec["column"] in frame:
+                frame[spec["column"]] = fill_down(frame[spec["column"]])
+        
+        row_columns = [column for column in sheet["row_columns"] if column in frame]
+        if row_columns:
+            frame = frame[frame[row_columns].notna().any(axis=1)]
+        
+        valid, sheet_errors = validate_sheet(sheet_name, frame, sheet["columns"], lookups, default_project_id)
+        tables[sheet["table"]] = valid
+        errors.append(sheet_errors)
+        sheets[sheet_name] = (len(frame), len(valid))
+    
+    return {
+        "tables": tables,
+        "errors": pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(),
+        "sheets": sheets
+    }
+
+def diff_values(values, kind):
+    """Cast a column to one dtype per kind, so imported and stored values hash and compare alike"""
+    if kind == "text":
+        return values.astype("string")
+    if kind == "date":
+        return pd.to_datetime(values).dt.normalize()
+    if kind == "decimal":
+        return pd.to_numeric(values).astype("Float64").round(2)
+    return pd.to_numeric(values).astype("Int64")
+
+def display_values(values):
+    """Compared values as text for the list of changes, with missing values blank"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.strftime("%Y-%m-%d")
+    return values.astype("string").fillna("")
+
+def key_labels(values, key):
+    """Each row's natural key as one readable string"""
+    labels = [display_values(values[column]) for column in key]
+    return pd.Series([" / ".join(parts) for parts in zip(*labels)], index=values.index, dtype=object)
+
+def _sql_values(values):
+    return [None if pd.isna(value) else value for value in values.tolist()]
+
+def get_stored_records(table, frame, specs, columns):
+    """Stored records in the scope of the imported rows, as a frame of id and columns"""
+    sheet = next(sheet for sheet in IMPORT_SHEETS.values() if sheet["table"] == table)
+    scope = [column for column in sheet["scope"] if column in frame]
+    scope_values = frame[scope].drop_duplicates()
+    
+    arrays = ", ".join(f"CAST(:scope_{index} AS {IMPORT_SQL_TYPES.get(specs[column]['kind'], 'INTEGER')}[])"
+                       for index, column in enumerate(scope))
+    # Equality on the first scope column lets the join hash; the rest compare NULLs as equal
+    matches = " AND ".join([f"t.{scope[0]} = s.{scope[0]}"] +
+                           [f"t.{column} IS NOT DISTINCT FROM s.{column}" for column in scope[1:]])
+    
+    db = get_db()
+    try:
+        rows = db.execute(text(f"""
+            SELECT t.id, {", ".join(f"t.{column}" for column in columns)}
+            FROM {table} t
+            JOIN unnest({arrays}) AS s({", ".join(scope)}) ON {matches}
+            ORDER BY t.id
+        """), {f"scope_{index}": _sql_values(scope_values[column]) for index, column in enumerate(scope)}).fetchall()
+    finally:
+        db.close()
+    
+    return pd.DataFrame(rows, columns=["id"] + columns)
+
+def diff_import(tables):
+    """Dry run: compare validated rows with the stored records an import would write, without writing
+    
+    Imported rows and stored records in their scope are hashed on the sheet's
+    key, plus the row's occurrence among those sharing it, and on the compared
+    columns, then hash-joined. Returns {"delta": {table: rows to write, with the
+    id of the stored record each updates}, "deleted": {table: ids of stored
+    records missing from the sheet}, "summary": {table: (added, updated,
+    unchanged, deleted)}, "changes": DataFrame listing each added, deleted and
+    changed field}. Passing delta and deleted to load_import applies only the
+    changes.
+    """
+    delta, deleted, summary, changes = {}, {}, {}, []
+    
+    for table, frame in tables.items():
+        sheet = next(sheet for sheet in IMPORT_SHEETS.values() if sheet["table"] == table)
+        specs = {spec["column"]: spec for spec in sheet["columns"]}
+        key = sheet["key"]
+        compared = [column for column in frame.columns if column not in key and column not in IMPORT_KEPT_COLUMNS]
+        
+        if frame.empty:
+            delta[table], deleted[table], summary[table] = frame, [], (0, 0, 0, 0)
+            continue
+        
+        stored = get_stored_records(table, frame, specs, key + compared)
+        
+        # Key columns missing from the sheet are written as NULL, so they are matched as NULL
+        incoming = pd.DataFrame({column: diff_values(frame[column] if column in frame else
+                                                     pd.Series(None, index=frame.index, dtype=object),
+                                                     specs[column]["kind"])
+                                 for column in key + compared}, index=frame.index)
+        existing = pd.DataFrame({column: diff_values(stored[column], specs[column]["kind"])
+                                 for column in key + compared}, index=stored.index)
+        
+        # Stored records arrive in id order, so repeated lines pair up in the order they were written
+        incoming_key = incoming[key].assign(occurrence=incoming.groupby(key, dropna=False, sort=False).cumcount())
+        existing_key = existing[key].assign(occurrence=existing.groupby(key, dropna=False, sort=False).cumcount())
+        
+        pairs = pd.DataFrame({
+            "key_hash": pd.util.hash_pandas_object(incoming_key, index=False).to_numpy(),
+            "row_hash": pd.util.hash_pandas_object(incoming[compared], index=False).to_numpy() if compared else 0,
+            "incoming": incoming.index
+        }).merge(pd.DataFrame({
+            "key_hash": pd.util.hash_pandas_object(existing_key, index=False).to_numpy(),
+            "row_hash": pd.util.hash_pandas_object(existing[compared], index=False).to_numpy() if compared else 0,
+            "stored": existing.index
+        }), on="key_hash", how="outer", suffixes=("", "_stored"), indicator=True)
+        
+        added = pairs.loc[pairs["_merge"] == "left_only", "incoming"].astype("int64")
+        missing = pairs.loc[pairs["_merge"] == "right_only", "stored"].astype("int64")
+        matched = pairs[pairs["_merge"] == "both"]
+        updated = matched[matched["row_hash"] != matched["row_hash_stored"]]
+        
+        delta[table] = frame.loc[frame.index.isin(added) | frame.index.isin(updated["incoming"])].assign(
+            id=pd.Series(stored.loc[updated["stored"].astype("int64"), "id"].to_numpy(),
+                         index=updated["incoming"].astype("int64").to_numpy(), dtype="Int64"))
+        deleted[table] = stored.loc[missing, "id"].tolist()
+        summary[table] = (len(added), len(updated), len(matched) - len(updated), len(missing))
+        
+        for change, rows in (("Added", incoming.loc[added]), ("Deleted", existing.loc[missing])):
+            if not rows.empty:
+                changes.append(pd.DataFrame({"Table": table, "Change": change, "Key": key_labels(rows, key),
+                                             "Column": "", "Old": "", "New": ""}))
+        
+        if not updated.empty:
+            new = incoming.loc[updated["incoming"].astype("int64")].reset_index(drop=True)
+            old = existing.loc[updated["stored"].astype("int64")].reset_index(drop=True)
+            keys = key_labels(new, key)
+            for column in compared:
+                differs = (new[column] != old[column]).fillna(True) & ~(new[column].isna() & old[column].isna())
+                if differs.any():
+                    changes.append(pd.DataFrame({
+                        "Table": table, "Change": "Updated", "Key": keys[differs],
+                        "Column": specs[column]["headers"][0],
+                        "Old": display_values(old.loc[differs, column]), "New": display_values(new.loc[differs, column])
+                    }))
+    
+    return {
+        "delta": delta,
+        "deleted": deleted,
+        "summary": summary,
+        "changes": pd.concat(changes, ignore_index=True) if changes else pd.DataFrame(
+            columns=["Table", "Change", "Key", "Column", "Old", "New"])
+    }
+
+def _copy_frame(cursor, staging, frame):
+    columns = ", ".join(frame.columns)
+    for start in range(0, len(frame), IMPORT_COPY_ROWS):
+        buffer = io.StringIO()
+        frame.iloc[start:start + IMPORT_COPY_ROWS].to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def load_import(tables, file_name, user_id, deleted=None):
+    """COPY validated rows into staging tables and write them in one transaction
+    
+    A row with an "id", as diff_import gives for a corrected row, updates that
+    record when any imported value differs; other rows are inserted. deleted
+    optionally maps tables to ids of records to delete in the same transaction.
+    Returns {table: (rows staged, rows inserted, rows updated, rows deleted)}.
+    """
+    summary = {}
+    audit_entries = []
+    
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        
+        for table in dict.fromkeys(list(tables) + list(deleted or {})):
+            frame = tables.get(table)
+            inserted = updated = 0
+            
+            if frame is not None and not frame.empty:
+                sheet = next(sheet for sheet in IMPORT_SHEETS.values() if sheet["table"] == table)
+                staging = f"import_{table}"
+                columns = list(frame.columns)
+                column_list = ", ".join(columns)
+                
+                conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+                conn.execute(text(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA"))
+                _copy_frame(cursor, staging, frame)
+                
+                created_at = "COALESCE(s.created_at, CURRENT_TIMESTAMP)" if "created_at" in columns else "CURRENT_TIMESTAMP"
+                target_columns = [column for column in columns if column not in ("id", "created_at")]
+                staged_columns = ", ".join(f"s.{column}" for column in target_columns)
+                
+                inserted = conn.execute(text(f"""
+                    WITH inserted AS (
+                        INSERT INTO {table} ({", ".join(target_columns)}, created_by, created_at)
+                        SELECT {staged_columns}, :user_id, {created_at}
+                        FROM {staging} s
+                        {"WHERE s.id IS NULL" if "id" in columns else ""}
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM inserted
+                """), {"user_id": user_id}).scalar()
+                
+                compared = [column for column in target_columns if column not in IMPORT_KEPT_COLUMNS]
+                if "id" in columns and compared:
+                    assignments = ", ".join(f"{column} = s.{column}" for column in compared)
+                    if sheet.get("updated_at", True):
+                        assignments += ", updated_at = CURRENT_TIMESTAMP"
+                    updated = conn.execute(text(f"""
+                        WITH updated AS (
+                            UPDATE {table} t
+                            SET {assignments}
+                            FROM {staging} s
+                            WHERE t.id = s.id
+                                AND ({", ".join(f"t.{column}" for column in compared)})
+                                    IS DISTINCT FROM ({", ".join(f"s.{column}" for column in compared)})
+                            RETURNING 1
+                        )
+                        SELECT COUNT(*) FROM updated
+                    """)).scalar()
+            
+            removed = []
+            if deleted and deleted.get(table):
+                removed = [row[0] for row in conn.execute(text(f"DELETE FROM {table} WHERE id = ANY(:ids) RETURNING id"),
+                                                          {"ids": deleted[table]}).fetchall()]
+                audit_entries.extend((table, record_id, "DELETE", None, None, None) for record_id in removed)
+            
+            summary[table] = (0 if frame is None else len(frame), inserted, updated, len(removed))
+        
+        audit_entries.append((
+            "imports", 0, "IMPORT", file_name, None,
+            json.dumps({table: {"rows": staged, "inserted": inserted, "updated": updated, "deleted": removed}
+                        for table, (staged, inserted, updated, removed) in summary.items()})
+        ))
+        log_audit_trail_batch(audit_entries, user_id, db=conn)
+    
+    request_analytics_refresh()
+    return summary
@@ -0,0 +1,21 @@
+import streamlit as st
+
+def show_lazy_tabs(tabs, key):
+    """Tab-style navigation that only runs the selected tab
+
+    tabs maps each tab label to the function that renders it. Unlike st.tabs,
+    which executes every tab body on every run, only the active tab's function
+    is called. The selection is kept in session state under key, outside the
+    widget's own state, so it survives page switches as well as reruns.
+    """
+    labels = list(tabs.keys())
+    
+    if st.session_state.get(key) not in labels:
+        st.session_state[key] = labels[0]
+    
+    selected = st.radio("Section", options=labels, index=labels.index(st.session_state[key]),
+                        key=f"{key}_selector", horizontal=True, label_visibility="collapsed")
+    st.session_state[key] = selected
+    st.divider()
+    
+    tabs[selected]()
@@ -0,0 +1,105 @@
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from database import get_db
+
+SHIFTS = ["Morning", "Afternoon", "Night"]
+
+def get_machine_cube(start_date, end_date):
+    """Fetch machine x day x shift production from the precomputed cube"""
+    db = get_db()
+    try:
+        rows = db.execute(text("""
+            SELECT machine_used, production_date, shift, total_quantity, entry_count
+            FROM mv_machine_day_cube
+            WHERE production_date >= :start_date AND production_date <= :end_date
+        """), {"start_date": start_date, "end_date": end_date}).fetchall()
+    finally:
+        db.close()
+    
+    return pd.DataFrame(rows, columns=['Machine', 'Date', 'Shift', 'Produced', 'Entries'])
+
+def get_shift_calendar():
+    """Fetch the planned capacity of every configured machine and shift"""
+    db = get_db()
+    try:
+        rows = db.execute(text("""
+            SELECT machine_used, shift, capacity FROM machine_shift_calendar ORDER BY machine_used, shift
+        """)).fetchall()
+    finally:
+        db.close()
+    
+    return pd.DataFrame(rows, columns=['Machine', 'Shift', 'Capacity'])
+
+def save_shift_calendar(calendar):
+    """Replace the shift calendar with the edited rows; rows with zero capacity are removed"""
+    rows = calendar.dropna(subset=['Machine', 'Shift'])
+    rows = rows[rows['Capacity'].fillna(0) > 0].drop_duplicates(['Machine', 'Shift'], keep='last')
+    
+    try:
+        db = get_db()
+        
+        db.execute(text("DELETE FROM machine_shift_calendar"))
+        if not rows.empty:
+            db.execute(text("""
+                INSERT INTO machine_shift_calendar (machine_used, shift, capacity)
+                SELECT * FROM unnest(CAST(:machines AS VARCHAR[]), CAST(:shifts AS VARCHAR[]), CAST(:capacities AS INTEGER[]))
+            """), {
+                "machines": rows['Machine'].astype(str).tolist(),
+                "shifts": rows['Shift'].astype(str).tolist(),
+                "capacities": rows['Capacity'].astype(int).tolist()
+            })
+        
+        db.commit()
+        db.close()
+        return True
+    
+    except Exception as e:
+        st.error(f"Error saving shift calendar: {str(e)}")
+        return False
+
+def machine_shift_metrics(cube, calendar, start_date, end_date):
+    """Availability, performance and utilization per machine and shift
+    
+    Every day in the period counts as a scheduled shift for each calendar entry.
+    Availability is the share of scheduled shifts with any output, performance is
+    output against capacity on the shifts that ran, and utilization (OEE without a
+    quality factor, which is not recorded) is output against all scheduled capacity.
+    """
+    days = (end_date - start_date).days + 1
+    
+    actual = cube.groupby(['Machine', 'Shift'], as_index=False).agg(
+        Produced=('Produced', 'sum'),
+        Shifts_Run=('Date', 'nunique')
+    ).rename(columns={'Shifts_Run': 'Shifts Run'})
+    
+    metrics = actual.merge(calendar, on=['Machine', 'Shift'], how='outer')
+    metrics['Produced'] = metrics['Produced'].fillna(0)
+    metrics['Shifts Run'] = metrics['Shifts Run'].fillna(0).astype(int)
+    metrics['Scheduled'] = metrics['Capacity'].gt(0) * days
+    
+    scheduled = metrics['Scheduled'].where(metrics['Scheduled'] > 0)
+    capacity = metrics['Capacity'].where(metrics['Capacity'] > 0)
+    metrics['Availability %'] = (metrics['Shifts Run'] * 100.0 / scheduled).round(1)
+    metrics['Performance %'] = (metrics['Produced'] * 100.0 / (capacity * metrics['Shifts Run'].where(metrics['Shifts Run'] > 0))).round(1)
+    metrics['Utilization %'] = (metrics['Produced'] * 100.0 / (capacity * scheduled)).round(1)
+    
+    return metrics.sort_values(['Utilization %', 'Machine'], na_position='first')
+
+def machine_day_matrix(cube, calendar):
+    """Machine x day matrix for the heatmap: utilization % where capacity is set, else output
+    
+    Returns (matrix, is_utilization).
+    """
+    daily = cube.groupby(['Machine', 'Date'], as_index=False)['Produced'].sum()
+    daily_capacity = calendar.groupby('Machine')['Capacity'].sum()
+    
+    if not daily_capacity.empty and daily['Machine'].isin(daily_capacity.index).all():
+        daily['Value'] = (daily['Produced'] * 100.0 / daily['Machine'].map(daily_capacity)).round(1)
+        is_utilization = True
+    else:
+        daily['Value'] = daily['Produced']
+        is_utilization = False
+    
+    matrix = daily.pivot(index='Machine', columns='Date', values='Value').fillna(0)
+    return matrix, is_utilization
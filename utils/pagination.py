@@ -0,0 +1,17 @@
+import streamlit as st
+
+def show_pagination(total_rows, key, page_sizes=(25, 50, 100)):
+    """Render page size and page selectors and return (limit, offset) for the row query"""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        page_size = st.selectbox("Rows per page", options=list(page_sizes), index=0, key=f"{key}_size")
+    
+    total_pages = max((total_rows + page_size - 1) // page_size, 1)
+    
+    with col2:
+        page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages,
+                               value=1, step=1, key=f"{key}_number")
+    
+    page = min(page, total_pages)
+    return page_size, (page - 1) * page_size
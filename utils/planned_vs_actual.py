@@ -0,0 +1,129 @@
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from database import get_db, log_audit_trail_batch
+
+VARIANCE_COLUMNS = [
+    'Target ID', 'Order Number', 'Date', 'Project', 'Operator',
+    'Planned', 'Reported', 'Actual', 'Entries'
+]
+
+# Targets matched to logged production by order number and day. Actuals come from
+# production_order_rollup, which a trigger keeps current as production rows arrive,
+# so the join touches one pre-aggregated row per order and day instead of the log.
+TARGET_ACTUALS_QUERY = """
+    WITH actuals AS (
+        SELECT wo_number, production_date,
+               CAST(SUM(total_quantity) AS BIGINT) as actual_quantity, CAST(SUM(entry_count) AS INTEGER) as entries
+        FROM production_order_rollup
+        WHERE production_date >= :start_date AND production_date <= :end_date
+        GROUP BY wo_number, production_date
+    )
+    SELECT
+        dt.id,
+        dt.order_number,
+        dt.target_date,
+        p.name as project_name,
+        u.username as assigned_to,
+        COALESCE(dt.target_quantity, 0) as planned,
+        COALESCE(dt.actual_quantity, 0) as reported,
+        COALESCE(a.actual_quantity, 0) as actual,
+        COALESCE(a.entries, 0) as entries
+    FROM daily_targets dt
+    LEFT JOIN actuals a ON a.wo_number = dt.order_number AND a.production_date = dt.target_date
+    LEFT JOIN projects p ON dt.project_id = p.id
+    LEFT JOIN users u ON dt.assigned_to = u.id
+    WHERE dt.target_date >= :start_date AND dt.target_date <= :end_date
+"""
+
+def get_target_variance(start_date, end_date, project_id=None):
+    """Return one row per target in the period with planned, reported and logged quantities
+    
+    Variance is logged actual minus planned; Attainment % is logged actual over
+    planned. Reported is the quantity typed into the target by hand.
+    """
+    query = TARGET_ACTUALS_QUERY
+    params = {"start_date": start_date, "end_date": end_date}
+    
+    if project_id:
+        query += " AND dt.project_id = :project_id"
+        params["project_id"] = project_id
+    
+    db = get_db()
+    try:
+        rows = db.execute(text(query), params).fetchall()
+    finally:
+        db.close()
+    
+    df = pd.DataFrame(rows, columns=VARIANCE_COLUMNS)
+    df['Project'] = df['Project'].fillna('No project')
+    df['Operator'] = df['Operator'].fillna('Unassigned')
+    return add_variance(df)
+
+def add_variance(df):
+    """Add Variance and Attainment % columns to a frame with Planned and Actual"""
+    df['Variance'] = df['Actual'] - df['Planned']
+    df['Attainment %'] = (df['Actual'] * 100.0 / df['Planned'].where(df['Planned'] > 0)).round(1)
+    return df
+
+def summarize_variance(df, by):
+    """Aggregate per-target variance by one or more columns, worst shortfall first"""
+    summary = df.groupby(by, as_index=False).agg(
+        Targets=('Target ID', 'count'),
+        Planned=('Planned', 'sum'),
+        Actual=('Actual', 'sum'),
+        Reported=('Reported', 'sum')
+    )
+    return add_variance(summary).sort_values('Variance')
+
+def sync_target_actuals(start_date, end_date, project_id=None):
+    """Copy logged production into the actual quantity of matching targets
+    
+    Only targets with logged production whose actual quantity differs are
+    updated, in one statement with one batched audit insert. Targets without
+    logged production keep their hand-entered figure. Returns the number of
+    targets updated, or None on error.
+    """
+    project_filter = " AND dt.project_id = :project_id" if project_id else ""
+    params = {"start_date": start_date, "end_date": end_date}
+    if project_id:
+        params["project_id"] = project_id
+    
+    try:
+        db = get_db()
+        
+        result = db.execute(text(f"""
+            WITH actuals AS (
+                SELECT wo_number, production_date, CAST(SUM(total_quantity) AS INTEGER) as actual_quantity
+                FROM production_order_rollup
+                WHERE production_date >= :start_date AND production_date <= :end_date
+                GROUP BY wo_number, production_date
+            ),
+            changes AS (
+                SELECT dt.id, dt.actual_quantity as old_quantity, a.actual_quantity as new_quantity
+                FROM daily_targets dt
+                JOIN actuals a ON a.wo_number = dt.order_number AND a.production_date = dt.target_date
+                WHERE dt.target_date >= :start_date AND dt.target_date <= :end_date
+                    AND dt.actual_quantity IS DISTINCT FROM a.actual_quantity {project_filter}
+                FOR UPDATE OF dt
+            )
+            UPDATE daily_targets t
+            SET actual_quantity = c.new_quantity, updated_at = CURRENT_TIMESTAMP
+            FROM changes c
+            WHERE t.id = c.id
+            RETURNING t.id, c.old_quantity, c.new_quantity
+        """), params)
+        updated = result.fetchall()
+        
+        log_audit_trail_batch(
+            [("daily_targets", row[0], "UPDATE", "actual_quantity", row[1], row[2]) for row in updated],
+            db=db
+        )
+        
+        db.commit()
+        db.close()
+        return len(updated)
+    
+    except Exception as e:
+        st.error(f"Error reconciling target actuals: {str(e)}")
+        return None
@@ -0,0 +1,362 @@
+"""Background report jobs
+
+Slow reports are queued in report_jobs instead of running inside the user's
+rerun. Worker threads, started per app process or run standalone with
+`python -m utils.report_jobs`, claim jobs with FOR UPDATE SKIP LOCKED and write
+each result to REPORT_CACHE_DIR under a name derived from (report, params,
+data version). Identical requests made before the data changes share one job
+and one file.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import date
+import streamlit as st
+from sqlalchemy import text
+from database import engine, get_db
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join("data", "report_cache"))
+
+# Worker threads started in each app process
+REPORT_WORKER_THREADS = int(os.getenv("REPORT_WORKER_THREADS", "2"))
+
+# Seconds an idle worker waits before polling the queue again
+REPORT_JOB_POLL_INTERVAL = 5
+
+# Seconds between heartbeats from a worker running a job
+REPORT_JOB_HEARTBEAT = 60
+
+# A running job not updated for this many seconds is assumed dead and claimed again
+REPORT_JOB_STALE_AFTER = 900
+
+# Seconds between status checks while a user is watching a pending job
+REPORT_JOB_STATUS_REFRESH = 2
+
+# Cached results older than this are removed when a job finishes
+REPORT_CACHE_MAX_AGE = 7 * 24 * 3600
+
+_report_job_queued = threading.Event()
+_report_workers = []
+
+def _unified_workbook(params, progress):
+    from utils.workbook import export_unified_workbook
+    
+    progress(0.1, "Streaming sheets")
+    return export_unified_workbook(params["project_id"])[0]
+
+def _challans(params, progress):
+    from utils.challans import generate_challan_batch
+    
+    progress(0.1, "Rendering challans")
+    return generate_challan_batch(params["project_id"], date.fromisoformat(params["from_date"]),
+                                  date.fromisoformat(params["to_date"]), params["as_zip"])[0]
+
+def _optional_date(value):
+    return date.fromisoformat(value) if value else None
+
+def _write_result(result):
+    """Pickle a report's result for its page to render and return the file's path"""
+    from utils.exports import create_export_file
+    
+    with create_export_file(".pkl") as output:
+        pickle.dump(result, output)
+    return output.name
+
+def _project_summaries(params, progress):
+    from utils.reports import generate_portfolio_report
+    
+    progress(0.1, "Summarizing projects")
+    report = generate_portfolio_report(params["project_ids"], _optional_date(params["from_date"]),
+                                       _optional_date(params["to_date"]))
+    
+    # The export directory is cleaned out, so the workbook travels inside the result
+    if report["xlsx"]:
+        with open(report["xlsx"], "rb") as workbook_file:
+            workbook = workbook_file.read()
+        os.remove(report["xlsx"])
+        report["xlsx"] = workbook
+    
+    progress(0.9, "Saving summaries")
+    return _write_result(report)
+
+def _production_report(params, progress):
+    from utils.reports import generate_production_report
+    
+    progress(0.1, "Reading production")
+    return _write_result(generate_production_report(date.fromisoformat(params["from_date"]),
+                                                    date.fromisoformat(params["to_date"])))
+
+# Reports that can be queued. "run" takes the job's params and a
+# progress(fraction, message) callback and returns the path of the file it wrote;
+# "file_name" gives the download name, whose extension also names the cached file.
+# Reports with "rendered" set write a pickled result that their page renders
+# instead of offering the file for download.
+REPORTS = {
+    "unified_workbook": {
+        "title": "Unified Workbook",
+        "file_name": lambda params: f"Unified_{params['label']}_{date.today():%Y%m%d}.xlsx",
+        "run": _unified_workbook
+    },
+    "challans": {
+        "title": "Bulk Challans",
+        "file_name": lambda params: (f"challans_{params['from_date'].replace('-', '')}_{params['to_date'].replace('-', '')}"
+                                     f".{'zip' if params['as_zip'] else 'txt'}"),
+        "run": _challans
+    },
+    "project_summaries": {
+        "title": "Project Summaries",
+        "file_name": lambda params: f"project_summaries_{date.today():%Y%m%d}.pkl",
+        "run": _project_summaries,
+        "rendered": True
+    },
+    "production_report": {
+        "title": "Production Report",
+        "file_name": lambda params: (f"production_report_{params['from_date'].replace('-', '')}_"
+                                     f"{params['to_date'].replace('-', '')}.pkl"),
+        "run": _production_report,
+        "rendered": True
+    }
+}
+
+def params_key(params):
+    """Canonical JSON for params, so equal requests compare equal"""
+    return json.dumps(params, sort_keys=True, default=str)
+
+def current_data_version(db):
+    """Latest audit id; every write is audited, so any change bumps it"""
+    return db.execute(text("SELECT COALESCE(MAX(id), 0) FROM audit_trail")).scalar()
+
+def cache_path(report, key, data_version, file_name):
+    digest = hashlib.sha256(f"{report}\n{key}\n{data_version}".encode("utf-8")).hexdigest()
+    return os.path.join(REPORT_CACHE_DIR, f"{report}_{digest[:32]}{os.path.splitext(file_name)[1]}")
+
+def enqueue_report_job(report, params, user_id=None):
+    """Queue a report, or return the id of the identical job already queued, running or ready"""
+    key = params_key(params)
+    db = get_db()
+    try:
+        data_version = current_data_version(db)
+        job = db.execute(text("""
+            SELECT id, status, result_path FROM report_jobs
+            WHERE report = :report AND params_key = :params_key AND data_version = :data_version
+        """), {"report": report, "params_key": key, "data_version": data_version}).fetchone()
+        
+        if job is None:
+            db.execute(text("""
+                INSERT INTO report_jobs (report, params, params_key, data_version, requested_by)
+                VALUES (:report, CAST(:params AS JSONB), :params_key, :data_version, :user_id)
+                ON CONFLICT ON CONSTRAINT report_jobs_request_key DO NOTHING
+            """), {"report": report, "params": key, "params_key": key,
+                   "data_version": data_version, "user_id": user_id})
+        elif job[1] == "Failed" or (job[1] == "Ready" and not (job[2] and os.path.exists(job[2]))):
+            # Retry a failure, or rebuild a result whose cached file has been cleaned up
+            db.execute(text("""
+                UPDATE report_jobs
+                SET status = 'Queued', progress = 0, message = NULL, error = NULL, result_path = NULL,
+                    requested_by = :user_id, created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = :id AND status = :status
+            """), {"id": job[0], "status": job[1], "user_id": user_id})
+        
+        job_id = db.execute(text("""
+            SELECT id FROM report_jobs
+            WHERE report = :report AND params_key = :params_key AND data_version = :data_version
+        """), {"report": report, "params_key": key, "data_version": data_version}).scalar()
+        db.commit()
+    finally:
+        db.close()
+    
+    _report_job_queued.set()
+    return job_id
+
+def get_report_job(job_id):
+    """Return the job row as a dict, or None"""
+    db = get_db()
+    try:
+        job = db.execute(text("""
+            SELECT id, report, status, progress, message, result_path, file_name, error,
+                   created_at, started_at, finished_at
+            FROM report_jobs WHERE id = :id
+        """), {"id": job_id}).mappings().fetchone()
+        return dict(job) if job else None
+    finally:
+        db.close()
+
+def get_recent_report_jobs(limit=50):
+    db = get_db()
+    try:
+        return db.execute(text("""
+            SELECT j.id, j.report, j.status, j.progress, j.message, j.result_path, j.file_name, j.error,
+                   j.created_at, j.finished_at, u.username as requested_by
+            FROM report_jobs j
+            LEFT JOIN users u ON j.requested_by = u.id
+            ORDER BY j.created_at DESC
+            LIMIT :limit
+        """), {"limit": limit}).mappings().fetchall()
+    finally:
+        db.close()
+
+def claim_report_job():
+    """Mark the oldest queued (or stale running) job as running and return (id, report, params, params_key, data_version)"""
+    with engine.begin() as conn:
+        return conn.execute(text("""
+            UPDATE report_jobs
+            SET status = 'Running', progress = 0, message = NULL,
+                started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM report_jobs
+                WHERE status = 'Queued'
+                    OR (status = 'Running' AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => :stale_after))
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, report, params, params_key, data_version
+        """), {"stale_after": REPORT_JOB_STALE_AFTER}).fetchone()
+
+def update_report_job(job_id, finished=False, **fields):
+    """Set fields on a job and touch updated_at, which also serves as its heartbeat"""
+    assignments = "".join(f", {field} = :{field}" for field in fields)
+    if finished:
+        assignments += ", finished_at = CURRENT_TIMESTAMP"
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE report_jobs SET updated_at = CURRENT_TIMESTAMP{assignments} WHERE id = :id"),
+                     {"id": job_id, **fields})
+
+def run_report_job(job):
+    """Run a claimed job and record its result; a result already in the cache is reused
+    
+    A heartbeat thread touches the job while it runs, so a long job is never
+    taken for dead and claimed by a second worker.
+    """
+    job_id, report, params, key, data_version = job
+    finished = threading.Event()
+    
+    def progress(fraction, message):
+        update_report_job(job_id, progress=fraction, message=message)
+    
+    def heartbeat():
+        while not finished.wait(REPORT_JOB_HEARTBEAT):
+            try:
+                update_report_job(job_id)
+            except Exception as e:
+                print(f"Report job {job_id} heartbeat error: {str(e)}")
+    
+    threading.Thread(target=heartbeat, name=f"report-heartbeat-{job_id}", daemon=True).start()
+    try:
+        definition = REPORTS[report]
+        file_name = definition["file_name"](params)
+        result_path = cache_path(report, key, data_version, file_name)
+        
+        if not os.path.exists(result_path):
+            os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+            shutil.move(definition["run"](params, progress), result_path)
+        
+        update_report_job(job_id, finished=True, status="Ready", progress=1, message=None,
+                          result_path=result_path, file_name=file_name)
+        _remove_expired_results()
+    except Exception as e:
+        print(f"Report job {job_id} ({report}) error: {str(e)}")
+        update_report_job(job_id, finished=True, status="Failed", error=str(e))
+    finally:
+        finished.set()
+
+def _remove_expired_results():
+    cutoff = time.time() - REPORT_CACHE_MAX_AGE
+    for entry in os.scandir(REPORT_CACHE_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def _report_worker_loop():
+    while True:
+        try:
+            job = claim_report_job()
+        except Exception as e:
+            print(f"Report queue error: {str(e)}")
+            job = None
+        
+        if job is None:
+            _report_job_queued.wait(REPORT_JOB_POLL_INTERVAL)
+            _report_job_queued.clear()
+            continue
+        
+        try:
+            run_report_job(job)
+        except Exception as e:
+            print(f"Report worker error: {str(e)}")
+
+def start_report_workers(threads=REPORT_WORKER_THREADS):
+    """Start the per-process threads that run queued report jobs"""
+    if _report_workers:
+        return
+    
+    for index in range(threads):
+        worker = threading.Thread(target=_report_worker_loop, name=f"report-worker-{index}", daemon=True)
+        worker.start()
+        _report_workers.append(worker)
+
+def show_report_job(report, params, button_label, key, render=None):
+    """Button that queues a background report, followed by the job's status and download
+    
+    For a rendered report, render is called with the unpickled result once the
+    job is ready.
+    """
+    if st.button(button_label, key=key):
+        try:
+            st.session_state[f"{key}_job"] = enqueue_report_job(report, params, st.session_state.user_id)
+        except Exception as e:
+            st.error(f"Error queuing report: {str(e)}")
+    
+    job_id = st.session_state.get(f"{key}_job")
+    if job_id:
+        show_report_job_status(job_id, key, render)
+
+def show_report_job_status(job_id, key, render=None):
+    """Progress while a job is pending, then its download, rendered result or error"""
+    job = get_report_job(job_id)
+    if job is None:
+        return
+    
+    if job["status"] in ("Queued", "Running"):
+        _show_pending_report_job(job_id)
+    elif job["status"] == "Failed":
+        st.error(f"Report failed: {job['error']}. Queue it again to retry.")
+    elif job["result_path"] and os.path.exists(job["result_path"]):
+        if REPORTS.get(job["report"], {}).get("rendered"):
+            if render is None:
+                st.success("Ready. Open it on its own tab.")
+            else:
+                with open(job["result_path"], "rb") as result_file:
+                    render(pickle.load(result_file))
+            return
+        
+        with open(job["result_path"], "rb") as result_file:
+            st.download_button(f"⬇️ Download {job['file_name']}", data=result_file, file_name=job["file_name"],
+                               mime=mimetypes.guess_type(job["file_name"])[0] or "application/octet-stream",
+                               key=f"{key}_download_{job_id}")
+    else:
+        st.info("This report has expired from the cache. Queue it again to rebuild it.")
+
+@st.fragment(run_every=REPORT_JOB_STATUS_REFRESH)
+def _show_pending_report_job(job_id):
+    job = get_report_job(job_id)
+    if job is None or job["status"] not in ("Queued", "Running"):
+        # Rerun the whole page so the finished job renders without polling
+        st.rerun()
+    
+    if job["status"] == "Queued":
+        st.progress(0.0, text="⏳ Queued")
+    else:
+        st.progress(min(max(job["progress"], 0.0), 1.0), text=f"🔄 Running{': ' + job['message'] if job['message'] else ''}")
+
+if __name__ == "__main__":
+    start_report_workers()
+    for worker in _report_workers:
+        worker.join()
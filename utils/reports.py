@@ -1,226 +1,165 @@
 import pandas as pd
-from datetime import datetime, date
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
 import streamlit as st
 
+# Threads rendering report outputs side by side
+REPORT_WORKERS = 4
+
 def generate_delivery_challan(dispatch_record):
     """Generate a delivery challan text document"""
-    challan_content = f"""
-    =====================================
-           DELIVERY CHALLAN
-    =====================================
-    
-    Challan No: {dispatch_record[9] or 'N/A'}
-    Date: {dispatch_record[5] or date.today()}
-    
-    -------------------------------------
-    PROJECT DETAILS
-    -------------------------------------
-    Project Name: {dispatch_record[1] or 'N/A'}
-    Order Number: {dispatch_record[2] or 'N/A'}
-    
-    -------------------------------------
-    DISPATCH DETAILS
-    -------------------------------------
-    Vehicle Number: {dispatch_record[3] or 'N/A'}
-    Driver Name: {dispatch_record[4] or 'N/A'}
-    Dispatch Date: {dispatch_record[5] or 'N/A'}
-    Expected Delivery: {dispatch_record[6] or 'N/A'}
-    Status: {dispatch_record[7] or 'N/A'}
-    
-    -------------------------------------
-    RESPONSIBLE PERSON
-    -------------------------------------
-    Name: {dispatch_record[8] or 'N/A'}
-    
-    -------------------------------------
-    NOTES
-    -------------------------------------
-    {dispatch_record[10] or 'No additional notes'}
-    
-    -------------------------------------
-    SIGNATURES
-    -------------------------------------
+    from utils.challans import render_challan
     
-    Dispatcher: ___________________
-    Date: _______
-    
-    Receiver: _____________________
-    Date: _______
-    
-    =====================================
-    Generated by PPMS on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    =====================================
-    """
-    
-    return challan_content
+    return render_challan(dispatch_record, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
-def export_projects_to_csv(projects_data):
-    """Export projects data to CSV format"""
-    if not projects_data:
-        return "No data to export"
-    
-    df = pd.DataFrame(projects_data, columns=[
-        'ID', 'Name', 'Client', 'Location', 'Start Date', 'End Date', 'Status', 'Created By', 'Created At'
-    ])
-    
-    return df.to_csv(index=False)
+# Summary columns shared by the text, CSV and workbook outputs
+PROJECT_SUMMARY_COLUMNS = [
+    'Project ID', 'Project', 'Client', 'Location', 'Start Date', 'End Date', 'Status', 'Description',
+    'Work Orders', 'Completed WO', 'Pending WO',
+    'Production Entries', 'Produced',
+    'Cutting Items', 'Cutting Quantity', 'Items Cut',
+    'Balance Orders', 'Required', 'Fulfilled',
+    'Dispatches', 'Delivered'
+]
 
-def export_work_orders_to_csv(work_orders_data):
-    """Export work orders data to CSV format"""
-    if not work_orders_data:
-        return "No data to export"
-    
-    df = pd.DataFrame(work_orders_data, columns=[
-        'ID', 'WO Number', 'Project', 'Floor', 'Description', 'Type', 'Status', 'Priority', 
-        'Due Date', 'Assigned To', 'Created By', 'Created At'
-    ])
-    
-    return df.to_csv(index=False)
-
-def export_production_log_to_csv(production_data):
-    """Export production log data to CSV format"""
-    if not production_data:
-        return "No data to export"
-    
-    df = pd.DataFrame(production_data, columns=[
-        'ID', 'WO Number', 'Project', 'Operator', 'Machine', 'Quantity', 
-        'Production Date', 'Shift', 'Notes', 'Created By', 'Created At'
-    ])
-    
-    return df.to_csv(index=False)
+# Every project's summary for a period in one statement: one CTE per module,
+# grouped by project and joined back to the projects in scope. Production comes
+# from the daily rollup and is bounded by production date, dispatches by dispatch
+# date; the other modules by when their records were created. Bounds are
+# half-open, so the whole of the last day is included. The {column_range}
+# slots take only the bounds that are given, so each module is read through its
+# (project_id, date) index.
+PROJECT_SUMMARY_QUERY = """
+    WITH scope AS (
+        SELECT id, name, client, location, start_date, end_date, status, description
+        FROM projects
+        WHERE CAST(:project_ids AS INTEGER[]) IS NULL OR id = ANY(:project_ids)
+    ),
+    wo AS (
+        SELECT project_id,
+               COUNT(*) as total_wo,
+               COUNT(*) FILTER (WHERE status = 'Completed') as completed_wo,
+               COUNT(*) FILTER (WHERE status = 'Pending') as pending_wo
+        FROM work_orders
+        WHERE project_id IN (SELECT id FROM scope)
+            {created_at_range}
+        GROUP BY project_id
+    ),
+    production AS (
+        SELECT project_id,
+               CAST(SUM(entry_count) AS BIGINT) as total_entries,
+               CAST(SUM(total_quantity) AS BIGINT) as total_produced
+        FROM production_daily_rollup
+        WHERE project_id IN (SELECT id FROM scope)
+            {production_date_range}
+        GROUP BY project_id
+    ),
+    cutting AS (
+        SELECT project_id,
+               COUNT(*) as cutting_items,
+               CAST(SUM(quantity) AS BIGINT) as cutting_quantity,
+               COUNT(*) FILTER (WHERE status = 'Cut') as cut_items
+        FROM cutting_lists
+        WHERE project_id IN (SELECT id FROM scope)
+            {created_at_range}
+        GROUP BY project_id
+    ),
+    balance AS (
+        SELECT project_id,
+               COUNT(*) as balance_orders,
+               CAST(SUM(required_qty) AS BIGINT) as balance_required,
+               CAST(SUM(fulfilled_qty) AS BIGINT) as balance_fulfilled
+        FROM balance_orders
+        WHERE project_id IN (SELECT id FROM scope)
+            {created_at_range}
+        GROUP BY project_id
+    ),
+    dispatches AS (
+        SELECT project_id,
+               COUNT(*) as total_dispatches,
+               COUNT(*) FILTER (WHERE status = 'Delivered') as delivered_count
+        FROM dispatch
+        WHERE project_id IN (SELECT id FROM scope)
+            {dispatch_date_range}
+        GROUP BY project_id
+    )
+    SELECT
+        s.id, s.name, s.client, s.location, s.start_date, s.end_date, s.status, s.description,
+        COALESCE(wo.total_wo, 0), COALESCE(wo.completed_wo, 0), COALESCE(wo.pending_wo, 0),
+        COALESCE(production.total_entries, 0), COALESCE(production.total_produced, 0),
+        COALESCE(cutting.cutting_items, 0), COALESCE(cutting.cutting_quantity, 0), COALESCE(cutting.cut_items, 0),
+        COALESCE(balance.balance_orders, 0), COALESCE(balance.balance_required, 0), COALESCE(balance.balance_fulfilled, 0),
+        COALESCE(dispatches.total_dispatches, 0), COALESCE(dispatches.delivered_count, 0)
+    FROM scope s
+    LEFT JOIN wo ON wo.project_id = s.id
+    LEFT JOIN production ON production.project_id = s.id
+    LEFT JOIN cutting ON cutting.project_id = s.id
+    LEFT JOIN balance ON balance.project_id = s.id
+    LEFT JOIN dispatches ON dispatches.project_id = s.id
+    ORDER BY s.name
+"""
 
-def export_daily_targets_to_csv(targets_data):
-    """Export daily targets data to CSV format"""
-    if not targets_data:
-        return "No data to export"
-    
-    df = pd.DataFrame(targets_data, columns=[
-        'ID', 'Order Number', 'Project', 'Description', 'Target Qty', 'Target Date', 
-        'Assigned To', 'Status', 'Actual Qty', 'Completion Date', 'Notes', 'Created By', 'Created At'
-    ])
-    
-    return df.to_csv(index=False)
+# All-time summaries straight from the project KPI view
+PROJECT_KPI_SUMMARY_QUERY = """
+    SELECT
+        p.id, p.name, p.client, p.location, p.start_date, p.end_date, p.status, p.description,
+        COALESCE(k.total_wo, 0), COALESCE(k.completed_wo, 0), COALESCE(k.pending_wo, 0),
+        CAST(COALESCE(k.total_entries, 0) AS BIGINT), CAST(COALESCE(k.total_produced, 0) AS BIGINT),
+        COALESCE(k.cutting_items, 0), CAST(COALESCE(k.cutting_quantity, 0) AS BIGINT), COALESCE(k.cut_items, 0),
+        COALESCE(k.balance_orders, 0), CAST(COALESCE(k.balance_required, 0) AS BIGINT), CAST(COALESCE(k.balance_fulfilled, 0) AS BIGINT),
+        COALESCE(k.total_dispatches, 0), COALESCE(k.delivered_count, 0)
+    FROM projects p
+    LEFT JOIN mv_project_kpis k ON k.project_id = p.id
+    WHERE CAST(:project_ids AS INTEGER[]) IS NULL OR p.id = ANY(:project_ids)
+    ORDER BY p.name
+"""
 
-def export_cutting_lists_to_csv(cutting_data):
-    """Export cutting lists data to CSV format"""
-    if not cutting_data:
-        return "No data to export"
-    
-    df = pd.DataFrame(cutting_data, columns=[
-        'ID', 'Order Number', 'Project', 'Floor', 'Description', 'Width', 'Height', 
-        'Quantity', 'Color', 'Status', 'Cut Date', 'Created By', 'Created At'
-    ])
-    
-    return df.to_csv(index=False)
+# Workbook layout for the summary sheet
+PROJECT_SUMMARY_SHEET = {
+    "name": "Project Summary",
+    "title": "PROJECT SUMMARY",
+    "headers": [column.upper() for column in PROJECT_SUMMARY_COLUMNS],
+    "widths": [10, 24, 18, 18, 12, 12, 12, 30] + [12] * 13
+}
 
-def export_balance_orders_to_csv(balance_data):
-    """Export balance orders data to CSV format"""
-    if not balance_data:
-        return "No data to export"
+def get_project_summaries(project_ids=None, from_date=None, to_date=None):
+    """Return one summary row per project as a DataFrame of PROJECT_SUMMARY_COLUMNS
     
-    df = pd.DataFrame(balance_data, columns=[
-        'ID', 'WO Number', 'Project', 'Floor', 'Priority', 'Specifications', 
-        'Required Qty', 'Fulfilled Qty', 'Total Qty', 'Due Date', 'Status', 
-        'Created By', 'Created At'
-    ])
+    All projects when project_ids is None. Without a date range the figures come
+    from the project KPI view; with one, from a single grouped query.
+    """
+    from database import get_db
+    from sqlalchemy import text
     
-    return df.to_csv(index=False)
-
-def export_dispatch_to_csv(dispatch_data):
-    """Export dispatch data to CSV format"""
-    if not dispatch_data:
-        return "No data to export"
+    params = {"project_ids": list(project_ids) if project_ids is not None else None}
     
-    df = pd.DataFrame(dispatch_data, columns=[
-        'ID', 'Project', 'Order Number', 'Vehicle Number', 'Driver Name', 
-        'Dispatch Date', 'Delivery Date', 'Status', 'Responsible Person', 
-        'Challan Number', 'Notes', 'Created By', 'Created At'
-    ])
+    if from_date or to_date:
+        params["from_date"] = from_date
+        params["until_date"] = to_date + timedelta(days=1) if to_date else None
+        query = PROJECT_SUMMARY_QUERY.format(**{
+            f"{column}_range": " ".join(
+                condition for condition, value in [(f"AND {column} >= :from_date", from_date),
+                                                   (f"AND {column} < :until_date", to_date)] if value
+            )
+            for column in ["created_at", "production_date", "dispatch_date"]
+        })
+    else:
+        query = PROJECT_KPI_SUMMARY_QUERY
     
-    return df.to_csv(index=False)
-
-def generate_project_summary_report(project_id, from_date=None, to_date=None):
-    """Generate a comprehensive project summary report"""
+    db = get_db()
     try:
-        from database import get_db
-        from sqlalchemy import text
-        
-        db = get_db()
-        
-        # Project basic info
-        project_info = db.execute(text("""
-            SELECT name, client, location, start_date, end_date, status, description
-            FROM projects WHERE id = :project_id
-        """), {"project_id": project_id}).fetchone()
-        
-        if not project_info:
-            return "Project not found"
-        
-        # Date filter conditions
-        date_filter = ""
-        params = {"project_id": project_id}
-        
-        if from_date:
-            date_filter += " AND created_at >= :from_date"
-            params["from_date"] = from_date
-        
-        if to_date:
-            date_filter += " AND created_at <= :to_date"
-            params["to_date"] = to_date
-        
-        # Work Orders summary
-        wo_summary = db.execute(text(f"""
-            SELECT 
-                COUNT(*) as total_wo,
-                COUNT(CASE WHEN status = 'Completed' THEN 1 END) as completed_wo,
-                COUNT(CASE WHEN status = 'Pending' THEN 1 END) as pending_wo
-            FROM work_orders 
-            WHERE project_id = :project_id {date_filter}
-        """), params).fetchone()
-        
-        # Production summary
-        production_summary = db.execute(text(f"""
-            SELECT 
-                COUNT(*) as total_entries,
-                SUM(produced_quantity) as total_produced
-            FROM production_log 
-            WHERE project_id = :project_id {date_filter}
-        """), params).fetchone()
-        
-        # Cutting summary
-        cutting_summary = db.execute(text(f"""
-            SELECT 
-                COUNT(*) as total_items,
-                SUM(quantity) as total_quantity,
-                COUNT(CASE WHEN status = 'Cut' THEN 1 END) as cut_items
-            FROM cutting_lists 
-            WHERE project_id = :project_id {date_filter}
-        """), params).fetchone()
-        
-        # Balance orders summary
-        balance_summary = db.execute(text(f"""
-            SELECT 
-                COUNT(*) as total_orders,
-                SUM(required_qty) as total_required,
-                SUM(fulfilled_qty) as total_fulfilled
-            FROM balance_orders 
-            WHERE project_id = :project_id {date_filter}
-        """), params).fetchone()
-        
-        # Dispatch summary
-        dispatch_summary = db.execute(text(f"""
-            SELECT 
-                COUNT(*) as total_dispatches,
-                COUNT(CASE WHEN status = 'Delivered' THEN 1 END) as delivered_count
-            FROM dispatch 
-            WHERE project_id = :project_id {date_filter}
-        """), params).fetchone()
-        
+        rows = db.execute(text(query), params).fetchall()
+    finally:
         db.close()
-        
-        # Generate report
-        report_content = f"""
+    
+    return pd.DataFrame(rows, columns=PROJECT_SUMMARY_COLUMNS)
+
+def _rate(part, whole):
+    return part / whole * 100 if whole else 0
+
+def render_project_summary(summary, from_date=None, to_date=None):
+    """Render one project's summary row as the text report"""
+    return f"""
         =====================================
            PROJECT SUMMARY REPORT
         =====================================
@@ -231,134 +170,265 @@ def generate_project_summary_report(project_id, from_date=None, to_date=None):
         -------------------------------------
         PROJECT INFORMATION
         -------------------------------------
-        Project Name: {project_info[0]}
-        Client: {project_info[1] or 'N/A'}
-        Location: {project_info[2] or 'N/A'}
-        Start Date: {project_info[3] or 'N/A'}
-        End Date: {project_info[4] or 'N/A'}
-        Status: {project_info[5]}
-        Description: {project_info[6] or 'N/A'}
+        Project Name: {summary['Project']}
+        Client: {summary['Client'] or 'N/A'}
+        Location: {summary['Location'] or 'N/A'}
+        Start Date: {summary['Start Date'] or 'N/A'}
+        End Date: {summary['End Date'] or 'N/A'}
+        Status: {summary['Status']}
+        Description: {summary['Description'] or 'N/A'}
         
         -------------------------------------
         WORK ORDERS SUMMARY
         -------------------------------------
-        Total Work Orders: {wo_summary[0]}
-        Completed: {wo_summary[1]}
-        Pending: {wo_summary[2]}
-        Completion Rate: {(wo_summary[1] / wo_summary[0] * 100) if wo_summary[0] > 0 else 0:.1f}%
+        Total Work Orders: {summary['Work Orders']}
+        Completed: {summary['Completed WO']}
+        Pending: {summary['Pending WO']}
+        Completion Rate: {_rate(summary['Completed WO'], summary['Work Orders']):.1f}%
         
         -------------------------------------
         PRODUCTION SUMMARY
         -------------------------------------
-        Total Production Entries: {production_summary[0]}
-        Total Quantity Produced: {production_summary[1] or 0}
+        Total Production Entries: {summary['Production Entries']}
+        Total Quantity Produced: {summary['Produced']}
         
         -------------------------------------
         CUTTING SUMMARY
         -------------------------------------
-        Total Cutting Items: {cutting_summary[0]}
-        Total Quantity: {cutting_summary[1] or 0}
-        Items Cut: {cutting_summary[2]}
-        Cutting Progress: {(cutting_summary[2] / cutting_summary[0] * 100) if cutting_summary[0] > 0 else 0:.1f}%
+        Total Cutting Items: {summary['Cutting Items']}
+        Total Quantity: {summary['Cutting Quantity']}
+        Items Cut: {summary['Items Cut']}
+        Cutting Progress: {_rate(summary['Items Cut'], summary['Cutting Items']):.1f}%
         
         -------------------------------------
         BALANCE ORDERS SUMMARY
         -------------------------------------
-        Total Balance Orders: {balance_summary[0]}
-        Total Required Quantity: {balance_summary[1] or 0}
-        Total Fulfilled Quantity: {balance_summary[2] or 0}
-        Fulfillment Rate: {(balance_summary[2] / balance_summary[1] * 100) if balance_summary[1] and balance_summary[1] > 0 else 0:.1f}%
+        Total Balance Orders: {summary['Balance Orders']}
+        Total Required Quantity: {summary['Required']}
+        Total Fulfilled Quantity: {summary['Fulfilled']}
+        Fulfillment Rate: {_rate(summary['Fulfilled'], summary['Required']):.1f}%
         
         -------------------------------------
         DISPATCH SUMMARY
         -------------------------------------
-        Total Dispatches: {dispatch_summary[0]}
-        Delivered: {dispatch_summary[1]}
-        Delivery Rate: {(dispatch_summary[1] / dispatch_summary[0] * 100) if dispatch_summary[0] > 0 else 0:.1f}%
+        Total Dispatches: {summary['Dispatches']}
+        Delivered: {summary['Delivered']}
+        Delivery Rate: {_rate(summary['Delivered'], summary['Dispatches']):.1f}%
         
         =====================================
         End of Report
         =====================================
         """
+
+def generate_project_summary_report(project_id, from_date=None, to_date=None):
+    """Generate a comprehensive project summary report"""
+    try:
+        summaries = get_project_summaries([project_id], from_date, to_date)
         
-        return report_content
+        if summaries.empty:
+            return "Project not found"
+        
+        return render_project_summary(summaries.iloc[0], from_date, to_date)
         
     except Exception as e:
         return f"Error generating report: {str(e)}"
 
-def generate_monthly_production_report(year, month):
-    """Generate monthly production report"""
-    try:
-        from database import get_db
-        from sqlalchemy import text
-        
-        db = get_db()
-        
-        # Monthly production data
-        monthly_data = db.execute(text("""
-            SELECT 
-                pl.production_date,
-                p.name as project_name,
-                u.username as operator_name,
-                pl.machine_used,
-                pl.produced_quantity,
-                pl.shift
-            FROM production_log pl
-            LEFT JOIN projects p ON pl.project_id = p.id
-            LEFT JOIN users u ON pl.operator_id = u.id
-            WHERE EXTRACT(YEAR FROM pl.production_date) = :year 
-                AND EXTRACT(MONTH FROM pl.production_date) = :month
-            ORDER BY pl.production_date, pl.shift
-        """), {"year": year, "month": month}).fetchall()
+def generate_portfolio_report(project_ids=None, from_date=None, to_date=None):
+    """Summarize many projects, or all, in one call and return {"summaries", "text", "csv", "xlsx"}
+    
+    The summaries come from one query; the per-project text reports, the CSV and
+    the workbook are then rendered concurrently on a worker pool. "xlsx" is the
+    path of the workbook file.
+    """
+    from utils.workbook import build_workbook
+    
+    summaries = get_project_summaries(project_ids, from_date, to_date)
+    rows = list(summaries.astype(object).itertuples(index=False, name=None))
+    
+    with ThreadPoolExecutor(max_workers=REPORT_WORKERS) as pool:
+        texts = pool.map(lambda summary: render_project_summary(summary, from_date, to_date),
+                         [summary for _, summary in summaries.iterrows()])
+        csv_output = pool.submit(lambda: summaries.to_csv(index=False).encode("utf-8"))
+        xlsx_output = pool.submit(lambda: build_workbook([(PROJECT_SUMMARY_SHEET, [rows])])[0])
+        
+        totals = summaries.select_dtypes('number').drop(columns=['Project ID'], errors='ignore').sum()
+        portfolio_header = f"""
+        =====================================
+           PORTFOLIO SUMMARY REPORT
+        =====================================
         
-        # Summary statistics
-        total_quantity = sum([record[4] for record in monthly_data if record[4]])
-        working_days = len(set([record[0] for record in monthly_data]))
-        operators = len(set([record[2] for record in monthly_data if record[2]]))
+        Projects: {len(summaries)}
+        Report Period: {from_date or 'All time'} to {to_date or 'Present'}
+        Work Orders: {totals.get('Work Orders', 0)} ({totals.get('Completed WO', 0)} completed)
+        Total Quantity Produced: {totals.get('Produced', 0)}
+        Balance Fulfilled: {totals.get('Fulfilled', 0)} of {totals.get('Required', 0)}
+        Dispatches: {totals.get('Dispatches', 0)} ({totals.get('Delivered', 0)} delivered)
+        """
         
+        return {
+            "summaries": summaries,
+            "text": portfolio_header + "".join(texts),
+            "csv": csv_output.result(),
+            "xlsx": xlsx_output.result()
+        }
+
+# Rollup rows for a half-open date range, at day × operator × machine × shift grain
+PRODUCTION_BREAKDOWN_QUERY = """
+    SELECT
+        r.production_date,
+        COALESCE(u.username, 'Unassigned') as operator,
+        COALESCE(r.machine_used, 'Unspecified') as machine,
+        COALESCE(r.shift, 'Unspecified') as shift,
+        CAST(SUM(r.total_quantity) AS BIGINT) as quantity,
+        CAST(SUM(r.entry_count) AS BIGINT) as entries
+    FROM production_daily_rollup r
+    LEFT JOIN users u ON r.operator_id = u.id
+    WHERE r.production_date >= :start_date AND r.production_date < :until_date
+    GROUP BY r.production_date, u.username, r.machine_used, r.shift
+"""
+
+PRODUCTION_BREAKDOWN_COLUMNS = ['production_date', 'operator', 'machine', 'shift', 'quantity', 'entries']
+
+def get_production_breakdown(start_date, end_date):
+    """Return the rollup rows for start_date..end_date inclusive as a DataFrame"""
+    from database import get_db
+    from sqlalchemy import text
+    
+    db = get_db()
+    try:
+        rows = db.execute(text(PRODUCTION_BREAKDOWN_QUERY), {
+            "start_date": start_date,
+            "until_date": end_date + timedelta(days=1)
+        }).fetchall()
+    finally:
         db.close()
-        
-        # Generate report
-        report_content = f"""
+    
+    return pd.DataFrame(rows, columns=PRODUCTION_BREAKDOWN_COLUMNS)
+
+def previous_period(start_date, end_date):
+    """The period to compare against: the previous calendar month for a whole month, else the same number of days before"""
+    if start_date.day == 1 and (end_date + timedelta(days=1)).day == 1 and (start_date.year, start_date.month) == (end_date.year, end_date.month):
+        previous_end = start_date - timedelta(days=1)
+        return previous_end.replace(day=1), previous_end
+    
+    length = end_date - start_date + timedelta(days=1)
+    return start_date - length, end_date - length
+
+def summarize_production(breakdown):
+    """Headline figures for a breakdown frame"""
+    total_quantity = int(breakdown['quantity'].sum())
+    working_days = breakdown['production_date'].nunique()
+    return {
+        "total_quantity": total_quantity,
+        "entries": int(breakdown['entries'].sum()),
+        "working_days": working_days,
+        "operators": breakdown.loc[breakdown['operator'] != 'Unassigned', 'operator'].nunique(),
+        "daily_average": total_quantity / working_days if working_days > 0 else 0
+    }
+
+def _day_pivot(breakdown, index):
+    """index × day quantities, with a Total column, largest first"""
+    pivot = breakdown.pivot_table(index=index, columns='production_date', values='quantity',
+                                  aggfunc='sum', fill_value=0)
+    pivot['Total'] = pivot.sum(axis=1)
+    return pivot.sort_values('Total', ascending=False)
+
+def _change(current, previous):
+    if previous:
+        return f"{(current - previous) / previous * 100:+.1f}%"
+    return "n/a"
+
+def generate_production_report(start_date, end_date):
+    """Production report for any date range, inclusive of both ends
+    
+    Returns a dict with the period summary, the previous period's summary, the
+    daily totals, operator × day, machine × day and shift pivots, and the text
+    report. Both periods are read from the daily rollup on half-open ranges.
+    """
+    previous_start, previous_end = previous_period(start_date, end_date)
+    breakdown = get_production_breakdown(previous_start, end_date)
+    
+    in_period = breakdown['production_date'] >= start_date
+    current = breakdown[in_period]
+    previous = breakdown[~in_period]
+    
+    summary = summarize_production(current)
+    previous_summary = summarize_production(previous)
+    
+    daily = current.groupby('production_date')['quantity'].sum()
+    operator_day = _day_pivot(current, 'operator')
+    machine_day = _day_pivot(current, 'machine')
+    
+    shifts = pd.DataFrame({
+        'Current': current.groupby('shift')['quantity'].sum(),
+        'Previous': previous.groupby('shift')['quantity'].sum()
+    }).fillna(0).astype('int64').sort_values('Current', ascending=False)
+    
+    def lines(series):
+        return "\n".join(f"        {key}: {value}" for key, value in series.items()) or "        No production"
+    
+    report_content = f"""
         =====================================
-        MONTHLY PRODUCTION REPORT
+        PRODUCTION REPORT
         =====================================
         
-        Report Period: {month:02d}/{year}
+        Report Period: {start_date} to {end_date}
+        Compared With: {previous_start} to {previous_end}
         Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         
         -------------------------------------
         SUMMARY STATISTICS
         -------------------------------------
-        Total Production: {total_quantity}
-        Working Days: {working_days}
-        Active Operators: {operators}
-        Daily Average: {total_quantity / working_days if working_days > 0 else 0:.1f}
+        Total Production: {summary['total_quantity']} ({_change(summary['total_quantity'], previous_summary['total_quantity'])})
+        Working Days: {summary['working_days']} (previous {previous_summary['working_days']})
+        Active Operators: {summary['operators']} (previous {previous_summary['operators']})
+        Daily Average: {summary['daily_average']:.1f} ({_change(summary['daily_average'], previous_summary['daily_average'])})
         
         -------------------------------------
         DAILY BREAKDOWN
         -------------------------------------
-        """
+{lines(daily)}
         
-        # Group by date for daily breakdown
-        daily_totals = {}
-        for record in monthly_data:
-            date_key = record[0]
-            if date_key not in daily_totals:
-                daily_totals[date_key] = 0
-            daily_totals[date_key] += record[4] or 0
+        -------------------------------------
+        BY OPERATOR
+        -------------------------------------
+{lines(operator_day['Total'])}
         
-        for date_key, total in sorted(daily_totals.items()):
-            report_content += f"{date_key}: {total}\n"
+        -------------------------------------
+        BY MACHINE
+        -------------------------------------
+{lines(machine_day['Total'])}
         
-        report_content += """
+        -------------------------------------
+        BY SHIFT (current / previous)
+        -------------------------------------
+{lines(shifts['Current'].astype(str) + ' / ' + shifts['Previous'].astype(str))}
         
         =====================================
         End of Report
         =====================================
         """
-        
-        return report_content
+    
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "previous_start": previous_start,
+        "previous_end": previous_end,
+        "summary": summary,
+        "previous_summary": previous_summary,
+        "daily": daily,
+        "operator_day": operator_day,
+        "machine_day": machine_day,
+        "shifts": shifts,
+        "text": report_content
+    }
+
+def generate_monthly_production_report(year, month):
+    """Generate monthly production report"""
+    try:
+        start_date = date(year, month, 1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return generate_production_report(start_date, end_date)["text"]
         
     except Exception as e:
         return f"Error generating monthly report: {str(e)}"
@@ -0,0 +1,18 @@
+import streamlit as st
+
+# Per-row controls on the list pages run inside st.fragment, so a click reruns
+# only that row. After a write the row is re-read from the database and kept in
+# session state until the next full run rebuilds the list.
+
+def reset_row(key_prefix, record_id):
+    """Drop a refreshed copy of a row so the freshly listed one is used"""
+    st.session_state.pop(f"{key_prefix}_{record_id}", None)
+
+def current_row(key_prefix, row):
+    """Return the latest copy of a row, or None once it has been deleted"""
+    return st.session_state.get(f"{key_prefix}_{row[0]}", row)
+
+def refresh_row(key_prefix, record_id, fetch_row):
+    """Re-read one row from the database and rerun only its fragment"""
+    st.session_state[f"{key_prefix}_{record_id}"] = fetch_row(record_id)
+    st.rerun(scope="fragment")
@@ -0,0 +1,378 @@
+"""Parquet snapshots of the analytical tables and the analytics answered from them
+
+Production, target and audit rows are exported to month-partitioned Parquet
+files under SNAPSHOT_DIR. The analytics tabs read those files through
+pyarrow when ANALYTICS_SOURCE is "snapshots", so heavy date-range aggregations
+never run on the database operators write to.
+
+Run `python -m utils.snapshots` from cron to sync outside the app.
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from database import engine
+
+SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", os.path.join("data", "snapshots"))
+
+# Advisory lock key so only one process writes snapshots at a time
+SNAPSHOT_SYNC_LOCK = 734002
+
+# Rows fetched from the server-side cursor per Parquet row group
+SNAPSHOT_BATCH_ROWS = 50_000
+
+MONTH_PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+# Tables rewritten a month at a time when snapshot_changes lists the month.
+# Names are denormalized into the snapshot so the engine needs no joins.
+PARTITIONED_TABLES = {
+    "production_log": {
+        "alias": "pl",
+        "date_column": "production_date",
+        "query": """
+            SELECT pl.id, pl.wo_number, pl.project_id, p.name, pl.operator_id, u.username,
+                   pl.machine_used, pl.produced_quantity, pl.production_date, pl.shift
+            FROM production_log pl
+            LEFT JOIN projects p ON pl.project_id = p.id
+            LEFT JOIN users u ON pl.operator_id = u.id
+        """,
+        "schema": pa.schema([
+            ("id", pa.int64()), ("wo_number", pa.string()), ("project_id", pa.int64()), ("project", pa.string()),
+            ("operator_id", pa.int64()), ("operator", pa.string()), ("machine_used", pa.string()),
+            ("produced_quantity", pa.int64()), ("production_date", pa.date32()), ("shift", pa.string())
+        ])
+    },
+    "daily_targets": {
+        "alias": "dt",
+        "date_column": "target_date",
+        "query": """
+            SELECT dt.id, dt.order_number, dt.project_id, p.name, dt.assigned_to, u.username,
+                   dt.target_quantity, dt.actual_quantity, dt.target_date, dt.completion_date, dt.status
+            FROM daily_targets dt
+            LEFT JOIN projects p ON dt.project_id = p.id
+            LEFT JOIN users u ON dt.assigned_to = u.id
+        """,
+        "schema": pa.schema([
+            ("id", pa.int64()), ("order_number", pa.string()), ("project_id", pa.int64()), ("project", pa.string()),
+            ("assigned_to", pa.int64()), ("assignee", pa.string()), ("target_quantity", pa.int64()),
+            ("actual_quantity", pa.int64()), ("target_date", pa.date32()), ("completion_date", pa.date32()),
+            ("status", pa.string())
+        ])
+    }
+}
+
+# audit_trail is append-only, so it is exported by id. Ids are taken at insert
+# but become visible at commit, so rows newer than AUDIT_SEAL_AFTER go to a
+# per-month tail file that every sync rewrites; only older rows are sealed into
+# part files and move the watermark. A transaction left open longer than that
+# can still be missed.
+AUDIT_SEAL_AFTER = timedelta(minutes=15)
+
+AUDIT_QUERY = """
+    SELECT at.id, at.table_name, at.record_id, at.action, at.field_name, at.user_id, u.username, at.timestamp
+    FROM audit_trail at
+    LEFT JOIN users u ON at.user_id = u.id
+    WHERE at.id > :last_id AND at.timestamp IS NOT NULL
+    ORDER BY at.id
+"""
+
+AUDIT_SCHEMA = pa.schema([
+    ("id", pa.int64()), ("table_name", pa.string()), ("record_id", pa.int64()), ("action", pa.string()),
+    ("field_name", pa.string()), ("user_id", pa.int64()), ("username", pa.string()), ("timestamp", pa.timestamp("us"))
+])
+
+def load_manifest():
+    """Return the sync state: exported months, the audit watermark and the last sync time"""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"months": {}, "audit_last_id": 0, "synced_at": None}
+
+def save_manifest(manifest):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = os.path.join(SNAPSHOT_DIR, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def snapshot_synced_at():
+    """Return when the snapshots were last synced, or None if they never were"""
+    synced_at = load_manifest()["synced_at"]
+    return datetime.fromisoformat(synced_at) if synced_at else None
+
+def sync_snapshots():
+    """Bring the Parquet snapshots up to date with the database
+    
+    Months listed in snapshot_changes are re-exported whole, which also picks up
+    edits and deletes; a table never synced before is exported in full. New
+    audit rows are appended. Returns {table: rows written}, or None when
+    another process is already syncing.
+    """
+    # One transaction for the whole sync: server-side cursors need one, and the
+    # session-level advisory lock outlives it until released below
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SNAPSHOT_SYNC_LOCK}).scalar():
+            return None
+        
+        try:
+            manifest = load_manifest()
+            written = {}
+            
+            for table_name, config in PARTITIONED_TABLES.items():
+                written[table_name] = _sync_partitioned_table(conn, table_name, config, manifest)
+            written["audit_trail"] = _sync_audit_trail(conn, manifest)
+            
+            manifest["synced_at"] = datetime.now().isoformat(timespec="seconds")
+            save_manifest(manifest)
+            # Only now drop the handled change rows; a failed sync leaves them for the next one
+            conn.commit()
+            return written
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SNAPSHOT_SYNC_LOCK})
+
+def _sync_partitioned_table(conn, table_name, config, manifest):
+    alias, date_column = config["alias"], config["date_column"]
+    previous = set(manifest["months"].get(table_name, []))
+    
+    # Claim the committed change rows; writes committing after this stay for the next sync
+    changed = {
+        row[0] for row in conn.execute(
+            text("DELETE FROM snapshot_changes WHERE table_name = :table_name RETURNING month"),
+            {"table_name": table_name}
+        )
+    }
+    if table_name not in manifest["months"]:
+        changed |= {
+            row[0] for row in conn.execute(text(f"""
+                SELECT DISTINCT to_char({date_column}, 'YYYY-MM') FROM {table_name} WHERE {date_column} IS NOT NULL
+            """))
+        }
+    
+    table_dir = os.path.join(SNAPSHOT_DIR, table_name)
+    months = set(previous)
+    rows_written = 0
+    
+    for month in sorted(changed):
+        month_start = date.fromisoformat(f"{month}-01")
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        rows = conn.execution_options(stream_results=True).execute(
+            text(config["query"] + f" WHERE {alias}.{date_column} >= :month_start AND {alias}.{date_column} < :next_month"),
+            {"month_start": month_start, "next_month": next_month}
+        )
+        month_rows = _write_partition(rows, config["schema"], os.path.join(table_dir, f"month={month}"), "part-0.parquet")
+        
+        # Months with no rows left lose their partition
+        if month_rows:
+            months.add(month)
+        else:
+            shutil.rmtree(os.path.join(table_dir, f"month={month}"), ignore_errors=True)
+            months.discard(month)
+        rows_written += month_rows
+    
+    manifest["months"][table_name] = sorted(months)
+    return rows_written
+
+def _sync_audit_trail(conn, manifest):
+    seal_before = conn.execute(text("SELECT LOCALTIMESTAMP")).scalar() - AUDIT_SEAL_AFTER
+    rows = conn.execution_options(stream_results=True).execute(text(AUDIT_QUERY), {"last_id": manifest["audit_last_id"]})
+    table_dir = os.path.join(SNAPSHOT_DIR, "audit_trail")
+    tail = []
+    rows_written = 0
+    
+    while True:
+        batch = rows.fetchmany(SNAPSHOT_BATCH_ROWS)
+        if not batch:
+            break
+        
+        # Seal the leading rows old enough that no earlier id can still commit
+        sealed = 0
+        if not tail:
+            while sealed < len(batch) and batch[sealed][-1] < seal_before:
+                sealed += 1
+        tail.extend(batch[sealed:])
+        
+        if sealed:
+            for month, part in _audit_months(batch[:sealed]):
+                _write_audit_file(os.path.join(table_dir, f"month={month}"), f"part-{part['id'][0].as_py()}.parquet", part)
+            manifest["audit_last_id"] = batch[sealed - 1][0]
+        rows_written += len(batch)
+    
+    # Rewrite the unsealed rows and drop tails whose rows have all been sealed
+    tail_months = set()
+    for month, part in _audit_months(tail):
+        _write_audit_file(os.path.join(table_dir, f"month={month}"), "tail.parquet", part)
+        tail_months.add(month)
+    if os.path.isdir(table_dir):
+        for entry in os.listdir(table_dir):
+            tail_path = os.path.join(table_dir, entry, "tail.parquet")
+            if entry.removeprefix("month=") not in tail_months and os.path.exists(tail_path):
+                os.remove(tail_path)
+    
+    return rows_written
+
+def _audit_months(rows):
+    """Split audit rows into (month, pyarrow table) pairs by timestamp"""
+    if not rows:
+        return []
+    chunk = pa.Table.from_pandas(pd.DataFrame(rows, columns=AUDIT_SCHEMA.names), schema=AUDIT_SCHEMA, preserve_index=False)
+    months = pc.strftime(chunk["timestamp"], format="%Y-%m")
+    return [(month, chunk.filter(pc.equal(months, month))) for month in pc.unique(months).to_pylist()]
+
+def _write_audit_file(path, file_name, part):
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(part, os.path.join(path, f".{file_name}.tmp"))
+    os.replace(os.path.join(path, f".{file_name}.tmp"), os.path.join(path, file_name))
+
+def _write_partition(rows, schema, path, file_name):
+    """Stream a result into one Parquet file, replacing the previous file atomically"""
+    os.makedirs(path, exist_ok=True)
+    # Dot-prefixed files are skipped by dataset discovery, so readers never see a partial file
+    tmp_path = os.path.join(path, f".{file_name}.tmp")
+    rows_written = 0
+    
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        while True:
+            batch = rows.fetchmany(SNAPSHOT_BATCH_ROWS)
+            if not batch:
+                break
+            writer.write_table(pa.Table.from_pandas(pd.DataFrame(batch, columns=schema.names), schema=schema, preserve_index=False))
+            rows_written += len(batch)
+    
+    os.replace(tmp_path, os.path.join(path, file_name))
+    return rows_written
+
+def read_snapshot(table_name, date_column, start_date, end_date, columns):
+    """Read columns of a snapshot for a date range, pruning partitions outside it
+    
+    end_date is inclusive. Returns an empty table when nothing has been synced.
+    """
+    schema = AUDIT_SCHEMA if table_name == "audit_trail" else PARTITIONED_TABLES[table_name]["schema"]
+    path = os.path.join(SNAPSHOT_DIR, table_name)
+    if not os.path.isdir(path):
+        return schema.empty_table().select(columns)
+    
+    dataset = ds.dataset(path, schema=schema.append(pa.field("month", pa.string())),
+                         format="parquet", partitioning=MONTH_PARTITIONING)
+    
+    if pa.types.is_timestamp(schema.field(date_column).type):
+        lower = pa.scalar(datetime.combine(start_date, datetime.min.time()), type=pa.timestamp("us"))
+        upper = pa.scalar(datetime.combine(end_date + timedelta(days=1), datetime.min.time()), type=pa.timestamp("us"))
+    else:
+        lower, upper = pa.scalar(start_date, type=pa.date32()), pa.scalar(end_date + timedelta(days=1), type=pa.date32())
+    
+    return dataset.to_table(columns=columns, filter=(
+        (ds.field("month") >= start_date.strftime("%Y-%m")) & (ds.field("month") <= end_date.strftime("%Y-%m"))
+        & (ds.field(date_column) >= lower) & (ds.field(date_column) < upper)
+    ))
+
+def _grouped(table, keys, aggregations, columns):
+    """Group a pyarrow table and return the result as a DataFrame with the given column names"""
+    result = table.group_by(keys).aggregate(aggregations).to_pandas()
+    return result[[f"{column}_{function}" for column, function in aggregations] + keys].set_axis(columns, axis=1)
+
+def production_analytics(start_date, end_date):
+    """Production trend, per-operator and per-shift totals for the period from the snapshot"""
+    table = read_snapshot("production_log", "production_date", start_date, end_date,
+                          ["id", "production_date", "operator", "shift", "produced_quantity"])
+    
+    trend = _grouped(table, ["production_date"], [("produced_quantity", "sum")], ['Total Produced', 'Date'])
+    operators = _grouped(table.filter(pc.is_valid(table["operator"])), ["operator"],
+                         [("produced_quantity", "sum"), ("id", "count")], ['Total Produced', 'Records', 'Operator'])
+    shifts = _grouped(table.filter(pc.is_valid(table["shift"])), ["shift"],
+                      [("produced_quantity", "sum")], ['Total Produced', 'Shift'])
+    
+    return {
+        "trend": trend[['Date', 'Total Produced']].sort_values('Date'),
+        "operators": operators[['Operator', 'Total Produced', 'Records']].sort_values('Total Produced', ascending=False),
+        "shifts": shifts[['Shift', 'Total Produced']].sort_values('Total Produced', ascending=False)
+    }
+
+def target_performance(start_date, end_date):
+    """Every target performance figure for the period from the snapshot, in the layout of get_target_performance"""
+    targets = read_snapshot("daily_targets", "target_date", start_date, end_date,
+                            ["target_date", "assignee", "status", "target_quantity", "actual_quantity",
+                             "completion_date"]).to_pandas()
+    
+    completed = targets['status'] == 'Completed'
+    completion_date = pd.to_datetime(targets['completion_date'])
+    on_time = completed & (completion_date.isna() | (completion_date <= pd.to_datetime(targets['target_date'])))
+    has_target = targets['target_quantity'] > 0
+    completion = (targets['actual_quantity'] * 100.0 / targets['target_quantity']).where(has_target)
+    targets = targets.assign(completed=completed, on_time=on_time, completion=completion,
+                             member_completion=completion.where(has_target, 0.0))
+    
+    trend = targets.groupby('target_date').agg(
+        **{'Total Targets': ('status', 'size'), 'Completed Targets': ('completed', 'sum')}
+    ).rename_axis('Date').reset_index()
+    members = targets.groupby('assignee').agg(
+        **{'Total Assigned': ('status', 'size'), 'Completed': ('completed', 'sum'),
+           'Avg Completion %': ('member_completion', 'mean')}
+    ).rename_axis('Team Member').reset_index().sort_values('Completed', ascending=False)
+    status = targets['status'].value_counts(dropna=False).rename_axis('Status').reset_index(name='Count')
+    avg_completion = completion.mean()
+    
+    return {
+        "totals": {
+            "total": len(targets),
+            "completed": int(completed.sum()),
+            "on_time": int(on_time.sum()),
+            "avg_completion": None if pd.isna(avg_completion) else float(avg_completion)
+        },
+        "trend": trend,
+        "members": members.reset_index(drop=True),
+        "status": status
+    }
+
+def audit_analytics(start_date, end_date):
+    """Every audit analytics figure for the period from the snapshot, in the layout of get_audit_analytics"""
+    table = read_snapshot("audit_trail", "timestamp", start_date, end_date,
+                          ["id", "table_name", "record_id", "action", "user_id", "username", "timestamp"])
+    activity = table.to_pandas()
+    activity['Date'] = activity['timestamp'].dt.date
+    
+    daily = activity.groupby('Date').agg(
+        Total=('id', 'count'),
+        Creates=('action', lambda actions: (actions == 'CREATE').sum()),
+        Updates=('action', lambda actions: (actions == 'UPDATE').sum()),
+        Deletes=('action', lambda actions: (actions == 'DELETE').sum())
+    ).reset_index()
+    
+    named = activity[activity['username'].notna()]
+    users = named.groupby('username').agg(
+        **{'Total Actions': ('id', 'count')},
+        Creates=('action', lambda actions: (actions == 'CREATE').sum()),
+        Updates=('action', lambda actions: (actions == 'UPDATE').sum()),
+        Deletes=('action', lambda actions: (actions == 'DELETE').sum())
+    ).reset_index().rename(columns={'username': 'User'}).sort_values('Total Actions', ascending=False).head(10)
+    
+    tables = activity['table_name'].value_counts()
+    high_impact = activity[(activity['action'] == 'DELETE') | activity['table_name'].isin(['projects', 'work_orders'])]
+    
+    return {
+        "total": len(activity),
+        "users": int(activity['user_id'].nunique()),
+        "most_active_table": tables.index[0] if not tables.empty else None,
+        "peak_day": (daily.loc[daily['Total'].idxmax(), 'Date'], int(daily['Total'].max())) if not daily.empty else None,
+        "actions": activity['action'].value_counts().rename_axis('Action').reset_index(name='Count'),
+        "tables": tables.head(10).rename_axis('Table').reset_index(name='Count'),
+        "daily": daily,
+        "user_ranking": users,
+        "high_impact": high_impact.sort_values('timestamp', ascending=False).head(20)[
+            ['table_name', 'record_id', 'action', 'username', 'timestamp']
+        ].set_axis(['Table', 'Record ID', 'Action', 'User', 'Timestamp'], axis=1)
+    }
+
+if __name__ == "__main__":
+    written = sync_snapshots()
+    if written is None:
+        print("Another process is syncing the snapshots")
+    else:
+        for table_name, rows in written.items():
+            print(f"{table_name}: {rows} rows written")
@@ -0,0 +1,199 @@
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from utils.exports import create_export_file, stream_rows
+
+# Sheets of the Unified workbook exchanged with clients, in workbook order. Titles
+# and headers follow the workbook's own wording.
+UNIFIED_SHEETS = [
+    {
+        "name": "Cutting List",
+        "title": "CUTTING LIST",
+        "headers": ["ORDER #", "PROJECT", "FLOOR", "C.L DATE", "DESCRIPTION", "W", "H", "QTY", "COLOR", "STATUS", "CUT DATE"],
+        "widths": [18, 20, 10, 12, 30, 8, 8, 8, 12, 12, 12],
+        "query": """
+            SELECT cl.order_number, p.name, cl.floor, CAST(cl.created_at AS DATE), cl.description,
+                   cl.width, cl.height, cl.quantity, cl.color, cl.status, cl.cut_date
+            FROM cutting_lists cl
+            LEFT JOIN projects p ON cl.project_id = p.id
+            WHERE (CAST(:project_id AS INTEGER) IS NULL OR cl.project_id = :project_id)
+            ORDER BY cl.order_number, cl.id
+        """
+    },
+    {
+        "name": "Balance Order",
+        "title": "BALANCE ORDER PRIORITY",
+        "headers": ["DATE", "WO #", "PROJECT", "FLOOR", "PRIORITY", "GLASS SPECS", "P.O", "F. QTY", "TOTAL", "DUE DATE", "STATUS"],
+        "widths": [12, 14, 20, 10, 10, 30, 8, 8, 8, 12, 12],
+        "query": """
+            SELECT CAST(bo.created_at AS DATE), bo.wo_number, p.name, bo.floor, bo.priority, bo.specifications,
+                   bo.required_qty, bo.fulfilled_qty, bo.total_qty, bo.due_date, bo.status
+            FROM balance_orders bo
+            LEFT JOIN projects p ON bo.project_id = p.id
+            WHERE (CAST(:project_id AS INTEGER) IS NULL OR bo.project_id = :project_id)
+            ORDER BY bo.due_date, bo.wo_number, bo.id
+        """
+    },
+    {
+        "name": "Production Log",
+        "title": "PRODUCTION LOG",
+        "headers": ["ORDER #", "PROJECT", "DATE", "SHIFT", "OPERATOR", "MACHINE", "QTY", "NOTES"],
+        "widths": [18, 20, 12, 10, 14, 16, 8, 30],
+        "query": """
+            SELECT pl.wo_number, p.name, pl.production_date, pl.shift, u.username, pl.machine_used,
+                   pl.produced_quantity, pl.notes
+            FROM production_log pl
+            LEFT JOIN projects p ON pl.project_id = p.id
+            LEFT JOIN users u ON pl.operator_id = u.id
+            WHERE (CAST(:project_id AS INTEGER) IS NULL OR pl.project_id = :project_id)
+            ORDER BY pl.production_date, pl.wo_number, pl.id
+        """
+    },
+    {
+        "name": "Daily Production Targets",
+        "title": "DAILY PRODUCTION TARGETS",
+        "headers": ["ORDER #", "PROJECT", "DESCRIPTION", "TARGET DATE", "QTY", "ACTUAL", "ASSIGNED TO", "STATUS",
+                    "COMPLETED", "REMARKS"],
+        "widths": [18, 20, 30, 12, 8, 8, 14, 12, 12, 30],
+        "query": """
+            SELECT dt.order_number, p.name, dt.description, dt.target_date, dt.target_quantity, dt.actual_quantity,
+                   u.username, dt.status, dt.completion_date, dt.notes
+            FROM daily_targets dt
+            LEFT JOIN projects p ON dt.project_id = p.id
+            LEFT JOIN users u ON dt.assigned_to = u.id
+            WHERE (CAST(:project_id AS INTEGER) IS NULL OR dt.project_id = :project_id)
+            ORDER BY dt.target_date, dt.order_number, dt.id
+        """
+    },
+    {
+        "name": "Despatch",
+        "title": "DESPATCH",
+        "headers": ["CHALLAN #", "ORDER #", "PROJECT", "VEHICLE", "DRIVER", "DESPATCH DATE", "DELIVERY DATE",
+                    "STATUS", "RESPONSIBLE", "REMARKS"],
+        "widths": [14, 18, 20, 14, 16, 14, 14, 12, 14, 30],
+        "query": """
+            SELECT d.challan_number, d.order_number, p.name, d.vehicle_number, d.driver_name, d.dispatch_date,
+                   d.delivery_date, d.status, u.username, d.notes
+            FROM dispatch d
+            LEFT JOIN projects p ON d.project_id = p.id
+            LEFT JOIN users u ON d.responsible_person = u.id
+            WHERE (CAST(:project_id AS INTEGER) IS NULL OR d.project_id = :project_id)
+            ORDER BY d.dispatch_date, d.order_number, d.id
+        """
+    }
+]
+
+# Number formats of date and date-time cells
+DATE_FORMAT = "dd/mm/yyyy"
+DATETIME_FORMAT = "dd/mm/yyyy hh:mm"
+
+BOLD = Font(bold=True)
+
+def cell_value(value):
+    """A value as it can be stored in a cell
+    
+    NaN and infinity have no spreadsheet representation, so they become empty
+    cells; characters XML does not allow are dropped from text.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, Decimal) and not value.is_finite():
+        return None
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+def sheet_row(worksheet, values, font=None):
+    """Cells for one appended row; dates get a number format, text and numbers stay plain values"""
+    row = []
+    for value in values:
+        value = cell_value(value)
+        if font is not None or isinstance(value, date):
+            cell = WriteOnlyCell(worksheet, value)
+            if font is not None:
+                cell.font = font
+            if isinstance(value, date):
+                cell.number_format = DATETIME_FORMAT if isinstance(value, datetime) else DATE_FORMAT
+            value = cell
+        row.append(value)
+    return row
+
+def write_sheet(workbook, sheet, chunks):
+    """Append one sheet to a write-only workbook and return the number of data rows
+    
+    chunks is an iterable of row lists, such as stream_rows(). The sheet opens
+    with its title and the export date, as in the Unified workbook, followed by a
+    bold header row that stays frozen while scrolling.
+    """
+    worksheet = workbook.create_sheet(sheet["name"])
+    headers = sheet["headers"]
+    for index, width in enumerate(sheet["widths"]):
+        worksheet.column_dimensions[get_column_letter(index + 1)].width = width
+    worksheet.freeze_panes = "A4"
+    worksheet.merged_cells.add(f"A1:{get_column_letter(len(headers))}1")
+    
+    worksheet.append(sheet_row(worksheet, [sheet["title"]], BOLD))
+    worksheet.append(sheet_row(worksheet, [None] * (len(headers) - 2) + ["DATE:", date.today()]))
+    worksheet.append(sheet_row(worksheet, headers, BOLD))
+    
+    rows_written = 0
+    for rows in chunks:
+        for row in rows:
+            worksheet.append(sheet_row(worksheet, row))
+        rows_written += len(rows)
+    
+    return rows_written
+
+def build_workbook(sheets):
+    """Write sheets to a new .xlsx in the export directory and return (path, rows per sheet)
+    
+    sheets is a list of (sheet definition, chunks). The workbook is write-only:
+    rows go straight to disk as they are appended, so no sheet is held in memory
+    whole.
+    """
+    output = create_export_file(".xlsx")
+    output.close()
+    
+    workbook = Workbook(write_only=True)
+    counts = {sheet["name"]: write_sheet(workbook, sheet, chunks) for sheet, chunks in sheets}
+    workbook.save(output.name)
+    
+    return output.name, counts
+
+def export_unified_workbook(project_id=None):
+    """Build the Unified workbook for one project, or all, and return (path, rows per sheet)
+    
+    Each sheet is streamed from its own server-side cursor, one after another.
+    """
+    params = {"project_id": project_id}
+    return build_workbook([(sheet, stream_rows(sheet["query"], params)) for sheet in UNIFIED_SHEETS])
+
+def iter_sheet_rows(worksheet):
+    """Yield (row number, values) for each row of a read-only worksheet
+    
+    Values are numbers, str, bool or datetime for date-formatted cells; empty
+    and error cells are None.
+    """
+    # Some writers record a wrong sheet size, which would cut rows short
+    worksheet.reset_dimensions()
+    for row_number, cells in enumerate(worksheet.iter_rows(), start=1):
+        yield row_number, [None if cell.data_type == "e" else cell.value for cell in cells]
+
+def read_workbook(source):
+    """Yield (sheet name, rows) for each sheet of an .xlsx file or file-like object
+    
+    rows is an iter_sheet_rows() generator; the workbook is opened read-only, so
+    sheets are read one row at a time, never loaded whole. Consume each sheet's
+    rows before moving to the next.
+    """
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, iter_sheet_rows(worksheet)
+    finally:
+        workbook.close()